@@ -0,0 +1,113 @@
+"""Нагрузка на сервер тестирования на localhost: N тонких клиентов одновременно
+начинают и сдают тест, затем проверяется, что все результаты записаны.
+
+    python -m benchmarks.bench_server --clients 150
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.synthetic import make_bank_text
+from database.db import get_connection, init_db
+from database.importer import TxtImporter, parse_txt
+from server.client import ExamClient
+from server.exam_server import ExamServer
+
+
+def run_server(server: ExamServer, ready: threading.Event, stop: list):
+    async def main():
+        await server.start()
+        stop.append((asyncio.get_running_loop(), asyncio.current_task()))
+        ready.set()
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except asyncio.CancelledError:
+        pass
+
+
+def student(address: str, test_id: int, n: int, latencies: list, errors: list):
+    client = ExamClient(address)
+    try:
+        started = time.perf_counter()
+        session, _, questions = client.start_session(test_id, f"Студент {n}", f"Группа {n % 5}")
+        latencies.append(("start", time.perf_counter() - started))
+        chosen = [random.choice(answers).id for _, answers in questions]
+        started = time.perf_counter()
+        outcome = client.finish_session(session, chosen)
+        latencies.append(("finish", time.perf_counter() - started))
+        assert 0 <= outcome["score"] <= outcome["max_score"] == len(questions)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        client.close()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=150)
+    parser.add_argument("--bank", type=int, default=2000, help="вопросов в банке")
+    parser.add_argument("--pick", type=int, default=30, help="вопросов в попытке")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = get_connection(path)
+        init_db(conn)
+        stats = TxtImporter(conn).import_test(parse_txt(make_bank_text(args.bank, variants=4)), "bench", None, args.pick, 600)
+        conn.close()
+
+        server = ExamServer(path, "127.0.0.1", 0)
+        ready, stop = threading.Event(), []
+        thread = threading.Thread(target=run_server, args=(server, ready, stop), daemon=True)
+        thread.start()
+        ready.wait()
+        address = f"127.0.0.1:{server.port}"
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        students = [
+            threading.Thread(target=student, args=(address, stats.test_id, n, latencies, errors))
+            for n in range(args.clients)
+        ]
+        for t in students:
+            t.start()
+        for t in students:
+            t.join()
+        wall = time.perf_counter() - started
+
+        loop, task = stop[0]
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+
+        conn = get_connection(path, readonly=True)
+        saved = conn.execute("SELECT count(*) FROM results").fetchone()[0]
+        responses = conn.execute("SELECT count(*) FROM responses").fetchone()[0]
+        conn.close()
+
+    print(f"Клиентов: {args.clients}, ошибок: {len(errors)}, записано результатов: {saved}, ответов: {responses}")
+    print(f"Всего: {wall:.2f} с")
+    for op in ("start", "finish"):
+        values = [v for name, v in latencies if name == op]
+        print(
+            f"{op:>7}: p50 {percentile(values, 0.5) * 1000:.1f} мс, "
+            f"p95 {percentile(values, 0.95) * 1000:.1f} мс, max {max(values, default=0) * 1000:.1f} мс"
+        )
+    for e in errors[:5]:
+        print(f"  {type(e).__name__}: {e}", file=sys.stderr)
+    return 1 if errors or saved != args.clients else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
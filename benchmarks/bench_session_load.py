@@ -0,0 +1,69 @@
+"""Время до первого вопроса в зависимости от размера банка: старый путь N+1 против
+QuestionSampler.sample_session (выбор id по индексу + load_by_ids) и того же пути с кэшем банков.
+
+    python -m benchmarks.bench_session_load --sizes 100 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import make_bank_text
+from database.cache import TestPackCache
+from database.db import get_connection, init_db
+from database.importer import TxtImporter, parse_txt
+from database.repo import AnswerRepository, QuestionRepository
+from database.sampling import QuestionSampler
+
+
+def load_n_plus_one(questions_repo, answers_repo, test_id, limit):
+    all_questions = questions_repo.find_by_test(test_id)
+    random.shuffle(all_questions)
+    session = []
+    for q in all_questions[:limit]:
+        answers = answers_repo.find_by_question(q.id)
+        if answers:
+            session.append((q, answers))
+    return session
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--pick", type=int, default=30, help="вопросов в сессии")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = get_connection(os.path.join(tmp, "bench.db"))
+        init_db(conn)
+        questions_repo = QuestionRepository(conn)
+        answers_repo = AnswerRepository(conn)
+        importer = TxtImporter(conn)
+        sampler = QuestionSampler(conn)
+        cached = QuestionSampler(conn, cache=TestPackCache())
+
+        print(f"{'вопросов':>10} {'N+1, мс':>10} {'sample_session, мс':>20} {'с кэшем, мс':>13} {'ускорение':>10}")
+        for size in args.sizes:
+            stats = importer.import_test(parse_txt(make_bank_text(size)), f"bench_{size}", None, args.pick, 600)
+            test_id = stats.test_id
+            old = best_of(lambda: load_n_plus_one(questions_repo, answers_repo, test_id, args.pick), args.repeat)
+            new = best_of(lambda: sampler.sample_session(test_id, args.pick), args.repeat)
+            cached.sample_session(test_id, args.pick)  # банк попадает в кэш при первой сессии
+            hot = best_of(lambda: cached.sample_session(test_id, args.pick), args.repeat)
+            print(f"{size:>10} {old * 1000:>10.2f} {new * 1000:>20.2f} {hot * 1000:>13.2f} {old / new:>9.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
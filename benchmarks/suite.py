@@ -0,0 +1,252 @@
+"""Набор замеров всего пути данных на синтетической базе с отчётом в JSON.
+
+    python -m benchmarks.suite --scale small --output bench.json
+    python -m benchmarks.suite --scale medium --output new.json --baseline bench.json
+
+Сценарии: импорт TXT, загрузка сессии (start_selected_test), следующий вопрос
+адаптивного теста, ведомость
+(load_results_table), поиск тестов (TestRepository.search), агрегаты результатов.
+С --baseline сравнивает медианы и возвращает код 1, если что-то замедлилось
+больше чем в --threshold раз.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import WORDS, fill_results, make_bank_text, make_tests
+from database.adaptive import AdaptiveSession
+from database.cache import TestPackCache
+from database.db import get_connection, init_db
+from database.importer import TxtImporter, parse_txt
+from database.repo import ResultRepository, TestRepository
+from database.sampling import QuestionSampler
+from database.stats import StatsRepository
+from windows.startup import git_revision
+
+REPORT_VERSION = 1
+
+SCALES = {
+    # вопросов в банке, тестов в каталоге, результатов, ответов на результат (для анализа вопросов)
+    "small": {"bank": 2000, "tests": 500, "results": 100000, "responses": 20000},
+    "medium": {"bank": 20000, "tests": 5000, "results": 1000000, "responses": 100000},
+    "large": {"bank": 50000, "tests": 20000, "results": 5000000, "responses": 300000},
+}
+
+
+def measure(func: Callable[[], object], repeat: int, setup: Callable[[], None] = None) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(times[0], 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "repeat": repeat,
+    }
+
+
+def run_suite(scale: dict, repeat: int, tmp: str, log=print) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    bank_text = make_bank_text(scale["bank"])
+
+    # --- импорт TXT: разбор + запись нового теста в пустую базу ---
+    counter = iter(range(10 ** 6))
+
+    def import_txt():
+        conn = get_connection(os.path.join(tmp, f"import_{next(counter)}.db"))
+        init_db(conn)
+        TxtImporter(conn).import_test(parse_txt(bank_text), "bench", None, 30, 1800)
+        conn.close()
+
+    results["txt_import"] = {**measure(import_txt, max(1, repeat // 3)), "rows": scale["bank"]}
+    log(f"txt_import: {results['txt_import']['median_ms']:.1f} мс")
+
+    # --- общая база для остальных сценариев ---
+    path = os.path.join(tmp, "bench.db")
+    conn = get_connection(path)
+    init_db(conn)
+    stats = TxtImporter(conn).import_test(parse_txt(bank_text), "bench", None, 30, 1800)
+    test_id = stats.test_id
+    catalog = make_tests(conn, scale["tests"])
+    started = time.perf_counter()
+    fill_results(conn, [test_id] + catalog[:20], scale["results"])
+    question_ids = [r["id"] for r in conn.execute("SELECT id FROM questions WHERE test_id = ?", (test_id,))]
+    fill_results(
+        conn,
+        [test_id],
+        scale["responses"] // 30,
+        responses_per_result=30,
+        question_ids=question_ids,
+        seed=1,
+    )
+    log(f"данные: {scale['results']} результатов за {time.perf_counter() - started:.1f} с")
+
+    tests_repo = TestRepository(conn)
+    results_repo = ResultRepository(conn)
+    stats_repo = StatsRepository(conn)
+
+    # --- загрузка сессии: выбор k вопросов по индексу, с учётом показов и без ---
+    sampler = QuestionSampler(conn)
+    seen_user = conn.execute("SELECT user_name FROM results WHERE test_id = ? LIMIT 1", (test_id,)).fetchone()[0]
+
+    cached_sampler = QuestionSampler(conn, cache=TestPackCache())
+
+    def session_load(user_name=None, sampler=sampler):
+        session = sampler.sample_session(test_id, 30, user_name)
+        for _, answers in session:
+            random.shuffle(answers)
+
+    results["session_load"] = {**measure(session_load, repeat * 10), "rows": scale["bank"]}
+    # банк уже в памяти (TestPackCache): выбор id по индексу, тексты - без запроса
+    session_load(sampler=cached_sampler)
+    results["session_load_cached"] = {
+        **measure(lambda: session_load(sampler=cached_sampler), repeat * 10),
+        "rows": scale["bank"],
+    }
+    results["session_load_exposure"] = {
+        **measure(lambda: session_load(seen_user), repeat * 10),
+        "rows": scale["bank"],
+    }
+
+    # --- адаптивный режим: выбор следующего вопроса и пересчёт уровня после ответа ---
+    test = tests_repo.find_by_id(test_id)
+    cat_rng = random.Random(0)
+    cat = {"session": None}
+
+    def adaptive_next_item():
+        session = cat["session"]
+        if session is None or session.done:
+            session = cat["session"] = AdaptiveSession(conn, test, rng=cat_rng)
+        question, _ = session.next_item()
+        session.record(question.id, cat_rng.random() < 0.6)
+
+    results["adaptive_next_item"] = {**measure(adaptive_next_item, repeat * 20), "rows": scale["bank"]}
+
+    # --- ведомость: сводка + первая страница и страница из середины ---
+    total = stats_repo.for_test(test_id).count
+
+    def results_table():
+        stats_repo.for_test(test_id)
+        stats_repo.groups_for_test(test_id)
+        results_repo.ledger_page(test_id, 100, order_by="taken_at", descending=True)
+
+    results["results_table_open"] = {**measure(results_table, repeat), "rows": total}
+
+    middle = results_repo.ledger_page(test_id, 1, order_by="percent")
+    after = (middle[0]["sort_value"], middle[0]["id"]) if middle else None
+    results["results_table_page_sorted"] = {
+        **measure(lambda: results_repo.ledger_page(test_id, 100, after=after, order_by="percent"), repeat),
+        "rows": total,
+    }
+
+    # --- поиск тестов ---
+    rng = random.Random(0)
+    queries = [f"{rng.choice(WORDS)[:5]}" for _ in range(20)]
+    query_iter = iter(queries * (repeat + 1))
+    results["test_search"] = {
+        **measure(lambda: tests_repo.search(next(query_iter), limit=50), repeat),
+        "rows": scale["tests"],
+    }
+
+    # --- агрегаты результатов: полный пересчёт сводки и анализ вопросов ---
+    results["results_stats_rebuild"] = {**measure(stats_repo.rebuild, max(1, repeat // 3)), "rows": scale["results"]}
+    try:
+        from database.item_analysis import analyze_test
+
+        results["item_analysis"] = {
+            **measure(lambda: analyze_test(conn, test_id), max(1, repeat // 3)),
+            "rows": scale["responses"],
+        }
+    except ImportError as e:
+        log(f"item_analysis пропущен: {e}")
+
+    conn.close()
+    return results
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Сценарии, медиана которых выросла больше чем в threshold раз."""
+    regressions = []
+    print()
+    print(f"{'сценарий':<28} {'было, мс':>10} {'стало, мс':>10} {'x':>6}")
+    for name, now in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            print(f"{name:<28} {'-':>10} {now['median_ms']:>10.2f}")
+            continue
+        ratio = now["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        flag = "  <-- медленнее" if ratio > threshold else ""
+        print(f"{name:<28} {before['median_ms']:>10.2f} {now['median_ms']:>10.2f} {ratio:>6.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--output", help="куда записать отчёт JSON")
+    parser.add_argument("--baseline", help="отчёт прошлой версии для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.25, help="допустимое замедление медианы")
+    args = parser.parse_args(argv)
+
+    scale = SCALES[args.scale]
+    with tempfile.TemporaryDirectory() as tmp:
+        scenarios = run_suite(scale, args.repeat, tmp)
+
+    report = {
+        "version": REPORT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "scale": args.scale,
+        "params": scale,
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "scenarios": scenarios,
+    }
+
+    print()
+    print(f"{'сценарий':<28} {'медиана, мс':>12} {'мин, мс':>10} {'p95, мс':>10} {'строк':>10}")
+    for name, r in scenarios.items():
+        print(f"{name:<28} {r['median_ms']:>12.2f} {r['min_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['rows']:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nОтчёт: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"Внимание: базовый отчёт снят на масштабе {baseline.get('scale')}", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nЗамедлились: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Генератор синтетических данных: банки вопросов в формате <question>/<variant>,
+каталог тестов и миллионы результатов.
+
+    python -m benchmarks.synthetic bank bank.txt --questions 20000
+    python -m benchmarks.synthetic results --db tests.db --count 1000000
+"""
+import argparse
+import os
+import random
+import sys
+from typing import List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import get_connection, init_db
+from database.importer import QUESTION_TAG, VARIANT_TAG
+from database.repo import ResponseRepository, ResultRepository, TestRepository
+
+WORDS = (
+    "политика государство общество власть право экономика культура история социология "
+    "философия психология педагогика статистика рынок институт норма ценность группа "
+    "личность семья религия наука образование управление выборы партия конституция "
+    "регион город население миграция труд доход налог бюджет финансы метод теория"
+).split()
+
+FIRST_NAMES = ("Иван", "Анна", "Пётр", "Мария", "Олег", "Елена", "Сергей", "Ольга", "Дмитрий", "Наталья")
+LAST_NAMES = ("Иванов", "Петрова", "Сидоров", "Кузнецова", "Смирнов", "Попова", "Волков", "Соколова")
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def make_bank_text(questions: int, variants: int = 5, seed: int = 0) -> str:
+    """Банк в формате импорта TXT; правильный ответ - первый вариант, как в example/."""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(questions):
+        lines = [f"{QUESTION_TAG}{sentence(rng, rng.randint(6, 14))} ({i})"]
+        lines += [f"{VARIANT_TAG}{sentence(rng, rng.randint(1, 5))} {i}.{j}" for j in range(variants)]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n"
+
+
+def write_bank(path: str, questions: int, variants: int = 5, seed: int = 0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(make_bank_text(questions, variants, seed))
+
+
+def make_tests(conn, count: int, seed: int = 0) -> List[int]:
+    """Каталог тестов без вопросов - для поиска и списков."""
+    rng = random.Random(seed)
+    rows = [
+        {
+            "name": f"{sentence(rng, rng.randint(1, 3))} {i}",
+            "description": sentence(rng, rng.randint(5, 15)),
+            "questions": 30,
+            "time_limit": 1800,
+        }
+        for i in range(count)
+    ]
+    return TestRepository(conn).create_many(rows)
+
+
+def fill_results(
+    conn,
+    test_ids: Sequence[int],
+    count: int,
+    groups: int = 40,
+    max_score: int = 30,
+    responses_per_result: int = 0,
+    question_ids: Optional[Sequence[int]] = None,
+    batch_size: int = 50000,
+    seed: int = 0,
+) -> int:
+    """count результатов (со сводкой result_stats) и, если нужно, ответов к ним."""
+    rng = random.Random(seed)
+    results_repo = ResultRepository(conn)
+    responses_repo = ResponseRepository(conn)
+    group_names = [f"Группа {i:03d}" for i in range(groups)]
+    written = 0
+    with results_repo.transaction():
+        while written < count:
+            n = min(batch_size, count - written)
+            rows = []
+            for _ in range(n):
+                score = min(max_score, max(0, int(rng.gauss(max_score * 0.65, max_score * 0.2))))
+                rows.append(
+                    {
+                        "test_id": rng.choice(test_ids),
+                        "user_name": f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.randint(1, 99999)}",
+                        "group_name": rng.choice(group_names),
+                        "score": score,
+                        "max_score": max_score,
+                        "time_taken": rng.randint(60, 1800),
+                    }
+                )
+            if responses_per_result and question_ids:
+                ids = results_repo.create_many(rows)
+                responses_repo.bulk_create(
+                    [
+                        {
+                            "result_id": result_id,
+                            "question_id": q_id,
+                            "answer_id": None,
+                            "is_correct": int(rng.random() < 0.65),
+                        }
+                        for result_id in ids
+                        for q_id in rng.sample(question_ids, min(responses_per_result, len(question_ids)))
+                    ]
+                )
+            else:
+                results_repo.bulk_create(rows)
+            written += n
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_bank = sub.add_parser("bank", help="TXT банк вопросов")
+    p_bank.add_argument("output")
+    p_bank.add_argument("--questions", type=int, default=10000)
+    p_bank.add_argument("--variants", type=int, default=5)
+    p_bank.add_argument("--seed", type=int, default=0)
+
+    p_results = sub.add_parser("results", help="результаты по тестам базы")
+    p_results.add_argument("--db", required=True)
+    p_results.add_argument("--count", type=int, default=1000000)
+    p_results.add_argument("--groups", type=int, default=40)
+    p_results.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == "bank":
+        write_bank(args.output, args.questions, args.variants, args.seed)
+        print(f"{args.output}: вопросов {args.questions}")
+        return 0
+
+    conn = get_connection(args.db)
+    init_db(conn)
+    test_ids = [r["id"] for r in conn.execute("SELECT id FROM tests")]
+    if not test_ids:
+        test_ids = make_tests(conn, 10, args.seed)
+    written = fill_results(conn, test_ids, args.count, groups=args.groups, seed=args.seed)
+    conn.close()
+    print(f"{args.db}: записано результатов {written}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
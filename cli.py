@@ -0,0 +1,237 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+
+from config import DB_NAME, SERVER_HOST, SERVER_PORT
+from database.db import get_connection, init_db
+from database.importer import TxtImporter, read_txt
+
+# настройки нового теста, если --questions/--time-limit не заданы
+DEFAULT_QUESTIONS = 10
+DEFAULT_TIME_LIMIT = 300
+
+
+def test_name_from_path(path: str) -> str:
+    """output_СОЦИОЛОГИЯ_f3180m_11.txt -> СОЦИОЛОГИЯ"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem.startswith("output_"):
+        stem = stem[len("output_"):]
+    return stem.split("_", 1)[0] or stem
+
+
+def parse_file(path: str):
+    started = time.perf_counter()
+    return path, read_txt(path), time.perf_counter() - started
+
+
+def import_directory(args) -> int:
+    paths = sorted(glob(os.path.join(args.directory, args.pattern)))
+    if not paths:
+        print(f"Нет файлов {args.pattern} в {args.directory}", file=sys.stderr)
+        return 1
+
+    names = {}
+    for path in paths:
+        name = test_name_from_path(path)
+        if name in names.values():
+            name = os.path.splitext(os.path.basename(path))[0]
+        names[path] = name
+
+    conn = get_connection(args.db)
+    init_db(conn)
+    importer = TxtImporter(conn)
+
+    started = time.perf_counter()
+    parse_time = write_time = 0.0
+    total_questions = total_answers = total_rows = 0
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(parse_file, p) for p in paths]
+        # парсинг идёт в пуле процессов, запись - только здесь, одним соединением
+        for fut in as_completed(futures):
+            try:
+                path, parsed, elapsed = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"Ошибка разбора: {e}", file=sys.stderr)
+                continue
+            parse_time += elapsed
+
+            name = names[path]
+            if not parsed:
+                print(f"{name}: вопросов не найдено, пропущен")
+                continue
+
+            existing = conn.execute("SELECT id FROM tests WHERE name = ?", (name,)).fetchone()
+            try:
+                stats = importer.import_test(
+                    parsed,
+                    name,
+                    None,
+                    # повторный импорт не трогает настройки теста, если их не задали явно
+                    args.questions if existing or args.questions is not None else DEFAULT_QUESTIONS,
+                    args.time_limit if existing or args.time_limit is not None else DEFAULT_TIME_LIMIT,
+                    test_id=existing["id"] if existing else None,
+                )
+            except Exception as e:
+                failed += 1
+                print(f"{name}: ошибка записи: {e}", file=sys.stderr)
+                continue
+
+            write_time += stats.elapsed
+            total_questions += stats.questions
+            total_answers += stats.answers
+            total_rows += stats.rows
+            print(
+                f"{name}: вопросов {stats.questions} ({stats.summary()}), ответов записано {stats.answers}, "
+                f"{stats.elapsed:.3f} с ({stats.rows_per_sec:.0f} строк/с)"
+            )
+
+    conn.close()
+    wall = time.perf_counter() - started
+
+    print()
+    print(f"Файлов: {len(paths)} (ошибок: {failed})")
+    print(f"Вопросов: {total_questions}, ответов: {total_answers}")
+    print(f"Разбор (сумма по процессам): {parse_time:.3f} с")
+    print(f"Запись: {write_time:.3f} с ({total_rows / write_time if write_time else 0:.0f} строк/с)")
+    print(f"Всего: {wall:.3f} с ({total_rows / wall if wall else 0:.0f} строк/с)")
+    return 1 if failed else 0
+
+
+def item_report(args) -> int:
+    from database.item_analysis import analyze_test
+
+    conn = get_connection(args.db)
+    init_db(conn)
+    test = conn.execute("SELECT id FROM tests WHERE name = ?", (args.test,)).fetchone()
+    if not test:
+        print(f"Тест '{args.test}' не найден", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    report = analyze_test(conn, test["id"])
+    elapsed = time.perf_counter() - started
+    texts = {
+        row["id"]: row["q_text"]
+        for row in conn.execute("SELECT id, q_text FROM questions WHERE test_id = ?", (test["id"],))
+    }
+    conn.close()
+
+    print(f"Попыток: {report.attempts}, вопросов: {len(report.items)}, анализ: {elapsed:.3f} с")
+    print(f"{'id':>8} {'показов':>8} {'трудн.':>7} {'дискр.':>7} {'пропуск':>8}  вопрос")
+    for it in sorted(report.items, key=lambda i: i.discrimination):
+        flag = ""
+        if it.difficulty > 0.95:
+            flag = "[слишком лёгкий] "
+        elif it.difficulty < 0.2:
+            flag = "[слишком трудный] "
+        elif it.discrimination < 0.1:
+            flag = "[проверить ключ] "
+        print(
+            f"{it.question_id:>8} {it.n:>8} {it.difficulty:>7.2f} {it.discrimination:>7.2f} {it.omitted:>8}  "
+            f"{flag}{texts.get(it.question_id, '')[:60]}"
+        )
+
+    if args.distractors:
+        print()
+        print(f"{'вопрос':>8} {'ответ':>8} {'верный':>6} {'выбрали':>8} {'доля':>6} {'ср. балл':>8}")
+        for d in report.distractors:
+            print(
+                f"{d.question_id:>8} {d.answer_id:>8} {'да' if d.is_correct else '':>6} "
+                f"{d.n:>8} {d.share:>6.2f} {d.mean_score:>8.2f}"
+            )
+    return 0
+
+
+def export_results(args) -> int:
+    from database.export import export_ledger
+
+    conn = get_connection(args.db, readonly=True)
+    test_id = None
+    if args.test:
+        test = conn.execute("SELECT id FROM tests WHERE name = ?", (args.test,)).fetchone()
+        if not test:
+            print(f"Тест '{args.test}' не найден", file=sys.stderr)
+            return 1
+        test_id = test["id"]
+
+    started = time.perf_counter()
+    count = export_ledger(
+        conn,
+        args.output,
+        fmt=args.format,
+        test_id=test_id,
+        group_name=args.group,
+        date_from=args.date_from,
+        date_to=args.date_to,
+    )
+    conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"Выгружено строк: {count} в {args.output} за {elapsed:.2f} с")
+    return 0
+
+
+def serve(args) -> int:
+    from server.exam_server import serve as run_server
+
+    run_server(args.db, args.host, args.port)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="TesterMaker без графического интерфейса")
+    parser.add_argument("--db", default=DB_NAME, help="путь к базе данных")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="импорт каталога TXT файлов")
+    p_import.add_argument("directory")
+    p_import.add_argument("--pattern", default="output_*.txt")
+    p_import.add_argument("--workers", type=int, default=None, help="число процессов разбора")
+    p_import.add_argument(
+        "--questions",
+        type=int,
+        default=None,
+        help=f"сколько вопросов брать случайно (новый тест: {DEFAULT_QUESTIONS}, существующий: без изменений)",
+    )
+    p_import.add_argument(
+        "--time-limit",
+        type=int,
+        default=None,
+        help=f"лимит времени, секунды (новый тест: {DEFAULT_TIME_LIMIT}, существующий: без изменений)",
+    )
+    p_import.set_defaults(func=import_directory)
+
+    p_items = sub.add_parser("items", help="анализ вопросов теста по сохранённым ответам")
+    p_items.add_argument("test", help="имя теста")
+    p_items.add_argument("--distractors", action="store_true", help="показать статистику вариантов")
+    p_items.set_defaults(func=item_report)
+
+    p_export = sub.add_parser("export", help="выгрузка ведомости в CSV/XLSX/Parquet")
+    p_export.add_argument("output", help="файл .csv, .xlsx или .parquet")
+    p_export.add_argument("--format", choices=["csv", "xlsx", "parquet"], help="по умолчанию - по расширению")
+    p_export.add_argument("--test", help="имя теста")
+    p_export.add_argument("--group", help="группа")
+    p_export.add_argument("--from", dest="date_from", help="с даты YYYY-MM-DD (UTC)")
+    p_export.add_argument("--to", dest="date_to", help="по дату YYYY-MM-DD включительно (UTC)")
+    p_export.set_defaults(func=export_results)
+
+    p_serve = sub.add_parser("serve", help="сервер тестирования для тонких клиентов (main.py --server)")
+    p_serve.add_argument("--host", default=SERVER_HOST, help="0.0.0.0 - принимать подключения из сети")
+    p_serve.add_argument("--port", type=int, default=SERVER_PORT)
+    p_serve.set_defaults(func=serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,42 @@
 DB_NAME = "tests.db"
+
+# WAL позволяет читать во время записи; для базы на сетевом диске (SMB) нужен "DELETE"
+DB_JOURNAL_MODE = "WAL"
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHED_STATEMENTS = 256
+DB_WRITE_RETRIES = 5
+
+# порог "сдал" в процентах для статистики ведомости
+PASS_PERCENT = 60
+
+# как часто (сек) сбрасывать на диск автосохранение незавершённых попыток
+AUTOSAVE_INTERVAL = 2.0
+
+# сервер экзаменов (python cli.py serve) и тонкий клиент (python main.py --server host:port)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_READ_THREADS = 4
+SERVER_WRITE_QUEUE = 1000
+SERVER_TIMEOUT = 15.0
+
+# результаты пишутся в фоне; до записи в базу они лежат в журнале рядом с базой (<база>.<компьютер>.spool)
+RESULT_QUEUE_SIZE = 256
+RESULT_BATCH = 100
+# сколько ждать записи очереди при выходе; недописанное останется в журнале до следующего запуска
+RESULT_STOP_TIMEOUT = 10.0
+
+# диагностика (Ctrl+Shift+D): замеры включаются только по кнопке или здесь, выключенные ничего не стоят
+DIAG_ENABLED = False
+DIAG_SLOW_MS = 50.0
+DIAG_SLOW_LOG_SIZE = 200
+
+# вес уже виденного вопроса при выборе в попытку: 0.25 ** (сколько раз видел)
+EXPOSURE_WEIGHT = 0.25
+
+# адаптивный режим: тест заканчивается, когда оценка уровня так же точна, как после
+# CAT_TARGET_SHARE от tests.questions идеально подобранных вопросов (при 10 вопросах -
+# как после 7, ошибка 0.6 логита), но не раньше CAT_MIN_ITEMS вопросов; следующий вопрос -
+# случайный из CAT_RANDOMESQUE самых подходящих по трудности
+CAT_MIN_ITEMS = 5
+CAT_TARGET_SHARE = 0.7
+CAT_RANDOMESQUE = 3
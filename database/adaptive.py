@@ -0,0 +1,175 @@
+import math
+import random
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import CAT_MIN_ITEMS, CAT_RANDOMESQUE, CAT_TARGET_SHARE
+from database.models import Answer, Question, Test
+from database.repo import QuestionRepository
+
+# сетка уровней подготовки (логиты) для EAP-оценки и логарифм априорного N(0, 1) на ней
+GRID = tuple(-4.0 + 0.2 * i for i in range(41))
+PRIOR = tuple(-t * t / 2 for t in GRID)
+
+# сколько ближайших по трудности вопросов берём с каждой стороны от текущей оценки
+NEIGHBOURS = 8
+
+# доли верных для пересчёта в балл округляются до сотых, крайние - обрезаются
+P_CLAMP = (0.005, 0.995)
+
+
+def difficulty(p_value: float) -> float:
+    """Трудность по Рашу (логиты) из доли верных: чем реже отвечают верно, тем больше."""
+    return math.log((1.0 - p_value) / p_value)
+
+
+def p_correct(theta: float, b: float) -> float:
+    return 1.0 / (1.0 + math.exp(b - theta))
+
+
+def se_after(items: float) -> float:
+    """Ошибка оценки после items вопросов точно по уровню: информация каждого 1/4, априорная - 1."""
+    return 1.0 / math.sqrt(1.0 + items / 4.0)
+
+
+class AdaptiveSession:
+    """Адаптивная попытка: следующий вопрос подбирается под текущую оценку уровня.
+
+    Трудности вопросов заранее лежат в item_params (доля верных под индексом
+    (test_id, p_value), обновляется триггерами), поэтому выбор вопроса - два коротких
+    поиска по индексу без загрузки банка. Уровень оценивается EAP на сетке, тест
+    заканчивается, когда ошибка оценки не больше se_target (но не раньше min_items
+    вопросов) или набрано test.questions вопросов. По умолчанию se_target - ошибка после
+    CAT_TARGET_SHARE от test.questions идеально подобранных вопросов, так что она достижима
+    при любой длине теста.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        test: Test,
+        min_items: int = CAT_MIN_ITEMS,
+        se_target: Optional[float] = None,
+        randomesque: int = CAT_RANDOMESQUE,
+        rng: Optional[random.Random] = None,
+    ):
+        self.conn = conn
+        self.test = test
+        self.min_items = min_items
+        self.se_target = se_target if se_target is not None else se_after(CAT_TARGET_SHARE * self.max_items)
+        self.randomesque = randomesque
+        self.rng = rng or random.Random()
+        self.shown: List[int] = []
+        self.difficulty: Dict[int, float] = {}
+        self.answered = 0
+        self.exhausted = False
+        self._log_post = list(PRIOR)
+        self.theta, self.se = self._estimate()
+
+    @property
+    def max_items(self) -> int:
+        return max(1, self.test.questions)
+
+    @property
+    def done(self) -> bool:
+        if self.exhausted or self.answered >= self.max_items:
+            return True
+        return self.answered >= self.min_items and self.se <= self.se_target
+
+    # --- выбор вопроса ---
+
+    def _neighbours(self, op: str, order: str, target: float) -> List[Tuple[int, float]]:
+        excluded = ""
+        if self.shown:
+            excluded = f"AND ip.question_id NOT IN ({', '.join('?' for _ in self.shown)})"
+        cur = self.conn.execute(
+            f"""
+            SELECT ip.question_id, ip.p_value FROM item_params ip
+            WHERE ip.test_id = ? AND ip.p_value {op} ? {excluded}
+              AND EXISTS (SELECT 1 FROM answers a WHERE a.question_id = ip.question_id)
+            ORDER BY ip.p_value {order}
+            LIMIT ?
+            """,
+            (self.test.id, target, *self.shown, NEIGHBOURS),
+        )
+        return [(r[0], r[1]) for r in cur]
+
+    def candidates(self) -> List[Tuple[float, int]]:
+        """(трудность, id) ближайших к текущей оценке непоказанных вопросов, лучшие первыми."""
+        # трудность равна theta при доле верных 1 / (1 + e^theta); выше по доле - легче
+        target = 1.0 / (1.0 + math.exp(self.theta))
+        found = self._neighbours(">=", "ASC", target) + self._neighbours("<", "DESC", target)
+        ranked = [(difficulty(p), q_id) for q_id, p in found]
+        ranked.sort(key=lambda c: abs(c[0] - self.theta))
+        return ranked
+
+    def next_item(self) -> Optional[Tuple[Question, List[Answer]]]:
+        """Следующий вопрос с ответами или None, если тест окончен."""
+        if self.done:
+            return None
+        while True:
+            ranked = self.candidates()
+            if not ranked:
+                self.exhausted = True
+                return None
+            # случайный из нескольких лучших, чтобы все не получали одну и ту же цепочку
+            b, question_id = self.rng.choice(ranked[: self.randomesque])
+            found = QuestionRepository(self.conn).load_by_ids([question_id])
+            self.shown.append(question_id)
+            if question_id in found:
+                self.difficulty[question_id] = b
+                return found[question_id]
+
+    # --- оценка уровня ---
+
+    def record(self, question_id: int, correct: bool) -> None:
+        b = self.difficulty[question_id]
+        for i, t in enumerate(GRID):
+            # log P и log (1 - P) без переполнения
+            self._log_post[i] -= math.log1p(math.exp(b - t if correct else t - b))
+        self.answered += 1
+        self.theta, self.se = self._estimate()
+
+    def _estimate(self) -> Tuple[float, float]:
+        top = max(self._log_post)
+        weights = [math.exp(lp - top) for lp in self._log_post]
+        total = sum(weights)
+        mean = sum(w * t for w, t in zip(weights, GRID)) / total
+        var = sum(w * (t - mean) ** 2 for w, t in zip(weights, GRID)) / total
+        return mean, math.sqrt(var)
+
+    def restore(self, shown: Sequence[int], correct: Sequence[Optional[bool]]) -> None:
+        """Повторить уже данные ответы (восстановление после сбоя); None - ещё без ответа."""
+        placeholders = ", ".join("?" for _ in shown)
+        p_values = dict(
+            self.conn.execute(
+                f"SELECT question_id, p_value FROM item_params WHERE question_id IN ({placeholders})",
+                tuple(shown),
+            ).fetchall()
+        )
+        for question_id, ok in zip(shown, correct):
+            self.shown.append(question_id)
+            self.difficulty[question_id] = difficulty(p_values.get(question_id, 0.5))
+            if ok is not None:
+                self.record(question_id, ok)
+
+    # --- итог ---
+
+    def expected_share(self) -> float:
+        """Ожидаемая доля верных по всему банку при текущей оценке уровня."""
+        cur = self.conn.execute(
+            "SELECT round(p_value, 2), count(*) FROM item_params WHERE test_id = ? GROUP BY 1",
+            (self.test.id,),
+        )
+        total = expected = 0.0
+        for p, n in cur:
+            p = min(max(p, P_CLAMP[0]), P_CLAMP[1])
+            expected += n * p_correct(self.theta, difficulty(p))
+            total += n
+        return expected / total if total else 0.0
+
+    def scaled_score(self) -> Tuple[int, int]:
+        """Балл в шкале обычной попытки из test.questions вопросов - чтобы ведомость была сравнима."""
+        if not self.answered:
+            return 0, self.max_items
+        return int(round(self.expected_share() * self.max_items)), self.max_items
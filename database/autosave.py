@@ -0,0 +1,88 @@
+import threading
+from typing import Dict, Optional, Set
+
+from config import AUTOSAVE_INTERVAL
+from database.connection import ConnectionManager
+from database.repo import SessionRepository
+
+
+class WriteBehindSaver(threading.Thread):
+    """Отложенная запись состояния незавершённых попыток.
+
+    submit() только кладёт изменения в словарь: повторные изменения одной сессии
+    склеиваются, и раз в interval секунд все накопленные сессии пишутся одной
+    транзакцией. Интерфейс при этом не ждёт диска.
+    """
+
+    def __init__(self, db: ConnectionManager, interval: float = AUTOSAVE_INTERVAL):
+        super().__init__(daemon=True)
+        self.db = db
+        self.interval = interval
+        self._pending: Dict[int, dict] = {}
+        self._dropped: Set[int] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._in_flight = False
+        self._cycles = 0
+        self.last_error: Optional[BaseException] = None
+
+    def submit(self, session_id: int, **fields) -> None:
+        with self._lock:
+            if session_id in self._dropped:
+                return
+            self._pending.setdefault(session_id, {}).update(fields)
+
+    def discard(self, session_id: int) -> None:
+        """Забыть сессию (завершена или отменена) - её строку удаляет вызывающий."""
+        with self._lock:
+            self._pending.pop(session_id, None)
+            self._dropped.add(session_id)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> None:
+        """Записать всё накопленное и дождаться окончания записи."""
+        if not self.is_alive():
+            self._write_pending()
+            return
+        with self._flushed:
+            # идущая сейчас запись могла взять пачку до последних submit()
+            target = self._cycles + (2 if self._in_flight else 1)
+            self._wake.set()
+            self._flushed.wait_for(lambda: self._cycles >= target, timeout)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                self._write_pending()
+            self._write_pending()
+        finally:
+            self.db.close_thread()
+
+    def _write_pending(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._in_flight = True
+        try:
+            if batch:
+                self.db.run_write(lambda conn: SessionRepository(conn).update_many(batch))
+        except Exception as e:
+            # не теряем изменения: вернём их в очередь, если сессию не успели забыть
+            self.last_error = e
+            with self._lock:
+                for session_id, fields in batch.items():
+                    if session_id not in self._dropped:
+                        self._pending[session_id] = {**fields, **self._pending.get(session_id, {})}
+        finally:
+            with self._flushed:
+                self._in_flight = False
+                self._cycles += 1
+                self._flushed.notify_all()
@@ -0,0 +1,143 @@
+import bisect
+import random
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from database.models import Answer, Question
+
+
+class TestPack:
+    """Банк вопросов теста в компактном виде: массивы вместо объекта на каждую строку.
+
+    Ответы вопроса i лежат в a_* с индексами a_offsets[i]..a_offsets[i + 1].
+    Объекты Question/Answer создаются только для вопросов, выбранных в сессию.
+    version - change_counters['tests'] на момент загрузки: импорт и правка теста его меняют.
+    """
+
+    __slots__ = ("test_id", "version", "q_ids", "q_texts", "a_offsets", "a_ids", "a_texts", "a_correct", "nbytes")
+
+    def __init__(self, test_id: int, rows: Iterable[tuple], version: Optional[int] = None):
+        """rows: (question_id, q_text, answer_id, a_text, is_correct), упорядочены по question_id."""
+        self.test_id = test_id
+        self.version = version
+        self.q_ids = array("q")
+        self.a_offsets = array("l", [0])
+        self.a_ids = array("q")
+        self.a_correct = bytearray()
+        q_texts, a_texts = [], []
+
+        for q_id, q_text, a_id, a_text, is_correct in rows:
+            if not self.q_ids or self.q_ids[-1] != q_id:
+                if self.q_ids:
+                    self.a_offsets.append(len(self.a_ids))
+                self.q_ids.append(q_id)
+                q_texts.append(q_text)
+            self.a_ids.append(a_id)
+            a_texts.append(a_text)
+            self.a_correct.append(1 if is_correct else 0)
+        if self.q_ids:
+            self.a_offsets.append(len(self.a_ids))
+
+        self.q_texts = tuple(q_texts)
+        self.a_texts = tuple(a_texts)
+        self.nbytes = (
+            sum(sys.getsizeof(t) for t in self.q_texts)
+            + sum(sys.getsizeof(t) for t in self.a_texts)
+            + sys.getsizeof(self.q_texts)
+            + sys.getsizeof(self.a_texts)
+            + self.q_ids.itemsize * len(self.q_ids)
+            + self.a_offsets.itemsize * len(self.a_offsets)
+            + self.a_ids.itemsize * len(self.a_ids)
+            + len(self.a_correct)
+        )
+
+    def __len__(self) -> int:
+        return len(self.q_ids)
+
+    def question(self, i: int) -> Tuple[Question, List[Answer]]:
+        q_id = self.q_ids[i]
+        answers = [
+            Answer(id=self.a_ids[j], question_id=q_id, a_text=self.a_texts[j], is_correct=bool(self.a_correct[j]))
+            for j in range(self.a_offsets[i], self.a_offsets[i + 1])
+        ]
+        return Question(id=q_id, test_id=self.test_id, q_text=self.q_texts[i]), answers
+
+    def by_ids(self, question_ids: Sequence[int]) -> Dict[int, Tuple[Question, List[Answer]]]:
+        """Как QuestionRepository.load_by_ids, но из памяти; id, которых в пачке нет, пропускаются."""
+        found = {}
+        for q_id in question_ids:
+            i = bisect.bisect_left(self.q_ids, q_id)
+            if i < len(self.q_ids) and self.q_ids[i] == q_id:
+                found[q_id] = self.question(i)
+        return found
+
+    def sample(self, k: int, rng: Optional[random.Random] = None) -> List[Tuple[Question, List[Answer]]]:
+        """k случайных вопросов в случайном порядке."""
+        rng = rng or random
+        picked = rng.sample(range(len(self)), min(k, len(self)))
+        return [self.question(i) for i in picked]
+
+
+class TestPackCache:
+    """LRU кэш банков вопросов, ограниченный по памяти."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._packs: "OrderedDict[int, TestPack]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, test_id: int) -> Optional[TestPack]:
+        with self._lock:
+            pack = self._packs.get(test_id)
+            if pack is None:
+                self.misses += 1
+                return None
+            self._packs.move_to_end(test_id)
+            self.hits += 1
+            return pack
+
+    def put(self, pack: TestPack) -> None:
+        with self._lock:
+            old = self._packs.pop(pack.test_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            if pack.nbytes > self.max_bytes:
+                return
+            self._packs[pack.test_id] = pack
+            self._bytes += pack.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._packs.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def get_or_load(self, test_id: int, loader: Callable[[], TestPack], version: Optional[int] = None) -> TestPack:
+        """Пачка из кэша; при другом version (тест правили, в том числе с другого компьютера) - заново."""
+        pack = self.get(test_id)
+        if pack is None or pack.version != version:
+            pack = loader()
+            self.put(pack)
+        return pack
+
+    def invalidate(self, test_id: int) -> None:
+        with self._lock:
+            pack = self._packs.pop(test_id, None)
+            if pack is not None:
+                self._bytes -= pack.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._packs.clear()
+            self._bytes = 0
+
+
+# общий для процесса кэш: менеджер тестов сбрасывает записи при импорте, правке и удалении
+test_pack_cache = TestPackCache()
@@ -0,0 +1,74 @@
+import bisect
+import sqlite3
+from dataclasses import fields
+from typing import Dict, List, Optional, Tuple
+
+from database.models import Test
+
+# колонки tests в порядке полей Test
+COLUMNS = tuple(f.name for f in fields(Test))
+
+
+class TestCatalog:
+    """Каталог тестов в памяти, общий для всех экранов.
+
+    Перечитывается, только если tests действительно менялись: сначала сверяются
+    PRAGMA data_version (коммиты других соединений, в том числе с других компьютеров)
+    и total_changes своего соединения, и лишь если что-то изменилось - счётчик
+    change_counters['tests'], который ведут триггеры на tests.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.tests: List[Test] = []  # по id
+        self._ids: List[int] = []
+        self._by_id: Dict[int, Test] = {}
+        self._by_name: Dict[str, Test] = {}
+        self._sorted_by_name: Optional[List[Test]] = None
+        self._marker: Optional[Tuple[int, int]] = None
+        self._version: Optional[int] = None
+        self.reloads = 0
+
+    def _changed(self) -> bool:
+        marker = (self.conn.execute("PRAGMA data_version").fetchone()[0], self.conn.total_changes)
+        if marker == self._marker:
+            return False
+        self._marker = marker
+        version = self.conn.execute("SELECT version FROM change_counters WHERE name = 'tests'").fetchone()[0]
+        if version == self._version:
+            return False
+        self._version = version
+        return True
+
+    def refresh(self) -> bool:
+        """Перечитать каталог, если он изменился; True - если перечитали."""
+        if not self._changed():
+            return False
+        cur = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM tests ORDER BY id")
+        self.tests = [Test(*r) for r in cur]
+        self._ids = [t.id for t in self.tests]
+        self._by_id = {t.id: t for t in self.tests}
+        self._by_name = {t.name: t for t in self.tests}
+        self._sorted_by_name = None
+        self.reloads += 1
+        return True
+
+    def get(self, test_id: int) -> Optional[Test]:
+        self.refresh()
+        return self._by_id.get(test_id)
+
+    def by_name(self, name: str) -> Optional[Test]:
+        self.refresh()
+        return self._by_name.get(name)
+
+    def page(self, limit: int, after: Optional[tuple] = None) -> List[Test]:
+        """Страница по id после ключа after = (id,) - замена TestRepository.find_page для списков."""
+        self.refresh()
+        start = bisect.bisect_right(self._ids, after[-1]) if after else 0
+        return self.tests[start:start + limit]
+
+    def sorted_by_name(self) -> List[Test]:
+        self.refresh()
+        if self._sorted_by_name is None:
+            self._sorted_by_name = sorted(self.tests, key=lambda t: t.name)
+        return self._sorted_by_name
@@ -0,0 +1,119 @@
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, TypeVar
+
+from config import DB_NAME, DB_WRITE_RETRIES
+from database.db import get_connection
+from database.instrument import instruments
+
+
+R = TypeVar("R")
+
+
+def is_busy_error(error: BaseException) -> bool:
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_on_busy(
+    func: Callable[[], R],
+    retries: int = DB_WRITE_RETRIES,
+    delay: float = 0.05,
+) -> R:
+    """Повторить func при "database is locked" с экспоненциальной задержкой."""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == retries:
+                raise
+            time.sleep(delay * (2 ** attempt) * (1 + random.random()))
+    raise AssertionError("unreachable")
+
+
+class ConnectionManager:
+    """Соединения по потокам с разделением на чтение и запись.
+
+    Каждый поток получает своё соединение для записи и своё (query_only) для чтения,
+    поэтому фоновый импорт, автосохранение и интерфейс не делят один sqlite3.Connection.
+    Запись внутри процесса дополнительно сериализуется блокировкой, чтобы потоки
+    не упирались в busy_timeout друг друга.
+    """
+
+    def __init__(self, db_path: str = DB_NAME, retries: int = DB_WRITE_RETRIES):
+        self.db_path = db_path
+        self.retries = retries
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._all: List[sqlite3.Connection] = []
+        self._all_lock = threading.Lock()
+
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        conn = get_connection(self.db_path, check_same_thread=False, readonly=readonly)
+        if instruments.enabled:
+            instruments.attach(conn)
+        with self._all_lock:
+            self._all.append(conn)
+        return conn
+
+    def connections(self) -> List[sqlite3.Connection]:
+        with self._all_lock:
+            return list(self._all)
+
+    def writer(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "writer", None)
+        if conn is None:
+            conn = self._local.writer = self._open(readonly=False)
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        # у базы в памяти у каждого соединения своя копия - читаем через writer
+        if self.db_path == ":memory:":
+            return self.writer()
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            conn = self._local.reader = self._open(readonly=True)
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи: commit при успехе, rollback при исключении."""
+        conn = self.writer()
+        with self._write_lock:
+            with conn:
+                yield conn
+
+    def run_write(self, func: Callable[[sqlite3.Connection], R]) -> R:
+        """Выполнить func(conn) в транзакции, повторяя её целиком при блокировке."""
+
+        def attempt():
+            with self.write() as conn:
+                return func(conn)
+
+        return retry_on_busy(attempt, retries=self.retries)
+
+    def close_thread(self) -> None:
+        """Закрыть соединения текущего потока (вызывать при завершении фоновых потоков)."""
+        for attr in ("writer", "reader"):
+            conn = getattr(self._local, attr, None)
+            if conn is not None:
+                setattr(self._local, attr, None)
+                with self._all_lock:
+                    if conn in self._all:
+                        self._all.remove(conn)
+                conn.close()
+
+    def close_all(self) -> None:
+        with self._all_lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
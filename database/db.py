@@ -1,61 +1,32 @@
 import sqlite3
 
-from config import DB_NAME
+from config import DB_NAME, DB_JOURNAL_MODE, DB_BUSY_TIMEOUT_MS, DB_CACHED_STATEMENTS
+from database.migrations import migrate
 
 
-def get_connection(db_path: str = DB_NAME) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
+def get_connection(
+    db_path: str = DB_NAME,
+    check_same_thread: bool = True,
+    readonly: bool = False,
+) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        db_path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_CACHED_STATEMENTS,
+        check_same_thread=check_same_thread,
+    )
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)};")
+    if db_path != ":memory:":
+        mode = conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE};").fetchone()[0]
+        if mode.lower() == "wal":
+            conn.execute("PRAGMA synchronous = NORMAL;")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON;")
     return conn
 
 
 def init_db(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS tests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            description TEXT,
-            questions INTEGER NOT NULL,
-            time_limit INTEGER NOT NULL
-        );
-        
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            test_id INTEGER NOT NULL,
-            q_text TEXT NOT NULL,
-            FOREIGN KEY (test_id)
-                REFERENCES tests(id)
-                ON DELETE CASCADE
-                ON UPDATE CASCADE
-        );
-        
-        CREATE TABLE IF NOT EXISTS answers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            question_id INTEGER NOT NULL,
-            a_text TEXT NOT NULL,
-            is_correct BOOLEAN NOT NULL,
-            FOREIGN KEY (question_id)
-                REFERENCES questions(id)
-                ON DELETE CASCADE
-                ON UPDATE CASCADE
-        );
-        
-        CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            test_id INTEGER NOT NULL,
-            user_name TEXT NOT NULL,
-            group_name TEXT,
-            score INTEGER NOT NULL,
-            max_score INTEGER NOT NULL,
-            time_taken INTEGER NOT NULL,
-            taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (test_id)
-                REFERENCES tests(id)
-                ON DELETE CASCADE
-                ON UPDATE CASCADE
-        );
-        """
-    )
-    conn.commit()
+    """Привести схему к актуальной версии (ничего не делает, если она уже актуальна)."""
+    migrate(conn)
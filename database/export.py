@@ -0,0 +1,172 @@
+import csv
+import os
+import sqlite3
+from typing import Iterator, Optional, Sequence
+
+LEDGER_COLUMNS = (
+    "result_id",
+    "test_name",
+    "user_name",
+    "group_name",
+    "score",
+    "max_score",
+    "percent",
+    "time_taken",
+    "taken_at",
+)
+
+# строк на листе Excel вместе с заголовком
+XLSX_MAX_ROWS = 1_048_576
+
+FORMATS = {
+    ".csv": "csv",
+    ".xlsx": "xlsx",
+    ".parquet": "parquet",
+}
+
+
+def iter_ledger(
+    conn: sqlite3.Connection,
+    test_id: Optional[int] = None,
+    group_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    batch_size: int = 1000,
+) -> Iterator[Sequence[tuple]]:
+    """Ведомость (results + tests) пачками прямо из курсора, без сборки списков Result.
+
+    date_from/date_to - строки 'YYYY-MM-DD[ HH:MM:SS]' в UTC, как хранится taken_at;
+    date_to без времени включает весь день.
+    """
+    where, params = [], []
+    if test_id is not None:
+        where.append("r.test_id = ?")
+        params.append(test_id)
+    if group_name is not None:
+        where.append("ifnull(r.group_name, '') = ?")
+        params.append(group_name)
+    if date_from:
+        where.append("r.taken_at >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("r.taken_at < ?" if len(date_to) > 10 else "r.taken_at < date(?, '+1 day')")
+        params.append(date_to)
+
+    cur = conn.execute(
+        f"""
+        SELECT
+            r.id, t.name, r.user_name, ifnull(r.group_name, ''), r.score, r.max_score,
+            round(CASE WHEN r.max_score > 0 THEN r.score * 100.0 / r.max_score ELSE 0 END, 1),
+            r.time_taken, r.taken_at
+        FROM results r
+        JOIN tests t ON t.id = r.test_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY r.id
+        """,
+        params,
+    )
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [tuple(r) for r in rows]
+    finally:
+        cur.close()
+
+
+def write_csv(path: str, batches) -> int:
+    count = 0
+    # utf-8-sig - чтобы Excel открывал кириллицу без мастера импорта
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(LEDGER_COLUMNS)
+        for batch in batches:
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def write_xlsx(path: str, batches, max_rows: int = XLSX_MAX_ROWS) -> int:
+    """Ведомость, не поместившаяся на лист Excel, продолжается на листах "Ведомость 2", "Ведомость 3"..."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError("Для экспорта в XLSX нужен openpyxl: pip install openpyxl")
+
+    # write_only пишет строки сразу в файл и не держит лист в памяти
+    wb = Workbook(write_only=True)
+    ws, sheets, free = None, 0, 0
+    count = 0
+    for batch in batches:
+        for row in batch:
+            if not free:
+                sheets += 1
+                ws = wb.create_sheet("Ведомость" if sheets == 1 else f"Ведомость {sheets}")
+                ws.append(LEDGER_COLUMNS)
+                free = max_rows - 1
+            ws.append(row)
+            free -= 1
+        count += len(batch)
+    if ws is None:
+        wb.create_sheet("Ведомость").append(LEDGER_COLUMNS)
+    wb.save(path)
+    return count
+
+
+def write_parquet(path: str, batches) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Для экспорта в Parquet нужен pyarrow: pip install pyarrow")
+
+    schema = pa.schema(
+        [
+            ("result_id", pa.int64()),
+            ("test_name", pa.string()),
+            ("user_name", pa.string()),
+            ("group_name", pa.string()),
+            ("score", pa.int32()),
+            ("max_score", pa.int32()),
+            ("percent", pa.float32()),
+            ("time_taken", pa.int32()),
+            ("taken_at", pa.string()),
+        ]
+    )
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches:
+            columns = [pa.array(c, type=f.type) for c, f in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            count += len(batch)
+    return count
+
+
+WRITERS = {
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+    "parquet": write_parquet,
+}
+
+
+def format_for_path(path: str) -> str:
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Неизвестный формат файла: {path} (поддерживаются {', '.join(FORMATS)})")
+    return fmt
+
+
+def export_ledger(
+    conn: sqlite3.Connection,
+    path: str,
+    fmt: Optional[str] = None,
+    test_id: Optional[int] = None,
+    group_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> int:
+    """Выгрузить ведомость в файл; возвращает число строк. Память не зависит от размера ведомости."""
+    writer = WRITERS[fmt or format_for_path(path)]
+    batches = iter_ledger(conn, test_id, group_name, date_from, date_to)
+    return writer(path, batches)
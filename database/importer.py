@@ -0,0 +1,389 @@
+import difflib
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database.connection import ConnectionManager, retry_on_busy
+from database.repo import AnswerRepository, QuestionRepository, TestRepository
+
+
+QUESTION_TAG = "<question>"
+VARIANT_TAG = "<variant>"
+
+ProgressCallback = Callable[[int, int], None]
+
+# вопрос на той же позиции считается правкой старого, если текст похож хотя бы настолько
+# (difflib ratio) или совпадает не меньше половины вариантов
+SIMILAR_TEXT = 0.6
+
+
+@dataclass
+class ParsedQuestion:
+    q_text: str
+    answers: List[str]  # первый вариант - правильный
+
+    @property
+    def content_hash(self) -> str:
+        return question_hash(self.q_text, self.answers)
+
+
+@dataclass
+class ImportStats:
+    test_id: int
+    questions: int
+    answers: int
+    elapsed: float
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    @property
+    def rows(self) -> int:
+        """Сколько строк реально записано."""
+        return 1 + self.added + self.changed + self.removed + self.answers
+
+    def summary(self) -> str:
+        return (
+            f"добавлено {self.added}, изменено {self.changed}, "
+            f"удалено {self.removed}, без изменений {self.unchanged}"
+        )
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else float(self.rows)
+
+
+def question_hash(q_text: str, answers: List[str]) -> str:
+    """Хэш блока вопроса: текст и варианты в исходном порядке (первый - правильный)."""
+    h = hashlib.sha1(q_text.encode("utf-8"))
+    for a_text in answers:
+        h.update(b"\x00")
+        h.update(a_text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def parse_txt(content: str) -> List[ParsedQuestion]:
+    """Разбор TXT в формате <question>/<variant>. Вопросы без ответов пропускаются."""
+    parsed = []
+    for block in content.split(QUESTION_TAG):
+        lines = [l.strip() for l in block.splitlines() if l.strip()]
+        if not lines:
+            continue
+
+        answers = []
+        for l in lines[1:]:
+            if not l.startswith(VARIANT_TAG):
+                continue
+            a_text = l[len(VARIANT_TAG):].strip()
+            if a_text:
+                answers.append(a_text)
+
+        if answers:
+            parsed.append(ParsedQuestion(q_text=lines[0], answers=answers))
+    return parsed
+
+
+def read_txt(path: str) -> List[ParsedQuestion]:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_txt(f.read())
+
+
+class TxtImporter:
+    """Запись теста, вопросов и ответов одной транзакцией с пакетной вставкой."""
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = 500):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.tests_repo = TestRepository(conn)
+        self.questions_repo = QuestionRepository(conn)
+        self.answers_repo = AnswerRepository(conn)
+
+    def import_test(
+        self,
+        questions: List[ParsedQuestion],
+        name: str,
+        description: Optional[str],
+        questions_count: Optional[int],
+        time_limit: Optional[int],
+        test_id: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> ImportStats:
+        """Новый тест пишется целиком, существующий - только разницей по хэшам вопросов.
+
+        У существующего теста description, questions_count и time_limit, равные None,
+        не меняются; для нового теста questions_count и time_limit обязательны.
+        """
+        started = time.perf_counter()
+
+        with self.tests_repo.transaction():
+            if test_id is not None:
+                self.conn.execute(
+                    """
+                    UPDATE tests SET name = ?, description = coalesce(?, description),
+                        questions = coalesce(?, questions), time_limit = coalesce(?, time_limit)
+                    WHERE id = ?
+                    """,
+                    (name, description, questions_count, time_limit, test_id),
+                )
+                stats = self._apply_diff(test_id, questions, progress)
+            else:
+                test_id = self.tests_repo.create(
+                    {
+                        "name": name,
+                        "description": description,
+                        "questions": questions_count,
+                        "time_limit": time_limit,
+                    }
+                ).id
+                stats = ImportStats(test_id=test_id, questions=len(questions), answers=0, elapsed=0.0)
+                stats.answers = self._insert_questions(test_id, questions, progress)
+                stats.added = len(questions)
+
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _existing_hashes(self, test_id: int) -> Dict[int, tuple]:
+        """id -> (q_text, content_hash); у вопросов от старых версий хэш досчитывается."""
+        existing = {
+            row["id"]: (row["q_text"], row["content_hash"])
+            for row in self.conn.execute(
+                "SELECT id, q_text, content_hash FROM questions WHERE test_id = ?",
+                (test_id,),
+            )
+        }
+        legacy = [qid for qid, (_, h) in existing.items() if h is None]
+        if not legacy:
+            return existing
+
+        answers = defaultdict(list)
+        for row in self.conn.execute(
+            """
+            SELECT a.question_id, a.a_text FROM answers a
+            JOIN questions q ON q.id = a.question_id
+            WHERE q.test_id = ? AND q.content_hash IS NULL
+            ORDER BY a.question_id, a.is_correct DESC, a.id
+            """,
+            (test_id,),
+        ):
+            answers[row["question_id"]].append(row["a_text"])
+
+        backfill = []
+        for qid in legacy:
+            q_text = existing[qid][0]
+            h = question_hash(q_text, answers[qid])
+            existing[qid] = (q_text, h)
+            backfill.append((h, qid))
+        self.conn.executemany("UPDATE questions SET content_hash = ? WHERE id = ?", backfill)
+        return existing
+
+    def _apply_diff(
+        self,
+        test_id: int,
+        questions: List[ParsedQuestion],
+        progress: Optional[ProgressCallback],
+    ) -> ImportStats:
+        existing = self._existing_hashes(test_id)
+        order = sorted(existing)  # позиции вопросов в банке
+        stats = ImportStats(test_id=test_id, questions=len(questions), answers=0, elapsed=0.0)
+
+        by_hash = defaultdict(list)
+        for qid, (_, h) in existing.items():
+            by_hash[h].append(qid)
+
+        pending = []  # (позиция в файле, вопрос)
+        for i, q in enumerate(questions):
+            ids = by_hash.get(q.content_hash)
+            if ids:
+                existing.pop(ids.pop())
+                stats.unchanged += 1
+            else:
+                pending.append((i, q))
+
+        changed, added = self._match_changed(test_id, pending, existing, order)
+
+        removed = list(existing)
+        if removed:
+            self.conn.executemany("DELETE FROM answers WHERE question_id = ?", [(i,) for i in removed])
+            self.conn.executemany("DELETE FROM questions WHERE id = ?", [(i,) for i in removed])
+
+        if changed:
+            stats.answers += self._update_changed(changed)
+
+        stats.answers += self._insert_questions(test_id, added, progress)
+        stats.added, stats.changed, stats.removed = len(added), len(changed), len(removed)
+        return stats
+
+    def _match_changed(
+        self,
+        test_id: int,
+        pending: List[Tuple[int, ParsedQuestion]],
+        existing: Dict[int, tuple],
+        order: List[int],
+    ) -> Tuple[List[tuple], List[ParsedQuestion]]:
+        """Правленые вопросы: тот же текст, тот же набор вариантов или та же позиция в банке
+        при похожем тексте или вариантах.
+
+        Такие вопросы обновляются на месте, чтобы история ответов (responses) осталась при них;
+        найденные убираются из existing. Возвращает ([(id, вопрос, старые ответы)], новые вопросы).
+        """
+        if not pending or not existing:
+            return [], [q for _, q in pending]
+
+        answers = defaultdict(list)  # id вопроса -> [(id, a_text)], правильный первым
+        for row in self.conn.execute(
+            """
+            SELECT a.question_id, a.id, a.a_text FROM answers a
+            JOIN questions q ON q.id = a.question_id
+            WHERE q.test_id = ?
+            ORDER BY a.question_id, a.is_correct DESC, a.id
+            """,
+            (test_id,),
+        ):
+            if row["question_id"] in existing:
+                answers[row["question_id"]].append((row["id"], row["a_text"]))
+
+        by_text, by_answers = defaultdict(list), defaultdict(list)
+        for qid, (q_text, _) in existing.items():
+            by_text[q_text].append(qid)
+            by_answers[tuple(sorted(a_text for _, a_text in answers[qid]))].append(qid)
+
+        matched: Dict[int, int] = {}  # позиция в файле -> id вопроса
+        for index, key_of in ((by_text, lambda q: q.q_text), (by_answers, lambda q: tuple(sorted(q.answers)))):
+            for i, q in pending:
+                ids = index.get(key_of(q))
+                while i not in matched and ids:
+                    qid = ids.pop()
+                    if existing.pop(qid, None) is not None:
+                        matched[i] = qid
+        for i, q in pending:
+            qid = order[i] if i < len(order) else None
+            if i not in matched and qid in existing and self._similar(q, existing[qid][0], answers[qid]):
+                existing.pop(qid)
+                matched[i] = qid
+
+        changed = [(matched[i], q, answers[matched[i]]) for i, q in pending if i in matched]
+        return changed, [q for i, q in pending if i not in matched]
+
+    @staticmethod
+    def _similar(q: ParsedQuestion, q_text: str, answers: List[tuple]) -> bool:
+        shared = len(set(q.answers) & {a_text for _, a_text in answers})
+        if 2 * shared >= max(len(q.answers), len(answers)):
+            return True
+        return difflib.SequenceMatcher(None, q.q_text, q_text).ratio() >= SIMILAR_TEXT
+
+    def _update_changed(self, changed: List[tuple]) -> int:
+        """Обновить вопросы и их ответы на месте; ответы сопоставляются по тексту, затем по порядку."""
+        self.conn.executemany(
+            "UPDATE questions SET q_text = ?, content_hash = ? WHERE id = ?",
+            [(q.q_text, q.content_hash, qid) for qid, q, _ in changed],
+        )
+        updates, inserts, deletes = [], [], []
+        for qid, q, old in changed:
+            rows = self._answer_rows(qid, q)
+            free = dict(old)  # id -> текст ещё не занятых старых ответов
+            slots: List[Optional[int]] = []
+            for row in rows:
+                same = next((a_id for a_id, a_text in free.items() if a_text == row["a_text"]), None)
+                if same is not None:
+                    del free[same]
+                slots.append(same)
+            rest = iter(list(free))
+            for row, slot in zip(rows, slots):
+                a_id = slot if slot is not None else next(rest, None)
+                free.pop(a_id, None)
+                if a_id is None:
+                    inserts.append(row)
+                else:
+                    updates.append((row["a_text"], row["is_correct"], a_id))
+            deletes += [(a_id,) for a_id in free]
+
+        self.conn.executemany("UPDATE answers SET a_text = ?, is_correct = ? WHERE id = ?", updates)
+        self.conn.executemany("DELETE FROM answers WHERE id = ?", deletes)
+        return len(updates) + self.answers_repo.bulk_create(inserts)
+
+    def _insert_questions(
+        self,
+        test_id: int,
+        questions: List[ParsedQuestion],
+        progress: Optional[ProgressCallback],
+    ) -> int:
+        total = len(questions)
+        answers_written = 0
+        for start in range(0, total, self.batch_size):
+            batch = questions[start:start + self.batch_size]
+            ids = self.questions_repo.create_many(
+                [{"test_id": test_id, "q_text": q.q_text, "content_hash": q.content_hash} for q in batch]
+            )
+            answers_written += self.answers_repo.bulk_create(
+                [row for qid, q in zip(ids, batch) for row in self._answer_rows(qid, q)]
+            )
+            if progress:
+                progress(start + len(batch), total)
+
+        if progress and not total:
+            progress(0, 0)
+        return answers_written
+
+    @staticmethod
+    def _answer_rows(question_id: int, q: ParsedQuestion) -> List[dict]:
+        return [
+            {"question_id": question_id, "a_text": a_text, "is_correct": int(j == 0)}
+            for j, a_text in enumerate(q.answers)
+        ]
+
+
+class ImportJob(threading.Thread):
+    """Импорт в фоновом потоке со своим соединением из ConnectionManager.
+
+    Колбэки вызываются из рабочего потока - в Tk их нужно передавать через очередь/after.
+    """
+
+    def __init__(
+        self,
+        questions: List[ParsedQuestion],
+        name: str,
+        description: Optional[str],
+        questions_count: int,
+        time_limit: int,
+        test_id: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        on_done: Optional[Callable[[Optional[ImportStats], Optional[BaseException]], None]] = None,
+        db: Optional[ConnectionManager] = None,
+    ):
+        super().__init__(daemon=True)
+        self.questions = questions
+        self.name_ = name
+        self.description = description
+        self.questions_count = questions_count
+        self.time_limit = time_limit
+        self.test_id = test_id
+        self.progress = progress
+        self.on_done = on_done
+        self.db = db or ConnectionManager()
+
+    def run(self):
+        stats, error = None, None
+        importer = TxtImporter(self.db.writer())
+        try:
+            stats = retry_on_busy(
+                lambda: importer.import_test(
+                    self.questions,
+                    self.name_,
+                    self.description,
+                    self.questions_count,
+                    self.time_limit,
+                    test_id=self.test_id,
+                    progress=self.progress,
+                )
+            )
+        except BaseException as e:
+            error = e
+        finally:
+            self.db.close_thread()
+        if self.on_done:
+            self.on_done(stats, error)
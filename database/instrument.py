@@ -0,0 +1,242 @@
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import DIAG_SLOW_MS, DIAG_SLOW_LOG_SIZE
+
+# верхние границы корзин гистограммы, мс: 0.05, 0.1, 0.2 ... ~26 с, последняя - всё, что дольше
+BUCKET_BOUNDS = tuple(0.05 * 2 ** i for i in range(20))
+
+# контекстные менеджеры и мелочи, замер которых ничего не говорит
+SKIP_METHODS = {"transaction", "page_key"}
+
+# сколько последних SQL медленного вызова попадает в журнал
+SLOW_SQL_KEEP = 20
+
+
+class LatencyHistogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, ms)] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Верхняя граница корзины, в которую попадает p-й процентиль (оценка сверху)."""
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip([*map(str, BUCKET_BOUNDS), "inf"], self.buckets)),
+        }
+
+
+class Instrumentation:
+    """Замеры времени методов репозиториев и переходов между экранами.
+
+    Выключенная ничего не стоит: enable() подменяет методы классов обёртками с замером
+    и ставит trace callback на соединения, disable() возвращает всё как было.
+    Для вызовов дольше slow_ms в журнал попадают все выполненные ими SQL с параметрами.
+    """
+
+    def __init__(self, slow_ms: float = DIAG_SLOW_MS, slow_log_size: int = DIAG_SLOW_LOG_SIZE):
+        self.slow_ms = slow_ms
+        self.enabled = False
+        self.stats: Dict[str, LatencyHistogram] = {}
+        self.slow_log: deque = deque(maxlen=slow_log_size)
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._patched: List[Tuple[type, str, object]] = []
+        self._connections: List[object] = []
+
+    # --- запись ---
+
+    def record(self, name: str, ms: float) -> None:
+        with self._lock:
+            hist = self.stats.get(name)
+            if hist is None:
+                hist = self.stats[name] = LatencyHistogram()
+            hist.add(ms)
+
+    def _trace(self, sql: str) -> None:
+        statements = getattr(self._local, "statements", None)
+        # "-- ..." - внутренние операторы триггеров и FTS
+        if statements is not None and not sql.startswith("--"):
+            statements.append(sql)
+
+    def _wrap(self, name: str, func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func):
+            return func  # ленивые итераторы (iter_all) меряются вызывающим кодом
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = getattr(self._local, "statements", None)
+            # executemany вызывает trace на каждую строку - храним только последние
+            statements = self._local.statements = deque(maxlen=SLOW_SQL_KEEP)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                ms = (time.perf_counter() - started) * 1000
+                self._local.statements = outer
+                if outer is not None:
+                    outer.extend(statements)  # SQL вложенного вызова видит и внешний
+                self.record(name, ms)
+                if ms >= self.slow_ms:
+                    with self._lock:
+                        self.slow_log.append(
+                            {
+                                "name": name,
+                                "ms": round(ms, 3),
+                                "at": datetime.now().isoformat(timespec="seconds"),
+                                "thread": threading.current_thread().name,
+                                "sql": list(statements),
+                            }
+                        )
+
+        wrapper.__instrumented__ = func
+        return wrapper
+
+    # --- включение ---
+
+    def instrument_class(self, cls: type, methods: Optional[Iterable[str]] = None, prefix: str = "") -> None:
+        """Обернуть методы cls (по умолчанию все публичные, включая унаследованные)."""
+        if methods is None:
+            methods = {
+                name
+                for klass in cls.__mro__
+                if klass.__module__.startswith(("database.", "windows.")) or klass is cls
+                for name, value in vars(klass).items()
+                if not name.startswith("_") and name not in SKIP_METHODS and inspect.isfunction(value)
+            }
+        for name in methods:
+            original = getattr(cls, name, None)
+            if original is None or hasattr(original, "__instrumented__"):
+                continue
+            # метод базового класса оборачивается на подклассе, чтобы имя было точным
+            self._patched.append((cls, name, vars(cls).get(name)))
+            label = f"{prefix}{name}" if prefix else f"{cls.__name__}.{name}"
+            setattr(cls, name, self._wrap(label, original))
+
+    def attach(self, conn) -> None:
+        """Собирать SQL этого соединения для журнала медленных вызовов."""
+        conn.set_trace_callback(self._trace)
+        self._connections.append(conn)
+
+    def enable(self, classes: Optional[Iterable[type]] = None, connections: Iterable[object] = ()) -> None:
+        """Включить замеры; classes=None - все классы доступа к данным (repository_classes)."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.started_at = time.time()
+        for cls in repository_classes() if classes is None else classes:
+            self.instrument_class(cls)
+        for conn in connections:
+            self.attach(conn)
+
+    def disable(self) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        for cls, name, original in reversed(self._patched):
+            if original is None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, original)
+        self._patched = []
+        for conn in self._connections:
+            try:
+                conn.set_trace_callback(None)
+            except Exception:
+                pass  # соединение уже закрыто
+        self._connections = []
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+            self.slow_log.clear()
+        self.started_at = time.time() if self.enabled else None
+
+    # --- отчёт ---
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "enabled_since": (
+                    datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds") if self.started_at else None
+                ),
+                "slow_ms": self.slow_ms,
+                "stats": {name: h.to_dict() for name, h in sorted(self.stats.items())},
+                "slow_log": list(self.slow_log),
+            }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+# общий для процесса экземпляр
+instruments = Instrumentation()
+
+
+def repository_classes() -> List[type]:
+    """Все классы доступа к данным, методы которых стоит мерить."""
+    from database.catalog import TestCatalog
+    from database.importer import TxtImporter
+    from database.repo import (
+        AnswerRepository,
+        QuestionRepository,
+        ResponseRepository,
+        ResultRepository,
+        SearchRepository,
+        SessionRepository,
+        TestRepository,
+    )
+    from database.stats import StatsRepository
+
+    return [
+        TestRepository,
+        QuestionRepository,
+        AnswerRepository,
+        ResultRepository,
+        ResponseRepository,
+        SessionRepository,
+        SearchRepository,
+        StatsRepository,
+        TxtImporter,
+        TestCatalog,
+    ]
@@ -0,0 +1,169 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # анализ вопросов - необязательная возможность
+    np = None
+
+
+@dataclass
+class ItemStats:
+    question_id: int
+    n: int  # сколько раз вопрос попадался
+    difficulty: float  # доля правильных ответов (p-value): 1.0 - все ответили верно
+    discrimination: float  # точечно-бисериальная корреляция с долей верных по остальным вопросам
+    omitted: int  # без ответа
+
+
+@dataclass
+class DistractorStats:
+    question_id: int
+    answer_id: int
+    is_correct: bool
+    n: int
+    share: float  # доля выбравших среди тех, кому попался вопрос
+    mean_score: float  # средняя доля верных у выбравших (по всей попытке)
+
+
+@dataclass
+class ItemAnalysis:
+    test_id: int
+    attempts: int
+    items: List[ItemStats]
+    distractors: List[DistractorStats]
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для анализа вопросов нужен numpy: pip install numpy")
+
+
+def analyze_test(conn: sqlite3.Connection, test_id: int) -> ItemAnalysis:
+    """Трудность, дискриминативность и статистика дистракторов по всем вопросам теста.
+
+    Матрица ответов хранится разреженно (одна запись на показанный вопрос), все
+    агрегаты считаются группировкой через np.bincount без циклов по строкам.
+    Адаптивные попытки не учитываются: вопросы в них подобраны под уровень
+    тестируемого, и доля верных ответов не отражает трудность вопроса.
+    """
+    _require_numpy()
+
+    # ответ: id варианта; 0 - без ответа; -1 - вариант уже удалён из банка. Если ссылку обнулила
+    # правка банка, вариант ищется по сохранённому тексту; удалённый вопрос - question_id 0
+    rows = conn.execute(
+        """
+        SELECT resp.result_id, ifnull(resp.question_id, 0),
+               CASE WHEN resp.answer_id IS NULL AND resp.answer_text IS NULL THEN 0
+                    ELSE coalesce(
+                        resp.answer_id,
+                        (SELECT a.id FROM answers a
+                         WHERE a.question_id = resp.question_id AND a.a_text = resp.answer_text LIMIT 1),
+                        -1
+                    )
+               END,
+               resp.is_correct
+        FROM results r
+        JOIN responses resp ON resp.result_id = r.id
+        WHERE r.test_id = ? AND NOT r.adaptive
+        """,
+        (test_id,),
+    ).fetchall()
+    if not rows:
+        return ItemAnalysis(test_id=test_id, attempts=0, items=[], distractors=[])
+
+    data = np.array([tuple(r) for r in rows], dtype=np.int64)
+    result_ids, student = np.unique(data[:, 0], return_inverse=True)
+    x = data[:, 3].astype(np.float64)
+
+    # доля верных по попытке и по остальным вопросам попытки (без текущего) - по всем ответам,
+    # в том числе на вопросы, которых в банке уже нет
+    shown = np.bincount(student).astype(np.float64)
+    correct = np.bincount(student, weights=x)
+    score = correct / shown
+    rest_n = shown[student] - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rest = np.where(rest_n > 0, (correct[student] - x) / np.maximum(rest_n, 1), np.nan)
+
+    kept = data[:, 1] > 0
+    data, student, x, rest = data[kept], student[kept], x[kept], rest[kept]
+    question_ids, item = np.unique(data[:, 1], return_inverse=True)
+    answer_id = data[:, 2]
+    n_items = len(question_ids)
+
+    n = np.bincount(item, minlength=n_items).astype(np.float64)
+    difficulty = np.bincount(item, weights=x, minlength=n_items) / n
+    omitted = np.bincount(item, weights=(answer_id == 0), minlength=n_items)
+
+    # корреляция x и rest внутри каждого вопроса через групповые суммы
+    valid = ~np.isnan(rest)
+    xi, ri, it = x[valid], rest[valid], item[valid]
+    m = np.bincount(it, minlength=n_items).astype(np.float64)
+    sx = np.bincount(it, weights=xi, minlength=n_items)
+    sr = np.bincount(it, weights=ri, minlength=n_items)
+    sxr = np.bincount(it, weights=xi * ri, minlength=n_items)
+    sxx = np.bincount(it, weights=xi * xi, minlength=n_items)
+    srr = np.bincount(it, weights=ri * ri, minlength=n_items)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxr - sx * sr / m
+        var_x = sxx - sx * sx / m
+        var_r = srr - sr * sr / m
+        discrimination = cov / np.sqrt(var_x * var_r)
+    discrimination = np.nan_to_num(discrimination, nan=0.0)
+
+    items = [
+        ItemStats(
+            question_id=int(qid),
+            n=int(n[i]),
+            difficulty=float(difficulty[i]),
+            discrimination=float(discrimination[i]),
+            omitted=int(omitted[i]),
+        )
+        for i, qid in enumerate(question_ids)
+    ]
+
+    # дистракторы: все варианты показанных вопросов, включая ни разу не выбранные
+    answers = conn.execute(
+        """
+        SELECT a.id, a.question_id, a.is_correct FROM answers a
+        JOIN questions q ON q.id = a.question_id
+        WHERE q.test_id = ?
+        """,
+        (test_id,),
+    ).fetchall()
+    item_of_question: Dict[int, int] = {int(q): i for i, q in enumerate(question_ids)}
+    answers = [a for a in answers if a["question_id"] in item_of_question]
+
+    distractors = []
+    if answers:
+        a_ids = np.array([a["id"] for a in answers], dtype=np.int64)
+        order = np.argsort(a_ids)
+        a_sorted = a_ids[order]
+        chosen = answer_id > 0
+        pos = np.searchsorted(a_sorted, answer_id[chosen])
+        pos = np.minimum(pos, len(a_sorted) - 1)
+        known = a_sorted[pos] == answer_id[chosen]
+        slot = order[pos[known]]
+        picks = np.bincount(slot, minlength=len(answers))
+        score_sum = np.bincount(slot, weights=score[student[chosen][known]], minlength=len(answers))
+
+        for j, a in enumerate(answers):
+            shown_q = n[item_of_question[a["question_id"]]]
+            distractors.append(
+                DistractorStats(
+                    question_id=a["question_id"],
+                    answer_id=a["id"],
+                    is_correct=bool(a["is_correct"]),
+                    n=int(picks[j]),
+                    share=float(picks[j] / shown_q) if shown_q else 0.0,
+                    mean_score=float(score_sum[j] / picks[j]) if picks[j] else 0.0,
+                )
+            )
+
+    return ItemAnalysis(
+        test_id=test_id,
+        attempts=len(result_ids),
+        items=items,
+        distractors=distractors,
+    )
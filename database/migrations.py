@@ -0,0 +1,589 @@
+import sqlite3
+from typing import Callable, List
+
+# Версия схемы хранится в PRAGMA user_version. Миграции только добавляются в конец
+# списка: номер миграции = её позиция + 1, уже выпущенные миграции не меняются.
+
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def _execute_all(conn: sqlite3.Connection, statements: List[str]) -> None:
+    for sql in statements:
+        conn.execute(sql)
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    """Добавить колонку в таблицу, созданную старой версией программы."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _v1_base_schema(conn: sqlite3.Connection) -> None:
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS tests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                description TEXT,
+                questions INTEGER NOT NULL,
+                time_limit INTEGER NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                test_id INTEGER NOT NULL,
+                q_text TEXT NOT NULL,
+                content_hash TEXT,
+                FOREIGN KEY (test_id)
+                    REFERENCES tests(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question_id INTEGER NOT NULL,
+                a_text TEXT NOT NULL,
+                is_correct BOOLEAN NOT NULL,
+                FOREIGN KEY (question_id)
+                    REFERENCES questions(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                test_id INTEGER NOT NULL,
+                user_name TEXT NOT NULL,
+                group_name TEXT,
+                score INTEGER NOT NULL,
+                max_score INTEGER NOT NULL,
+                time_taken INTEGER NOT NULL,
+                taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (test_id)
+                    REFERENCES tests(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            )
+            """,
+        ],
+    )
+    # базы, созданные до появления хэшей вопросов
+    _ensure_column(conn, "questions", "content_hash", "TEXT")
+
+
+def _v2_indexes(conn: sqlite3.Connection) -> None:
+    _execute_all(
+        conn,
+        [
+            # find_by_test / импорт: вопросы теста по порядку id
+            "CREATE INDEX IF NOT EXISTS idx_questions_test ON questions(test_id, id)",
+            # find_by_question: ответы вопроса по порядку id
+            "CREATE INDEX IF NOT EXISTS idx_answers_question ON answers(question_id, id)",
+            # ведомость теста, отсортированная по дате
+            "CREATE INDEX IF NOT EXISTS idx_results_test_taken ON results(test_id, taken_at)",
+            # find_by_user, отсортированный по дате
+            "CREATE INDEX IF NOT EXISTS idx_results_user_taken ON results(user_name, taken_at)",
+            "CREATE INDEX IF NOT EXISTS idx_results_taken ON results(taken_at)",
+        ],
+    )
+
+
+def _v3_results_sort_indexes(conn: sqlite3.Connection) -> None:
+    # сортировка ведомости по заголовкам столбцов (ResultRepository.LEDGER_SORT);
+    # выражения должны совпадать с теми, что стоят в ORDER BY
+    _execute_all(
+        conn,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_results_test_user ON results(test_id, user_name)",
+            "CREATE INDEX IF NOT EXISTS idx_results_test_group ON results(test_id, ifnull(group_name, ''))",
+            "CREATE INDEX IF NOT EXISTS idx_results_test_score ON results(test_id, score)",
+            """
+            CREATE INDEX IF NOT EXISTS idx_results_test_percent ON results(
+                test_id, (CASE WHEN max_score > 0 THEN score * 100.0 / max_score ELSE 0 END)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_results_test_time ON results(test_id, time_taken)",
+        ],
+    )
+
+
+def _v4_result_stats(conn: sqlite3.Connection) -> None:
+    hist = "".join(f"h{i} INTEGER NOT NULL DEFAULT 0,\n" for i in range(10))
+    # заполнение - копия тогдашнего backfill_sql() с порогом сдачи 60%: миграция не должна
+    # зависеть от текущих настроек; сводку с другим PASS_PERCENT пересчитывает StatsRepository.rebuild
+    percent = "(CASE WHEN max_score > 0 THEN score * 100.0 / max_score ELSE 0 END)"
+    bucket = f"min(9, CAST({percent} / 10 AS INTEGER))"
+    values = f"count(*), sum({percent}), sum({percent} * {percent}), sum({percent} >= 60), " + ", ".join(
+        f"sum({bucket} = {i})" for i in range(10)
+    )
+    columns = "test_id, scope, group_name, count, percent_sum, percent_sq_sum, passed, " + ", ".join(
+        f"h{i}" for i in range(10)
+    )
+    _execute_all(
+        conn,
+        [
+            f"""
+            CREATE TABLE IF NOT EXISTS result_stats (
+                test_id INTEGER NOT NULL,
+                scope TEXT NOT NULL,
+                group_name TEXT NOT NULL DEFAULT '',
+                count INTEGER NOT NULL DEFAULT 0,
+                percent_sum REAL NOT NULL DEFAULT 0,
+                percent_sq_sum REAL NOT NULL DEFAULT 0,
+                passed INTEGER NOT NULL DEFAULT 0,
+                {hist}
+                PRIMARY KEY (test_id, scope, group_name),
+                FOREIGN KEY (test_id)
+                    REFERENCES tests(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            ) WITHOUT ROWID
+            """,
+            "DELETE FROM result_stats",
+            f"""
+            INSERT INTO result_stats ({columns})
+            SELECT test_id, 'test', '', {values} FROM results GROUP BY test_id
+            """,
+            f"""
+            INSERT INTO result_stats ({columns})
+            SELECT test_id, 'group', ifnull(group_name, ''), {values}
+            FROM results GROUP BY test_id, ifnull(group_name, '')
+            """,
+        ],
+    )
+
+
+def _v5_responses(conn: sqlite3.Connection) -> None:
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                result_id INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                answer_id INTEGER,
+                is_correct BOOLEAN NOT NULL,
+                FOREIGN KEY (result_id)
+                    REFERENCES results(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE,
+                FOREIGN KEY (question_id)
+                    REFERENCES questions(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE,
+                FOREIGN KEY (answer_id)
+                    REFERENCES answers(id)
+                    ON DELETE SET NULL
+                    ON UPDATE CASCADE
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_responses_result ON responses(result_id)",
+            "CREATE INDEX IF NOT EXISTS idx_responses_question ON responses(question_id, answer_id)",
+        ],
+    )
+
+
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+
+# (индекс, таблица, индексируемые колонки)
+FTS_TABLES = [
+    ("tests_fts", "tests", ["name", "description"]),
+    ("questions_fts", "questions", ["q_text"]),
+    ("answers_fts", "answers", ["a_text"]),
+]
+
+
+def _fts_statements(fts: str, table: str, columns: List[str]) -> List[str]:
+    cols = ", ".join(columns)
+    new_vals = ", ".join(f"new.{c}" for c in columns)
+    old_vals = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='id', tokenize='{FTS_TOKENIZE}'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+        """,
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _v6_full_text_search(conn: sqlite3.Connection) -> None:
+    # unicode61 приводит регистр для любых алфавитов, в том числе для кириллицы
+    for fts, table, columns in FTS_TABLES:
+        _execute_all(conn, _fts_statements(fts, table, columns))
+
+
+def _v7_sessions(conn: sqlite3.Connection) -> None:
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                test_id INTEGER NOT NULL,
+                user_name TEXT NOT NULL,
+                group_name TEXT,
+                kiosk TEXT NOT NULL,
+                question_ids TEXT NOT NULL,
+                answer_ids TEXT NOT NULL,
+                choices TEXT NOT NULL,
+                current_index INTEGER NOT NULL DEFAULT 0,
+                remaining REAL NOT NULL,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (test_id)
+                    REFERENCES tests(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_sessions_kiosk ON sessions(kiosk, updated_at)",
+        ],
+    )
+
+
+def _v8_spooled_results(conn: sqlite3.Connection) -> None:
+    # ключи записей журнала ResultWriter: повтор журнала после сбоя не задвоит результат
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS spooled_results (
+                key TEXT PRIMARY KEY,
+                result_id INTEGER NOT NULL,
+                FOREIGN KEY (result_id)
+                    REFERENCES results(id)
+                    ON DELETE CASCADE
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_spooled_results_result ON spooled_results(result_id)",
+        ],
+    )
+
+
+def _v9_exposures(conn: sqlite3.Connection) -> None:
+    # сколько раз тестируемый видел вопрос: поддерживается триггерами на responses/results
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS exposures (
+                user_name TEXT NOT NULL,
+                test_id INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                seen INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_name, test_id, question_id),
+                FOREIGN KEY (test_id) REFERENCES tests(id) ON DELETE CASCADE,
+                FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_exposures_question ON exposures(question_id)",
+            """
+            CREATE TRIGGER IF NOT EXISTS responses_exposure_ai AFTER INSERT ON responses BEGIN
+                INSERT INTO exposures (user_name, test_id, question_id, seen)
+                SELECT r.user_name, r.test_id, new.question_id, 1 FROM results r WHERE r.id = new.result_id
+                ON CONFLICT (user_name, test_id, question_id) DO UPDATE SET seen = seen + 1;
+            END
+            """,
+            # BEFORE: ответы удаляемого результата ещё на месте
+            """
+            CREATE TRIGGER IF NOT EXISTS results_exposure_bd BEFORE DELETE ON results BEGIN
+                UPDATE exposures SET seen = seen - 1
+                WHERE user_name = old.user_name AND test_id = old.test_id
+                  AND question_id IN (SELECT question_id FROM responses WHERE result_id = old.id);
+                DELETE FROM exposures
+                WHERE user_name = old.user_name AND test_id = old.test_id AND seen <= 0;
+            END
+            """,
+            "DELETE FROM exposures",
+            """
+            INSERT INTO exposures (user_name, test_id, question_id, seen)
+            SELECT r.user_name, r.test_id, resp.question_id, count(*)
+            FROM responses resp
+            JOIN results r ON r.id = resp.result_id
+            JOIN questions q ON q.id = resp.question_id
+            GROUP BY r.user_name, r.test_id, resp.question_id
+            """,
+        ],
+    )
+
+
+def _v10_item_params(conn: sqlite3.Connection) -> None:
+    # параметры вопросов для адаптивного режима: доля верных (сглаженная) под индексом,
+    # поддерживается триггерами, чтобы выбор следующего вопроса был одним поиском по индексу
+    _ensure_column(conn, "tests", "adaptive", "INTEGER NOT NULL DEFAULT 0")
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS item_params (
+                question_id INTEGER PRIMARY KEY,
+                test_id INTEGER NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                p_value REAL NOT NULL DEFAULT 0.5,
+                FOREIGN KEY (question_id)
+                    REFERENCES questions(id)
+                    ON DELETE CASCADE
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_item_params_test_p ON item_params(test_id, p_value)",
+            """
+            CREATE TRIGGER IF NOT EXISTS questions_item_params_ai AFTER INSERT ON questions BEGIN
+                INSERT OR IGNORE INTO item_params (question_id, test_id) VALUES (new.id, new.test_id);
+            END
+            """,
+            # p_value = (верных + 0.5) / (показов + 1): у нового вопроса 0.5, крайних 0 и 1 не бывает
+            """
+            CREATE TRIGGER IF NOT EXISTS responses_item_params_ai AFTER INSERT ON responses BEGIN
+                UPDATE item_params SET
+                    n = n + 1,
+                    correct = correct + new.is_correct,
+                    p_value = (correct + new.is_correct + 0.5) / (n + 2.0)
+                WHERE question_id = new.question_id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS results_item_params_bd BEFORE DELETE ON results BEGIN
+                UPDATE item_params SET
+                    n = n - 1,
+                    correct = correct - (
+                        SELECT is_correct FROM responses
+                        WHERE result_id = old.id AND question_id = item_params.question_id
+                    ),
+                    p_value = (correct + 0.5 - (
+                        SELECT is_correct FROM responses
+                        WHERE result_id = old.id AND question_id = item_params.question_id
+                    )) / n
+                WHERE question_id IN (SELECT question_id FROM responses WHERE result_id = old.id);
+            END
+            """,
+            "DELETE FROM item_params",
+            """
+            INSERT INTO item_params (question_id, test_id, n, correct, p_value)
+            SELECT q.id, q.test_id, count(resp.id), ifnull(sum(resp.is_correct), 0),
+                   (ifnull(sum(resp.is_correct), 0) + 0.5) / (count(resp.id) + 1.0)
+            FROM questions q
+            LEFT JOIN responses resp ON resp.question_id = q.id
+            GROUP BY q.id
+            """,
+        ],
+    )
+
+
+def _v11_change_counters(conn: sqlite3.Connection) -> None:
+    # счётчик изменений каталога тестов: по нему кэши понимают, что tests поменялись
+    # (в том числе с другого компьютера), не перечитывая таблицу
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS change_counters (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            """,
+            "INSERT OR IGNORE INTO change_counters (name, version) VALUES ('tests', 0)",
+            """
+            CREATE TRIGGER IF NOT EXISTS tests_counter_ai AFTER INSERT ON tests BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'tests';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS tests_counter_au AFTER UPDATE ON tests BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'tests';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS tests_counter_ad AFTER DELETE ON tests BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'tests';
+            END
+            """,
+        ],
+    )
+
+
+def _v12_adaptive_results(conn: sqlite3.Connection) -> None:
+    # ответы адаптивных попыток не меняют item_params: вопросы там подобраны под уровень,
+    # и доля верных по ним тянулась бы к 0.5 независимо от трудности
+    _ensure_column(conn, "results", "adaptive", "INTEGER NOT NULL DEFAULT 0")
+    _execute_all(
+        conn,
+        [
+            "DROP TRIGGER IF EXISTS responses_item_params_ai",
+            "DROP TRIGGER IF EXISTS results_item_params_bd",
+            """
+            CREATE TRIGGER responses_item_params_ai AFTER INSERT ON responses
+            WHEN NOT (SELECT adaptive FROM results WHERE id = new.result_id)
+            BEGIN
+                UPDATE item_params SET
+                    n = n + 1,
+                    correct = correct + new.is_correct,
+                    p_value = (correct + new.is_correct + 0.5) / (n + 2.0)
+                WHERE question_id = new.question_id;
+            END
+            """,
+            """
+            CREATE TRIGGER results_item_params_bd BEFORE DELETE ON results
+            WHEN NOT old.adaptive
+            BEGIN
+                UPDATE item_params SET
+                    n = n - 1,
+                    correct = correct - (
+                        SELECT is_correct FROM responses
+                        WHERE result_id = old.id AND question_id = item_params.question_id
+                    ),
+                    p_value = (correct + 0.5 - (
+                        SELECT is_correct FROM responses
+                        WHERE result_id = old.id AND question_id = item_params.question_id
+                    )) / n
+                WHERE question_id IN (SELECT question_id FROM responses WHERE result_id = old.id);
+            END
+            """,
+        ],
+    )
+
+
+def _v13_response_history(conn: sqlite3.Connection) -> None:
+    # история ответов переживает правку банка: хранится текст выбранного ответа (NULL - без
+    # ответа), а удаление вопроса или ответа только обнуляет ссылку. Колонку question_id нельзя
+    # изменить через ALTER TABLE, поэтому таблица пересоздаётся; её триггеры переносятся как есть
+    triggers = [
+        row[0]
+        for row in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'responses'")
+    ]
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE responses_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                result_id INTEGER NOT NULL,
+                question_id INTEGER,
+                answer_id INTEGER,
+                answer_text TEXT,
+                is_correct BOOLEAN NOT NULL,
+                FOREIGN KEY (result_id)
+                    REFERENCES results(id)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE,
+                FOREIGN KEY (question_id)
+                    REFERENCES questions(id)
+                    ON DELETE SET NULL
+                    ON UPDATE CASCADE,
+                FOREIGN KEY (answer_id)
+                    REFERENCES answers(id)
+                    ON DELETE SET NULL
+                    ON UPDATE CASCADE
+            )
+            """,
+            """
+            INSERT INTO responses_new (id, result_id, question_id, answer_id, answer_text, is_correct)
+            SELECT resp.id, resp.result_id, resp.question_id, resp.answer_id, a.a_text, resp.is_correct
+            FROM responses resp
+            LEFT JOIN answers a ON a.id = resp.answer_id
+            """,
+            "DROP TABLE responses",
+        ],
+    )
+    # обычный RENAME перепроверяет все триггеры схемы, а триггеры results ссылаются на responses,
+    # которой в этот момент нет
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute("ALTER TABLE responses_new RENAME TO responses")
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    _execute_all(
+        conn,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_responses_result ON responses(result_id)",
+            "CREATE INDEX IF NOT EXISTS idx_responses_question ON responses(question_id, answer_id)",
+            *triggers,
+            # запасной путь для записей без текста ответа (журналы прежних версий)
+            """
+            CREATE TRIGGER IF NOT EXISTS responses_answer_text_ai AFTER INSERT ON responses
+            WHEN new.answer_text IS NULL AND new.answer_id IS NOT NULL
+            BEGIN
+                UPDATE responses SET answer_text = (SELECT a_text FROM answers WHERE id = new.answer_id)
+                WHERE id = new.id;
+            END
+            """,
+        ],
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    _v1_base_schema,
+    _v2_indexes,
+    _v3_results_sort_indexes,
+    _v4_result_stats,
+    _v5_responses,
+    _v6_full_text_search,
+    _v7_sessions,
+    _v8_spooled_results,
+    _v9_exposures,
+    _v10_item_params,
+    _v11_change_counters,
+    _v12_adaptive_results,
+    _v13_response_history,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Применить недостающие миграции. Каждая идёт в своей транзакции вместе с user_version.
+
+    Если схема уже актуальна, выполняется только чтение user_version.
+    """
+    version = get_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    while version < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # другой процесс мог обновить схему, пока мы ждали блокировку
+            version = get_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.commit()
+                break
+            MIGRATIONS[version](conn)
+            version += 1
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return version
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 
 from datetime import datetime
 
@@ -9,14 +9,16 @@ class Test:
     id: Optional[int]
     name: str
     description: Optional[str]
-    questions: int
+    questions: int  # в адаптивном режиме - наибольшее число вопросов
     time_limit: int
+    adaptive: bool = False
 
 @dataclass
 class Question:
     id: Optional[int]
     test_id: int
     q_text: str
+    content_hash: Optional[str] = None
 
 @dataclass
 class Answer:
@@ -35,3 +37,76 @@ class Result:
     max_score: int
     time_taken: int
     taken_at: str = ""
+    adaptive: bool = False
+
+@dataclass
+class Response:
+    id: Optional[int]
+    result_id: int
+    question_id: Optional[int]  # None - вопрос удалён из банка
+    answer_id: Optional[int]  # None - без ответа или ответ удалён из банка
+    is_correct: bool
+    answer_text: Optional[str] = None  # текст выбранного ответа; None - вопрос без ответа
+
+@dataclass
+class Session:
+    """Незавершённая попытка: списки хранятся в JSON, чтобы восстановить тот же порядок."""
+    id: Optional[int]
+    test_id: int
+    user_name: str
+    group_name: Optional[str]
+    kiosk: str
+    question_ids: str  # [id вопроса, ...] в порядке показа
+    answer_ids: str  # [[id ответа, ...], ...] в порядке показа
+    choices: str  # [индекс выбранного ответа или -1, ...]
+    current_index: int
+    remaining: float
+    started_at: str = ""
+    updated_at: str = ""
+
+@dataclass
+class SearchHit:
+    kind: str  # "test", "question" или "answer"
+    test_id: int
+    test_name: str
+    question_id: Optional[int]
+    text: str  # найденный текст с подсвеченными совпадениями
+    rank: float  # bm25: чем меньше, тем релевантнее
+
+@dataclass
+class ResultStats:
+    test_id: int
+    scope: str  # "test" - весь тест, "group" - одна группа
+    group_name: str
+    count: int
+    percent_sum: float
+    percent_sq_sum: float
+    passed: int
+    histogram: List[int]  # число результатов в корзинах 0-10%, 10-20%, ..., 90-100%
+
+    @property
+    def mean(self) -> float:
+        return self.percent_sum / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        if not self.count:
+            return 0.0
+        return max(self.percent_sq_sum / self.count - self.mean ** 2, 0.0) ** 0.5
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passed * 100.0 / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Приближённый перцентиль по гистограмме с линейной интерполяцией внутри корзины."""
+        if not self.count:
+            return 0.0
+        width = 100.0 / len(self.histogram)
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            if n and seen + n >= target:
+                return i * width + width * (target - seen) / n
+            seen += n
+        return 100.0
@@ -1,12 +1,32 @@
+import re
 import sqlite3
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic, Type, List, Optional
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TypeVar, Generic, Type, List, Optional, Tuple, Sequence, Iterator, Dict
 
-from database.models import Test, Question, Answer, Result
+from database.cache import TestPack
+from database.models import Test, Question, Answer, Result, Response, Session, SearchHit
+from database.stats import StatsRepository
 
 
 T = TypeVar("T")
 
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+HIGHLIGHT_START, HIGHLIGHT_END = "«", "»"
+
+
+def fts_query(text: str) -> str:
+    """Запрос пользователя -> выражение MATCH: все слова, каждое как префикс."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+@lru_cache(maxsize=None)
+def _insert_sql(table: str, columns: Tuple[str, ...]) -> str:
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
 
 class BaseRepository(ABC, Generic[T]):
     def __init__(self, conn: sqlite3.Connection):
@@ -22,6 +42,9 @@ class BaseRepository(ABC, Generic[T]):
     def model_class(self) -> Type[T]:
         ...
 
+    # колонки с индексом, по которым разрешены iter_all/find_page
+    sortable_columns: Tuple[str, ...] = ("id",)
+
     def _row_to_model(self, row: sqlite3.Row) -> T:
         return self.model_class(**dict(row))
     
@@ -42,28 +65,162 @@ class BaseRepository(ABC, Generic[T]):
         rows = cur.fetchall()
         return [self._row_to_model(r) for r in rows]
 
-    def create(self, obj: dict = {}, **kwargs) -> int:
+    def iter_all(self, order_by: str = "id", batch_size: int = 500) -> Iterator[T]:
+        """Потоковый обход таблицы без загрузки её целиком в память."""
+        column = self._sort_column(order_by)
+        cur = self.conn.execute(f"SELECT * FROM {self.table_name} ORDER BY {column}, id")
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    yield self._row_to_model(r)
+        finally:
+            cur.close()
+
+    def find_page(
+        self,
+        limit: int,
+        after: Optional[tuple] = None,
+        order_by: str = "id",
+        descending: bool = False,
+    ) -> List[T]:
+        """Keyset-пагинация: страница после ключа after = page_key(последний элемент).
+
+        В отличие от OFFSET, стоимость не растёт с номером страницы, если по order_by есть индекс.
+        """
+        column = self._sort_column(order_by)
+        direction = "DESC" if descending else "ASC"
+        op = "<" if descending else ">"
+        if after is None:
+            where, params = "", ()
+        elif column == "id":
+            where, params = f"WHERE id {op} ?", (after[-1],)
+        else:
+            where, params = f"WHERE ({column}, id) {op} (?, ?)", tuple(after)
+        cur = self.conn.execute(
+            f"SELECT * FROM {self.table_name} {where} ORDER BY {column} {direction}, id {direction} LIMIT ?",
+            (*params, limit),
+        )
+        return [self._row_to_model(r) for r in cur.fetchall()]
+
+    def page_key(self, obj: T, order_by: str = "id") -> tuple:
+        column = self._sort_column(order_by)
+        if column == "id":
+            return (obj.id,)
+        return (getattr(obj, column), obj.id)
+
+    def _sort_column(self, order_by: str) -> str:
+        if order_by not in self.sortable_columns:
+            raise ValueError(f"{self.table_name}: сортировка по '{order_by}' не поддерживается")
+        return order_by
+
+    def create(self, obj: dict = {}, **kwargs) -> T:
         obj = {**obj, **kwargs}
-        columns = list(obj.keys())
+        columns = tuple(obj.keys())
         values = tuple(obj.values())
-        
-        query = f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES ({', '.join(['?' for _ in values])})"
-        cur = self.conn.execute(query, values)
+        began = not self.conn.in_transaction
+
+        if HAS_RETURNING:
+            cur = self.conn.execute(_insert_sql(self.table_name, columns) + " RETURNING *", values)
+            row = cur.fetchone()
+            cur.close()
+            self._commit(began)
+            return self._row_to_model(row)
+
+        cur = self.conn.execute(_insert_sql(self.table_name, columns), values)
+        self._commit(began)
+        return self.find_by_id(cur.lastrowid)
+
+    def create_many(self, rows: Sequence[dict]) -> List[int]:
+        """Вставка пачки строк под одним commit; возвращает id в порядке rows.
+
+        Без готовых id каждая строка вставляется с RETURNING id (на старом SQLite -
+        lastrowid), так что id берутся у самой базы, а не вычисляются.
+        """
+        if not rows:
+            return []
+        columns = tuple(rows[0].keys())
+        if "id" in columns:
+            began = not self.conn.in_transaction
+            self.conn.executemany(
+                _insert_sql(self.table_name, columns),
+                [tuple(r[c] for c in columns) for r in rows],
+            )
+            self._commit(began)
+            return [r["id"] for r in rows]
+
+        sql = _insert_sql(self.table_name, columns)
+        if HAS_RETURNING:
+            sql += " RETURNING id"
+        ids = []
+        with self.transaction():
+            for r in rows:
+                cur = self.conn.execute(sql, tuple(r[c] for c in columns))
+                ids.append(cur.fetchone()[0] if HAS_RETURNING else cur.lastrowid)
+        return ids
+
+    def bulk_create(self, rows: Sequence[dict]) -> int:
+        """Вставка пачки строк без возврата id; возвращает число строк."""
+        if not rows:
+            return 0
+        columns = tuple(rows[0].keys())
+        began = not self.conn.in_transaction
+        cur = self.conn.executemany(
+            _insert_sql(self.table_name, columns),
+            [tuple(r[c] for c in columns) for r in rows],
+        )
+        self._commit(began)
+        return cur.rowcount
+
+    @contextmanager
+    def transaction(self) -> Iterator["BaseRepository[T]"]:
+        """Группа записей под одним commit. Завершает только транзакцию, которую начала
+        сама: внутри уже открытой (внешней transaction() или транзакции вызывающего)
+        работает через SAVEPOINT - при ошибке откатывает свои записи, commit оставляет
+        владельцу. create/delete внутри не коммитят, транзакцию начали не они."""
+        if self.conn.in_transaction:
+            self.conn.execute("SAVEPOINT repo_tx")
+            try:
+                yield self
+            except BaseException:
+                self.conn.execute("ROLLBACK TO repo_tx")
+                self.conn.execute("RELEASE repo_tx")
+                raise
+            self.conn.execute("RELEASE repo_tx")
+            return
+
+        # блокировка записи сразу, а не при первом INSERT: чтение перед записью
+        # в той же транзакции не упрётся в чужую запись при повышении блокировки
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except BaseException:
+            self.conn.rollback()
+            raise
         self.conn.commit()
-        new_id = cur.lastrowid
-        return self.find_by_id(new_id)
-    
+
+    def _commit(self, began: bool) -> None:
+        """commit после записи, если транзакцию неявно начала она сама (began - до записи
+        не было открытой транзакции)."""
+        if began:
+            self.conn.commit()
+
     def delete(self, id_: int) -> bool:
+        began = not self.conn.in_transaction
         cur = self.conn.execute(
             f"DELETE FROM {self.table_name} WHERE id = ?",
             (id_,),
         )
-        self.conn.commit()
+        self._commit(began)
         return cur.rowcount > 0
 
 
 
 class TestRepository(BaseRepository[Test]):
+    sortable_columns = ("id", "name")
+
     @property
     def table_name(self) -> str:
         return "tests"
@@ -81,20 +238,35 @@ class TestRepository(BaseRepository[Test]):
         return self._row_to_model(row) if row else None
 
     def search(self, query: str, limit: int = 50) -> List[Test]:
-        like = f"%{query}%"
+        """Поиск по имени и описанию через FTS5, лучшие совпадения первыми."""
+        return [t for t, _ in self.search_highlighted(query, limit)]
+
+    def search_highlighted(self, query: str, limit: int = 50) -> List[Tuple[Test, str]]:
+        """То же, что search, плюс имя теста с подсвеченными совпадениями."""
+        match = fts_query(query)
+        if not match:
+            return [(t, t.name) for t in self.find_page(limit, order_by="name")]
         cur = self.conn.execute(
             """
-            SELECT * FROM tests
-            WHERE name LIKE ? OR description LIKE ?
-            ORDER BY name
+            SELECT t.*, highlight(tests_fts, 0, ?, ?) AS highlighted FROM tests_fts
+            JOIN tests t ON t.id = tests_fts.rowid
+            WHERE tests_fts MATCH ?
+            ORDER BY bm25(tests_fts)
             LIMIT ?
             """,
-            (like, like, limit),
+            (HIGHLIGHT_START, HIGHLIGHT_END, match, limit),
         )
-        return [self._row_to_model(r) for r in cur.fetchall()]
+        found = []
+        for r in cur.fetchall():
+            row = dict(r)
+            highlighted = row.pop("highlighted")
+            found.append((self.model_class(**row), highlighted))
+        return found
 
 
 class QuestionRepository(BaseRepository[Question]):
+    sortable_columns = ("id", "test_id")
+
     @property
     def table_name(self) -> str:
         return "questions"
@@ -109,9 +281,50 @@ class QuestionRepository(BaseRepository[Question]):
             (test_id,),
         )
         return [self._row_to_model(r) for r in cur.fetchall()]
-    
+
+    def load_by_ids(self, question_ids: Sequence[int]) -> Dict[int, Tuple[Question, List[Answer]]]:
+        """Вопросы с ответами по списку id одним запросом (восстановление сессии)."""
+        placeholders = ", ".join("?" for _ in question_ids)
+        cur = self.conn.execute(
+            f"""
+            SELECT
+                q.id AS q_id, q.test_id, q.q_text, q.content_hash,
+                a.id AS a_id, a.a_text, a.is_correct
+            FROM questions q
+            JOIN answers a ON a.question_id = q.id
+            WHERE q.id IN ({placeholders})
+            ORDER BY q.id, a.id
+            """,
+            tuple(question_ids),
+        )
+        found: Dict[int, Tuple[Question, List[Answer]]] = {}
+        for r in cur:
+            if r["q_id"] not in found:
+                q = Question(id=r["q_id"], test_id=r["test_id"], q_text=r["q_text"], content_hash=r["content_hash"])
+                found[r["q_id"]] = (q, [])
+            found[r["q_id"]][1].append(
+                Answer(id=r["a_id"], question_id=r["q_id"], a_text=r["a_text"], is_correct=r["is_correct"])
+            )
+        return found
+
+    def load_pack(self, test_id: int, version: Optional[int] = None) -> TestPack:
+        """Весь банк теста (вопросы с ответами) в компактном виде для кэша."""
+        cur = self.conn.execute(
+            """
+            SELECT q.id, q.q_text, a.id, a.a_text, a.is_correct
+            FROM questions q
+            JOIN answers a ON a.question_id = q.id
+            WHERE q.test_id = ?
+            ORDER BY q.id, a.id
+            """,
+            (test_id,),
+        )
+        return TestPack(test_id, cur, version)
+
 
 class AnswerRepository(BaseRepository[Answer]):
+    sortable_columns = ("id", "question_id")
+
     @property
     def table_name(self) -> str:
         return "answers"
@@ -129,6 +342,18 @@ class AnswerRepository(BaseRepository[Answer]):
     
 
 class ResultRepository(BaseRepository[Result]):
+    sortable_columns = ("id", "test_id", "user_name", "taken_at")
+
+    # столбец ведомости -> выражение ORDER BY; под каждое есть индекс (test_id, выражение)
+    LEDGER_SORT = {
+        "user_name": "user_name",
+        "group_name": "ifnull(group_name, '')",
+        "score": "score",
+        "percent": "(CASE WHEN max_score > 0 THEN score * 100.0 / max_score ELSE 0 END)",
+        "time_taken": "time_taken",
+        "taken_at": "taken_at",
+    }
+
     @property
     def table_name(self) -> str:
         return "results"
@@ -137,6 +362,35 @@ class ResultRepository(BaseRepository[Result]):
     def model_class(self):
         return Result
 
+    # сводка result_stats обновляется в той же транзакции, что и сами результаты
+
+    def create(self, obj: dict = {}, **kwargs) -> Result:
+        with self.transaction():
+            result = super().create(obj, **kwargs)
+            StatsRepository(self.conn).apply([vars(result)])
+        return result
+
+    def create_many(self, rows: Sequence[dict]) -> List[int]:
+        with self.transaction():
+            ids = super().create_many(rows)
+            StatsRepository(self.conn).apply(rows)
+        return ids
+
+    def bulk_create(self, rows: Sequence[dict]) -> int:
+        with self.transaction():
+            count = super().bulk_create(rows)
+            StatsRepository(self.conn).apply(rows)
+        return count
+
+    def delete(self, id_: int) -> bool:
+        with self.transaction():
+            result = self.find_by_id(id_)
+            if result is None:
+                return False
+            super().delete(id_)
+            StatsRepository(self.conn).apply([vars(result)], sign=-1)
+        return True
+
     def find_by_test(self, test_id: int) -> List[Result]:
         cur = self.conn.execute(
             """
@@ -158,3 +412,159 @@ class ResultRepository(BaseRepository[Result]):
             (user_name,),
         )
         return [self._row_to_model(r) for r in cur.fetchall()]
+
+    def ledger_page(
+        self,
+        test_id: int,
+        limit: int,
+        after: Optional[tuple] = None,
+        order_by: str = "taken_at",
+        descending: bool = True,
+    ) -> List[sqlite3.Row]:
+        """Страница ведомости, уже готовая к показу: процент и локальное время считает SQLite.
+
+        after = (sort_value, id) последней строки предыдущей страницы. Чтобы листать назад,
+        передайте ключ первой строки и обратное направление - строки придут в обратном порядке.
+        """
+        expr = self.LEDGER_SORT.get(order_by)
+        if expr is None:
+            raise ValueError(f"results: сортировка по '{order_by}' не поддерживается")
+        direction = "DESC" if descending else "ASC"
+        where, params = "", ()
+        if after is not None:
+            where = f"AND ({expr}, id) {'<' if descending else '>'} (?, ?)"
+            params = tuple(after)
+        cur = self.conn.execute(
+            f"""
+            SELECT
+                id, user_name, group_name, score, max_score, time_taken,
+                round({self.LEDGER_SORT["percent"]}, 1) AS percent,
+                datetime(taken_at, 'localtime') AS taken_local,
+                {expr} AS sort_value
+            FROM results
+            WHERE test_id = ? {where}
+            ORDER BY {expr} {direction}, id {direction}
+            LIMIT ?
+            """,
+            (test_id, *params, limit),
+        )
+        return cur.fetchall()
+
+
+class ResponseRepository(BaseRepository[Response]):
+    sortable_columns = ("id", "result_id")
+
+    @property
+    def table_name(self) -> str:
+        return "responses"
+
+    @property
+    def model_class(self):
+        return Response
+
+    def find_by_result(self, result_id: int) -> List[Response]:
+        cur = self.conn.execute(
+            "SELECT * FROM responses WHERE result_id = ? ORDER BY id",
+            (result_id,),
+        )
+        return [self._row_to_model(r) for r in cur.fetchall()]
+
+
+class SearchRepository:
+    """Ранжированный полнотекстовый поиск по тестам, вопросам и ответам (FTS5)."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def search(
+        self,
+        query: str,
+        test_id: Optional[int] = None,
+        kinds: Sequence[str] = ("test", "question", "answer"),
+        limit: int = 50,
+    ) -> List[SearchHit]:
+        match = fts_query(query)
+        if not match:
+            return []
+        test_filter = "AND t.id = ?" if test_id is not None else ""
+        params = (HIGHLIGHT_START, HIGHLIGHT_END, match, *((test_id,) if test_id is not None else ()), limit)
+
+        hits: List[SearchHit] = []
+        if "test" in kinds:
+            cur = self.conn.execute(
+                f"""
+                SELECT t.id AS test_id, t.name AS test_name, NULL AS question_id,
+                       highlight(tests_fts, 0, ?, ?) AS text, bm25(tests_fts) AS rank
+                FROM tests_fts
+                JOIN tests t ON t.id = tests_fts.rowid
+                WHERE tests_fts MATCH ? {test_filter}
+                ORDER BY rank
+                LIMIT ?
+                """,
+                params,
+            )
+            hits.extend(SearchHit(kind="test", **dict(r)) for r in cur)
+        if "question" in kinds:
+            cur = self.conn.execute(
+                f"""
+                SELECT t.id AS test_id, t.name AS test_name, q.id AS question_id,
+                       snippet(questions_fts, 0, ?, ?, '…', 16) AS text, bm25(questions_fts) AS rank
+                FROM questions_fts
+                JOIN questions q ON q.id = questions_fts.rowid
+                JOIN tests t ON t.id = q.test_id
+                WHERE questions_fts MATCH ? {test_filter}
+                ORDER BY rank
+                LIMIT ?
+                """,
+                params,
+            )
+            hits.extend(SearchHit(kind="question", **dict(r)) for r in cur)
+        if "answer" in kinds:
+            cur = self.conn.execute(
+                f"""
+                SELECT t.id AS test_id, t.name AS test_name, q.id AS question_id,
+                       snippet(answers_fts, 0, ?, ?, '…', 16) AS text, bm25(answers_fts) AS rank
+                FROM answers_fts
+                JOIN answers a ON a.id = answers_fts.rowid
+                JOIN questions q ON q.id = a.question_id
+                JOIN tests t ON t.id = q.test_id
+                WHERE answers_fts MATCH ? {test_filter}
+                ORDER BY rank
+                LIMIT ?
+                """,
+                params,
+            )
+            hits.extend(SearchHit(kind="answer", **dict(r)) for r in cur)
+
+        hits.sort(key=lambda h: h.rank)
+        return hits[:limit]
+
+
+class SessionRepository(BaseRepository[Session]):
+    sortable_columns = ("id",)
+
+    @property
+    def table_name(self) -> str:
+        return "sessions"
+
+    @property
+    def model_class(self):
+        return Session
+
+    def find_unfinished(self, kiosk: str) -> List[Session]:
+        cur = self.conn.execute(
+            "SELECT * FROM sessions WHERE kiosk = ? ORDER BY updated_at DESC",
+            (kiosk,),
+        )
+        return [self._row_to_model(r) for r in cur.fetchall()]
+
+    def update_many(self, updates: Dict[int, dict]) -> None:
+        """{session_id: {колонка: значение}} - одна транзакция на всю пачку."""
+        with self.transaction():
+            for session_id, fields in updates.items():
+                columns = tuple(fields)
+                self.conn.execute(
+                    f"UPDATE sessions SET {', '.join(f'{c} = ?' for c in columns)}, "
+                    "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (*(fields[c] for c in columns), session_id),
+                )
@@ -0,0 +1,238 @@
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from config import RESULT_BATCH, RESULT_QUEUE_SIZE, RESULT_STOP_TIMEOUT
+from database.connection import ConnectionManager
+from database.repo import ResponseRepository, ResultRepository, SessionRepository
+
+# on_done(result_id, error) - вызывается из потока записи
+DoneCallback = Callable[[Optional[int], Optional[BaseException]], None]
+
+_STOP = object()
+
+
+class ResultSpool:
+    """Журнал ещё не записанных результатов: одна строка JSON на результат, с fsync.
+
+    Пока результат в журнале, сбой или отключение питания его не потеряют:
+    при следующем запуске ResultWriter допишет его в базу.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self) -> List[dict]:
+        entries = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        pass  # строка, недописанная в момент сбоя
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def clear(self) -> None:
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class ResultWriter(threading.Thread):
+    """Фоновая запись результатов, чтобы завершение теста не ждало базу.
+
+    submit() пишет результат в журнал и кладёт в ограниченную очередь (при переполнении
+    ждёт - это и есть обратное давление). Поток записи забирает всё, что накопилось,
+    и пишет одной транзакцией через ConnectionManager.run_write, повторяя её при блокировке.
+
+    Если пачка не записалась, результаты пишутся по одному: запись, которую база отвергает
+    (например, тест уже удалён), уходит в карантин <журнал>.bad и не держит остальные.
+    Недоступная база (sqlite3.OperationalError) - не повод для карантина: такие результаты
+    остаются в журнале до следующего запуска.
+    """
+
+    def __init__(
+        self,
+        db: ConnectionManager,
+        spool_path: Optional[str] = None,
+        max_queue: int = RESULT_QUEUE_SIZE,
+        batch_size: int = RESULT_BATCH,
+        retry_delay: float = 1.0,
+        attempts: int = 3,
+    ):
+        super().__init__(daemon=True)
+        self.db = db
+        # у каждого компьютера свой журнал, даже если база лежит в общей папке
+        self.spool = ResultSpool(spool_path or f"{db.db_path}.{socket.gethostname()}.spool")
+        self.quarantine = ResultSpool(f"{self.spool.path}.bad")
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.attempts = attempts
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._callbacks: Dict[str, DoneCallback] = {}
+        self._sessions: Dict[str, int] = {}  # ключ -> сессия, которую удалит запись результата
+        self._outstanding: set = set()  # ключи из журнала, ещё не записанные в базу
+        self._lock = threading.Lock()
+
+        # результаты, оставшиеся в журнале после сбоя, поток допишет первыми
+        self._recovered = self.spool.load()
+        self._outstanding.update(e["key"] for e in self._recovered)
+        self._sessions.update((e["key"], e["session_id"]) for e in self._recovered if e.get("session_id") is not None)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._outstanding)
+
+    def pending_sessions(self) -> set:
+        """Сессии, чьи результаты уже сданы, но ещё не записаны - их не нужно предлагать продолжить."""
+        with self._lock:
+            return set(self._sessions.values())
+
+    def submit(
+        self,
+        result: dict,
+        responses: List[dict],
+        session_id: Optional[int] = None,
+        on_done: Optional[DoneCallback] = None,
+    ) -> str:
+        """result - строка results, responses - строки responses без result_id."""
+        entry = {
+            "key": uuid.uuid4().hex,
+            "result": result,
+            "responses": responses,
+            "session_id": session_id,
+        }
+        with self._lock:
+            self._outstanding.add(entry["key"])
+            if on_done is not None:
+                self._callbacks[entry["key"]] = on_done
+            if session_id is not None:
+                self._sessions[entry["key"]] = session_id
+        self.spool.append(entry)
+        self._queue.put(entry)
+        return entry["key"]
+
+    def stop(self, timeout: Optional[float] = RESULT_STOP_TIMEOUT) -> None:
+        """Дописать очередь и остановить поток; не дождавшись, выход не задерживается - журнал сохранён."""
+        if self.is_alive():
+            self._queue.put(_STOP)
+            self.join(timeout)
+
+    def run(self):
+        try:
+            recovered, self._recovered = self._recovered, []
+            for i in range(0, len(recovered), self.batch_size):
+                self._write_batch(recovered[i:i + self.batch_size])
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [e for e in batch if e is not _STOP]
+                if batch:
+                    self._write_batch(batch)
+        finally:
+            self.db.close_thread()
+
+    def _try_write(self, batch: List[dict], attempts: int):
+        error = None
+        for attempt in range(attempts):
+            try:
+                return self.db.run_write(lambda conn: self._write(conn, batch)), None
+            except Exception as e:
+                error = e
+                if attempt + 1 < attempts:
+                    time.sleep(self.retry_delay * (attempt + 1))
+        return {}, error
+
+    def _write_batch(self, batch: List[dict]) -> None:
+        ids, error = self._try_write(batch, self.attempts)
+        if error is None or len(batch) == 1:
+            self._settle(batch, ids, error)
+            return
+        # по одному, без пауз: блокировки run_write уже переждал
+        for i, e in enumerate(batch):
+            ids, error = self._try_write([e], 1)
+            if isinstance(error, sqlite3.OperationalError):
+                self._settle(batch[i:], {}, error)  # база недоступна - остальные ждут следующего запуска
+                return
+            self._settle([e], ids, error)
+
+    def _settle(self, batch: List[dict], ids: Dict[str, int], error: Optional[BaseException]) -> None:
+        quarantined = error is not None and not isinstance(error, sqlite3.OperationalError)
+        for e in batch if quarantined else ():
+            self.quarantine.append({**e, "error": repr(error)})
+        with self._lock:
+            callbacks = [(self._callbacks.pop(e["key"], None), e["key"]) for e in batch]
+            if error is None or quarantined:
+                self._outstanding.difference_update(e["key"] for e in batch)
+                for e in batch:
+                    self._sessions.pop(e["key"], None)
+            # журнал очищается, только когда в нём не осталось ни одного незаписанного результата;
+            # пока база недоступна, он остаётся до следующего запуска
+            if not self._outstanding:
+                self.spool.clear()
+        for callback, key in callbacks:
+            if callback is not None:
+                callback(ids.get(key), error)
+
+    def _write(self, conn, batch: List[dict]) -> Dict[str, int]:
+        results_repo = ResultRepository(conn)
+        with results_repo.transaction():
+            # после сбоя между commit и очисткой журнала часть записей уже в базе
+            keys = [e["key"] for e in batch]
+            placeholders = ", ".join("?" for _ in keys)
+            done = {
+                row["key"]: row["result_id"]
+                for row in conn.execute(
+                    f"SELECT key, result_id FROM spooled_results WHERE key IN ({placeholders})", keys
+                )
+            }
+            todo = [e for e in batch if e["key"] not in done]
+            if todo:
+                # в журналах прежних версий флага adaptive нет, а у пачки колонки должны совпадать
+                ids = results_repo.create_many([{"adaptive": 0, **e["result"]} for e in todo])
+                # текст ответа для записей из старых журналов проставит триггер
+                ResponseRepository(conn).bulk_create(
+                    [
+                        {"result_id": result_id, "answer_text": None, **row}
+                        for result_id, e in zip(ids, todo)
+                        for row in e["responses"]
+                    ]
+                )
+                conn.executemany(
+                    "INSERT INTO spooled_results (key, result_id) VALUES (?, ?)",
+                    [(e["key"], result_id) for e, result_id in zip(todo, ids)],
+                )
+                done.update((e["key"], result_id) for e, result_id in zip(todo, ids))
+            sessions_repo = SessionRepository(conn)
+            for e in batch:
+                if e.get("session_id") is not None:
+                    sessions_repo.delete(e["session_id"])
+        return done
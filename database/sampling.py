@@ -0,0 +1,135 @@
+import heapq
+import random
+import sqlite3
+from typing import List, Optional, Tuple
+
+from config import EXPOSURE_WEIGHT
+from database.cache import TestPackCache
+from database.models import Answer, Question
+from database.repo import QuestionRepository
+
+# сколько случайных id пробуем на один вопрос, прежде чем перейти к полному проходу
+DRAWS_PER_ITEM = 40
+
+
+class QuestionSampler:
+    """Выбор k вопросов теста за O(k) запросов по индексу, без загрузки банка.
+
+    Случайный id берётся из [min(id), max(id)] теста и принимается, только если такой
+    вопрос есть (с ответами) - пропуски в id после переимпорта не смещают выборку.
+    Вопрос, который тестируемый уже видел n раз (таблица exposures), принимается
+    с вероятностью weight ** n. Маленькие банки и банки с большими дырами в id
+    выбираются полным проходом со взвешенной выборкой без возвращения.
+
+    С cache тексты выбранных вопросов берутся из банка теста в памяти (TestPackCache),
+    а не отдельным запросом; банк перечитывается, когда меняется change_counters['tests'].
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        weight: float = EXPOSURE_WEIGHT,
+        rng: Optional[random.Random] = None,
+        cache: Optional[TestPackCache] = None,
+    ):
+        self.conn = conn
+        self.weight = weight
+        self.rng = rng or random.Random()
+        self.cache = cache
+
+    def _id_range(self, test_id: int) -> Tuple[Optional[int], Optional[int]]:
+        lo = self.conn.execute("SELECT min(id) FROM questions WHERE test_id = ?", (test_id,)).fetchone()[0]
+        hi = self.conn.execute("SELECT max(id) FROM questions WHERE test_id = ?", (test_id,)).fetchone()[0]
+        return lo, hi
+
+    def _exists(self, test_id: int, question_id: int) -> bool:
+        return (
+            self.conn.execute(
+                """
+                SELECT 1 FROM questions q
+                WHERE q.id = ? AND q.test_id = ?
+                  AND EXISTS (SELECT 1 FROM answers a WHERE a.question_id = q.id)
+                """,
+                (question_id, test_id),
+            ).fetchone()
+            is not None
+        )
+
+    def _seen(self, user_name: str, test_id: int, question_id: int) -> int:
+        row = self.conn.execute(
+            "SELECT seen FROM exposures WHERE user_name = ? AND test_id = ? AND question_id = ?",
+            (user_name, test_id, question_id),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def sample_ids(self, test_id: int, k: int, user_name: Optional[str] = None) -> List[int]:
+        lo, hi = self._id_range(test_id)
+        if lo is None or k <= 0:
+            return []
+        if hi - lo + 1 <= 4 * k:
+            # банк сравним с выборкой - полный проход и так O(k)
+            return self._sample_scan(test_id, k, user_name)
+
+        picked: List[int] = []
+        tried = set()
+        postponed: List[Tuple[int, int]] = []  # (сколько раз видел, id) - отклонённые из-за показов
+        for _ in range(k * DRAWS_PER_ITEM):
+            if len(picked) == k:
+                return picked
+            question_id = self.rng.randint(lo, hi)
+            if question_id in tried:
+                continue
+            tried.add(question_id)
+            if not self._exists(test_id, question_id):
+                continue
+            seen = self._seen(user_name, test_id, question_id) if user_name else 0
+            if seen and self.rng.random() >= self.weight ** seen:
+                postponed.append((seen, question_id))
+                continue
+            picked.append(question_id)
+
+        if len(picked) < k and len(picked) + len(postponed) >= k:
+            # почти всё уже видено: добираем наименее показанными из попавшихся
+            postponed.sort()
+            picked.extend(q for _, q in postponed[: k - len(picked)])
+        if len(picked) < k:
+            # id слишком разрежены - лучше один полный проход
+            return self._sample_scan(test_id, k, user_name)
+        return picked
+
+    def _sample_scan(self, test_id: int, k: int, user_name: Optional[str]) -> List[int]:
+        """Взвешенная выборка без возвращения (Efraimidis-Spirakis): ключ u ** (1 / w), берём k наибольших."""
+        cur = self.conn.execute(
+            """
+            SELECT q.id, ifnull(e.seen, 0) FROM questions q
+            LEFT JOIN exposures e ON e.user_name = ? AND e.test_id = q.test_id AND e.question_id = q.id
+            WHERE q.test_id = ?
+              AND EXISTS (SELECT 1 FROM answers a WHERE a.question_id = q.id)
+            """,
+            (user_name or "", test_id),
+        )
+        rng, weight = self.rng, self.weight
+        keyed = ((rng.random() ** (1.0 / max(weight ** seen, 1e-9)), question_id) for question_id, seen in cur)
+        chosen = heapq.nlargest(k, keyed)
+        rng.shuffle(chosen)
+        return [question_id for _, question_id in chosen]
+
+    def sample_session(
+        self, test_id: int, k: int, user_name: Optional[str] = None
+    ) -> List[Tuple[Question, List[Answer]]]:
+        """k вопросов с ответами в случайном порядке (ответы в порядке id - перемешивает вызывающий)."""
+        ids = self.sample_ids(test_id, k, user_name)
+        if not ids:
+            return []
+        questions_repo = QuestionRepository(self.conn)
+        if self.cache is None:
+            found = questions_repo.load_by_ids(ids)
+        else:
+            version = self.conn.execute("SELECT version FROM change_counters WHERE name = 'tests'").fetchone()[0]
+            pack = self.cache.get_or_load(test_id, lambda: questions_repo.load_pack(test_id, version), version)
+            found = pack.by_ids(ids)
+            missing = [q_id for q_id in ids if q_id not in found]
+            if missing:
+                # вопрос добавили в обход менеджера тестов - докачиваем из базы
+                found.update(questions_repo.load_by_ids(missing))
+        return [found[q_id] for q_id in ids if q_id in found]
@@ -0,0 +1,112 @@
+import sqlite3
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from config import PASS_PERCENT
+from database.models import ResultStats
+
+
+BUCKETS = 10
+_HIST_COLUMNS = [f"h{i}" for i in range(BUCKETS)]
+_VALUE_COLUMNS = ["count", "percent_sum", "percent_sq_sum", "passed", *_HIST_COLUMNS]
+
+PERCENT_SQL = "(CASE WHEN max_score > 0 THEN score * 100.0 / max_score ELSE 0 END)"
+BUCKET_SQL = f"min({BUCKETS - 1}, CAST({PERCENT_SQL} / {100 // BUCKETS} AS INTEGER))"
+
+_UPSERT_SQL = f"""
+    INSERT INTO result_stats (test_id, scope, group_name, {', '.join(_VALUE_COLUMNS)})
+    VALUES (?, ?, ?, {', '.join('?' for _ in _VALUE_COLUMNS)})
+    ON CONFLICT (test_id, scope, group_name) DO UPDATE SET
+    {', '.join(f'{c} = {c} + excluded.{c}' for c in _VALUE_COLUMNS)}
+"""
+
+
+def percent_of(score: int, max_score: int) -> float:
+    return score * 100.0 / max_score if max_score > 0 else 0.0
+
+
+def bucket_of(percent: float) -> int:
+    return min(BUCKETS - 1, int(percent // (100 // BUCKETS)))
+
+
+def backfill_sql() -> List[str]:
+    """Полный пересчёт сводки из results (миграция и восстановление)."""
+    hist = ", ".join(f"sum({BUCKET_SQL} = {i})" for i in range(BUCKETS))
+    values = f"""
+        count(*), sum({PERCENT_SQL}), sum({PERCENT_SQL} * {PERCENT_SQL}),
+        sum({PERCENT_SQL} >= {PASS_PERCENT}), {hist}
+    """
+    columns = f"test_id, scope, group_name, {', '.join(_VALUE_COLUMNS)}"
+    return [
+        "DELETE FROM result_stats",
+        f"""
+        INSERT INTO result_stats ({columns})
+        SELECT test_id, 'test', '', {values} FROM results GROUP BY test_id
+        """,
+        f"""
+        INSERT INTO result_stats ({columns})
+        SELECT test_id, 'group', ifnull(group_name, ''), {values}
+        FROM results GROUP BY test_id, ifnull(group_name, '')
+        """,
+    ]
+
+
+class StatsRepository:
+    """Сводка по результатам, которая обновляется при каждой записи в results.
+
+    Хранит для теста и для каждой его группы число результатов, суммы процентов
+    (для среднего и отклонения), число сдавших и гистограмму по 10 корзинам.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def apply(self, results: Iterable[dict], sign: int = 1) -> None:
+        """Учесть (sign=1) или вычесть (sign=-1) результаты; commit делает вызывающий."""
+        deltas = defaultdict(lambda: [0] * len(_VALUE_COLUMNS))
+        for r in results:
+            percent = percent_of(r["score"], r["max_score"])
+            for key in ((r["test_id"], "test", ""), (r["test_id"], "group", r.get("group_name") or "")):
+                d = deltas[key]
+                d[0] += sign
+                d[1] += sign * percent
+                d[2] += sign * percent * percent
+                d[3] += sign * (percent >= PASS_PERCENT)
+                d[4 + bucket_of(percent)] += sign
+        if deltas:
+            self.conn.executemany(_UPSERT_SQL, [(*key, *d) for key, d in deltas.items()])
+
+    def rebuild(self) -> None:
+        for sql in backfill_sql():
+            self.conn.execute(sql)
+        self.conn.commit()
+
+    def _row_to_model(self, row: sqlite3.Row) -> ResultStats:
+        return ResultStats(
+            test_id=row["test_id"],
+            scope=row["scope"],
+            group_name=row["group_name"],
+            count=row["count"],
+            percent_sum=row["percent_sum"],
+            percent_sq_sum=row["percent_sq_sum"],
+            passed=row["passed"],
+            histogram=[row[c] for c in _HIST_COLUMNS],
+        )
+
+    def for_test(self, test_id: int) -> Optional[ResultStats]:
+        row = self.conn.execute(
+            "SELECT * FROM result_stats WHERE test_id = ? AND scope = 'test' AND group_name = ''",
+            (test_id,),
+        ).fetchone()
+        return self._row_to_model(row) if row else None
+
+    def groups_for_test(self, test_id: int) -> List[ResultStats]:
+        cur = self.conn.execute(
+            """
+            SELECT * FROM result_stats
+            WHERE test_id = ? AND scope = 'group' AND count > 0
+            ORDER BY group_name
+            """,
+            (test_id,),
+        )
+        return [self._row_to_model(r) for r in cur.fetchall()]
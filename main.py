@@ -1,15 +1,21 @@
-import sqlite3
+import time
+
+STARTED = time.perf_counter()  # начало отсчёта для отчёта о запуске
+
+import queue
 import tkinter as tk
 import tkinter.font as tkFont
 from tkinter import ttk
 
-from config import DB_NAME
-from database.db import get_connection, init_db
-from database.repo import TestRepository, QuestionRepository, AnswerRepository, ResultRepository
+from config import DB_NAME, DIAG_ENABLED
 
+# экраны - базовые классы App, поэтому импортируются сразу; сами модули тянут только tkinter,
+# а база, импорт, экспорт и замеры подгружаются при первом обращении (warm_up)
 from windows.test_runner import TestRunnerMixin
 from windows.test_manager import TestManagerMixin
 from windows.results_view import ResultsViewMixin
+from windows.diagnostics import DiagnosticsMixin
+from windows.startup import StartupProfile
 
 
 BG_MAIN = "#f6e9ff"
@@ -27,9 +33,12 @@ def center_window(win, width=900, height=600):
     win.geometry(f"{width}x{height}+{x}+{y}")
 
 
-class App(tk.Tk, TestRunnerMixin, TestManagerMixin, ResultsViewMixin):
-    def __init__(self):
+class App(tk.Tk, TestRunnerMixin, TestManagerMixin, ResultsViewMixin, DiagnosticsMixin):
+    def __init__(self, exam_client=None, profile: StartupProfile = None, startup_report: str = None):
+        """До первой отрисовки меню - только окно, шрифты и стили; остальное греет warm_up()."""
         tk.Tk.__init__(self)
+        self.profile = profile or StartupProfile(STARTED)
+        self.startup_report = startup_report
         self.title("TesterMaker")
         self.configure(bg=BG_MAIN)
         center_window(self, 900, 600)
@@ -58,13 +67,21 @@ class App(tk.Tk, TestRunnerMixin, TestManagerMixin, ResultsViewMixin):
         style.configure("Modern.TLabel", background=BG_FRAME, foreground=FG_TEXT, font=self.ui_font)
         style.configure("Modern.Treeview", background="white", fieldbackground="white", foreground=FG_TEXT, font=self.ui_font)
         style.configure("Modern.Treeview.Heading", font=self.ui_font)
+        style.configure("Modern.TCheckbutton", background=BG_FRAME, foreground=FG_TEXT, font=self.ui_font)
+        self.profile.mark("window")
 
-        self.conn: sqlite3.Connection = get_connection(DB_NAME)
-        init_db(self.conn)
-        self.tests_repo = TestRepository(self.conn)
-        self.questions_repo = QuestionRepository(self.conn)
-        self.answers_repo = AnswerRepository(self.conn)
-        self.results_repo = ResultRepository(self.conn)
+        # тонкий клиент работает только через сервер и не открывает локальную базу
+        self.exam_client = exam_client
+        self.remote_session = None
+        self.adaptive = None  # AdaptiveSession идущей адаптивной попытки
+        self.kiosk_name = ""
+        self.session_id = None
+        self.db = None
+        self.conn = None
+        self.autosaver = None
+        self.result_writer = None
+        self.result_events = queue.Queue()
+        self.warmed = False
 
         self.BG_MAIN = BG_MAIN
         self.BG_FRAME = BG_FRAME
@@ -75,7 +92,95 @@ class App(tk.Tk, TestRunnerMixin, TestManagerMixin, ResultsViewMixin):
         self.user_name: str = ""
         self.group_name: str = ""
 
+        # окно диагностики не видно в меню, чтобы до него не добрались тестируемые
+        self.bind_all("<Control-Shift-D>", self.show_diagnostics)
+
         self.show_main_menu()
+        self.update_idletasks()
+        self.profile.mark("menu")
+        self.after_idle(self.warm_up)
+
+    def warm_up(self):
+        """База, фоновая запись и проверка прерванных попыток - после того, как меню уже видно."""
+        if self.warmed:
+            return
+        self.warmed = True
+
+        if self.exam_client is None:
+            import socket
+
+            from database.autosave import WriteBehindSaver
+            from database.cache import test_pack_cache
+            from database.catalog import TestCatalog
+            from database.connection import ConnectionManager
+            from database.db import init_db
+            from database.result_writer import ResultWriter
+            from database.repo import (
+                TestRepository,
+                QuestionRepository,
+                AnswerRepository,
+                ResultRepository,
+                ResponseRepository,
+                SessionRepository,
+                SearchRepository,
+            )
+            from database.sampling import QuestionSampler
+            from database.stats import StatsRepository
+
+            self.profile.mark("imports_db")
+            self.kiosk_name = socket.gethostname()
+            self.db = ConnectionManager(DB_NAME)
+            self.conn = self.db.writer()
+            # при актуальной схеме это одно чтение PRAGMA user_version
+            init_db(self.conn)
+            self.tests_repo = TestRepository(self.conn)
+            self.questions_repo = QuestionRepository(self.conn)
+            self.answers_repo = AnswerRepository(self.conn)
+            self.results_repo = ResultRepository(self.conn)
+            self.responses_repo = ResponseRepository(self.conn)
+            self.sessions_repo = SessionRepository(self.conn)
+            self.search_repo = SearchRepository(self.conn)
+            self.stats_repo = StatsRepository(self.conn)
+            # банки тестов в памяти; менеджер тестов сбрасывает их при импорте, правке и удалении
+            self.test_packs = test_pack_cache
+            self.sampler = QuestionSampler(self.conn, cache=self.test_packs)
+            # общий для экранов каталог тестов, перечитывается только после изменений tests
+            self.catalog = TestCatalog(self.conn)
+            self.profile.mark("database")
+
+            # незавершённые попытки пишутся в фоне, чтобы пережить сбой или отключение питания
+            self.autosaver = WriteBehindSaver(self.db)
+            self.autosaver.start()
+
+            # результаты пишутся в фоне; оставшиеся в журнале после сбоя дописываются сразу
+            self.result_writer = ResultWriter(self.db)
+            self.result_writer.start()
+            self.profile.mark("writers")
+
+        if DIAG_ENABLED:
+            self.enable_diagnostics()
+        self.profile.mark("ready")
+
+        if self.startup_report is not None:
+            print(self.profile.format())
+            if self.startup_report:
+                self.profile.dump(self.startup_report)
+                print(f"\nОтчёт: {self.startup_report}")
+            self.after_idle(self.on_close)
+        elif self.exam_client is None:
+            self.offer_resume()
+
+    def ready(self, command):
+        """Кнопка меню, нажатая до окончания warm_up(), сначала дожидается его."""
+
+        def run():
+            if not self.warmed:
+                self.warm_up()
+                if self.session_id is not None:
+                    return  # warm_up продолжил прерванную попытку
+            command()
+
+        return run
 
 
     def clear_root(self):
@@ -91,7 +196,7 @@ class App(tk.Tk, TestRunnerMixin, TestManagerMixin, ResultsViewMixin):
         self.attributes("-fullscreen", on)
 
     def show_main_menu(self):
-        self.timer_running = False if hasattr(self, "timer_running") else False
+        self.stop_exam_clock()
         self.set_fullscreen(False)
         self.clear_root()
         center_window(self, 700, 500)
@@ -110,44 +215,87 @@ class App(tk.Tk, TestRunnerMixin, TestManagerMixin, ResultsViewMixin):
         ttk.Button(
             frame,
             text="Начать тестирование",
-            command=self.start_testing_menu,
+            command=self.ready(self.start_testing_menu),
             style="Modern.TButton",
             width=btn_width,
         ).pack(pady=5)
 
+        if self.exam_client is not None:
+            ttk.Label(
+                frame,
+                text=f"Сервер: {self.exam_client.address}",
+                style="Modern.TLabel",
+            ).pack(pady=(0, 10))
+        else:
+            self.add_local_menu_buttons(frame, btn_width)
+
         ttk.Button(
             frame,
-            text="Менеджер тестов",
-            command=self.show_test_manager,
+            text="Выход",
+            command=self.on_close,
             style="Modern.TButton",
             width=btn_width,
-        ).pack(pady=5)
+        ).pack(pady=(20, 10))
 
+    def add_local_menu_buttons(self, frame, btn_width):
         ttk.Button(
             frame,
-            text="Ведомость (результаты)",
-            command=self.show_results_view,
+            text="Менеджер тестов",
+            command=self.ready(self.show_test_manager),
             style="Modern.TButton",
             width=btn_width,
         ).pack(pady=5)
 
         ttk.Button(
             frame,
-            text="Выход",
-            command=self.on_close,
+            text="Ведомость (результаты)",
+            command=self.ready(self.show_results_view),
             style="Modern.TButton",
             width=btn_width,
-        ).pack(pady=(20, 10))
+        ).pack(pady=5)
+
+    def stop_exam_clock(self):
+        clock = getattr(self, "exam_clock", None)
+        if clock is not None:
+            clock.stop()
 
     def on_close(self):
-        if hasattr(self, "timer_running"):
-            self.timer_running = False
+        self.stop_exam_clock()
+        if getattr(self, "session_id", None) is not None:
+            self.autosave_session()
+        if self.autosaver is not None:
+            self.autosaver.stop()
+        if self.result_writer is not None:
+            self.result_writer.stop()
         if self.conn:
-            self.conn.close()
+            self.db.close_all()
+        if self.exam_client is not None:
+            self.exam_client.close()
         self.destroy()
 
 
 if __name__ == "__main__":
-    app = App()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="TesterMaker")
+    parser.add_argument("--server", help="host:port сервера тестирования (режим тонкого клиента)")
+    parser.add_argument(
+        "--startup-report",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="замерить запуск, напечатать время этапов (и записать JSON в FILE) и выйти",
+    )
+    args = parser.parse_args()
+
+    profile = StartupProfile(STARTED)
+    exam_client = None
+    if args.server:
+        from server.client import ExamClient
+
+        exam_client = ExamClient(args.server)
+    profile.mark("imports")
+
+    app = App(exam_client, profile=profile, startup_report=args.startup_report)
     app.protocol("WM_DELETE_WINDOW", app.on_close)
     app.mainloop()
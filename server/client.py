@@ -0,0 +1,87 @@
+import socket
+from typing import List, Optional, Tuple
+
+from config import SERVER_PORT, SERVER_TIMEOUT
+from database.models import Answer, Question, Test
+from server.protocol import ExamServerError, decode, encode, parse_address
+
+
+class ExamClient:
+    """Синхронный клиент сервера тестирования для экрана прохождения теста.
+
+    Запросы короткие и идут по одному, поэтому хватает блокирующего сокета с таймаутом;
+    при обрыве соединение открывается заново при следующем запросе.
+    """
+
+    def __init__(self, address: str, timeout: float = SERVER_TIMEOUT):
+        self.host, self.port = parse_address(address, SERVER_PORT)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile("rwb")
+
+    def close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._file = None
+
+    def call(self, op: str, **args):
+        if self._sock is None:
+            self._connect()
+        try:
+            self._file.write(encode({"op": op, "args": args}))
+            self._file.flush()
+            line = self._file.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("Сервер закрыл соединение")
+        reply = decode(line)
+        if not reply.get("ok"):
+            raise ExamServerError(reply.get("error", "Ошибка сервера"))
+        return reply.get("data")
+
+    def ping(self) -> dict:
+        return self.call("ping")
+
+    def list_tests(self, limit: int, after: Optional[tuple] = None) -> List[Test]:
+        return [Test(**t) for t in self.call("list_tests", limit=limit, after=list(after) if after else None)]
+
+    def search_tests(self, query: str, limit: int = 50) -> List[Tuple[Test, str]]:
+        return [(Test(**row["test"]), row["label"]) for row in self.call("search_tests", query=query, limit=limit)]
+
+    def start_session(
+        self, test_id: int, user_name: str, group_name: Optional[str]
+    ) -> Tuple[str, Test, List[Tuple[Question, List[Answer]]]]:
+        """Начать попытку; варианты приходят без признака правильности (is_correct=False)."""
+        data = self.call("start", test_id=test_id, user_name=user_name, group_name=group_name)
+        test = Test(**data["test"])
+        questions = [
+            (
+                Question(id=q["id"], test_id=test.id, q_text=q["text"]),
+                [Answer(id=a["id"], question_id=q["id"], a_text=a["text"], is_correct=False) for a in q["answers"]],
+            )
+            for q in data["questions"]
+        ]
+        return data["session"], test, questions
+
+    def finish_session(self, session: str, answer_ids: List[Optional[int]]) -> dict:
+        """Сдать попытку; сервер оценивает и возвращает score, max_score, time_taken, result_id."""
+        return self.call("finish", session=session, answers=answer_ids)
+
+    def cancel_session(self, session: str) -> None:
+        self.call("cancel", session=session)
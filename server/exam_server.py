@@ -0,0 +1,327 @@
+import asyncio
+import random
+import secrets
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set
+
+from config import DB_NAME, SERVER_HOST, SERVER_PORT, SERVER_READ_THREADS, SERVER_WRITE_QUEUE
+from database.cache import test_pack_cache
+from database.connection import ConnectionManager, retry_on_busy
+from database.db import init_db
+from database.repo import ResponseRepository, ResultRepository, TestRepository
+from database.sampling import QuestionSampler
+from server.protocol import MAX_MESSAGE, ExamServerError, decode, encode
+
+# сколько ждать сдачи после окончания лимита времени, прежде чем забыть попытку
+SESSION_GRACE = 300
+FINISHED_KEEP = 600
+
+
+@dataclass
+class ServerSession:
+    test_id: int
+    user_name: str
+    group_name: Optional[str]
+    time_limit: int
+    question_ids: List[int]
+    answer_ids: List[Dict[int, str]]  # допустимые ответы вопроса i: id -> текст
+    correct_ids: Set[int]
+    started: float = field(default_factory=time.monotonic)
+
+
+class ExamServer:
+    """Сервер попыток для тонких клиентов поверх тех же репозиториев, что и App.
+
+    Чтение идёт в пуле потоков (у каждого своё соединение из ConnectionManager),
+    вся запись - через одну задачу, которая склеивает результаты всех клиентов,
+    пришедшие за время предыдущей записи, в одну транзакцию. Правильные ответы
+    клиенту не отправляются: оценивает сервер.
+    """
+
+    def __init__(self, db_path: str = DB_NAME, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        self.db = ConnectionManager(db_path)
+        self.host = host
+        self.port = port
+        self.sessions: Dict[str, ServerSession] = {}
+        self._finished: Dict[str, tuple] = {}  # token -> (время сдачи, ответ); повтор finish после обрыва
+        self._pending: Dict[str, asyncio.Future] = {}  # token -> ответ на finish, пока результат пишется
+        self._reads = ThreadPoolExecutor(SERVER_READ_THREADS, thread_name_prefix="exam-read")
+        self._write_thread = ThreadPoolExecutor(1, thread_name_prefix="exam-write")
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._last_sweep = time.monotonic()
+        self._handlers = {
+            "ping": self.op_ping,
+            "list_tests": self.op_list_tests,
+            "search_tests": self.op_search_tests,
+            "start": self.op_start,
+            "finish": self.op_finish,
+            "cancel": self.op_cancel,
+        }
+
+    # --- запуск и остановка ---
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._write_thread, lambda: init_db(self.db.writer()))
+        self._writes = asyncio.Queue(maxsize=SERVER_WRITE_QUEUE)
+        self._writer_task = asyncio.create_task(self._write_loop())
+        self._server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_MESSAGE)
+        # при port=0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._clients):
+            writer.close()
+        if self._writer_task is not None:
+            # дописываем всё, что уже принято от клиентов
+            await self._writes.join()
+            self._writer_task.cancel()
+            self._writer_task = None
+        self._reads.shutdown(wait=True)
+        self._write_thread.shutdown(wait=True)
+        self.db.close_all()
+
+    # --- соединения клиентов ---
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(encode(await self.dispatch(line)))
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def dispatch(self, line: bytes) -> dict:
+        try:
+            request = decode(line)
+            handler = self._handlers.get(request.get("op"))
+            if handler is None:
+                raise ExamServerError(f"Неизвестная операция: {request.get('op')}")
+            return {"ok": True, "data": await handler(**request.get("args", {}))}
+        except ExamServerError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            return {"ok": False, "error": f"Ошибка сервера: {e}"}
+
+    async def _read(self, func):
+        return await asyncio.get_running_loop().run_in_executor(self._reads, func)
+
+    # --- операции ---
+
+    async def op_ping(self) -> dict:
+        return {"sessions": len(self.sessions)}
+
+    async def op_list_tests(self, limit: int = 100, after: Optional[list] = None) -> list:
+        tests = await self._read(
+            lambda: TestRepository(self.db.reader()).find_page(limit, after=tuple(after) if after else None)
+        )
+        return [asdict(t) for t in tests]
+
+    async def op_search_tests(self, query: str, limit: int = 50) -> list:
+        found = await self._read(lambda: TestRepository(self.db.reader()).search_highlighted(query, limit=limit))
+        return [{"test": asdict(t), "label": label} for t, label in found]
+
+    async def op_start(self, test_id: int, user_name: str, group_name: Optional[str] = None) -> dict:
+        if not str(user_name).strip():
+            raise ExamServerError("Не указано имя тестируемого")
+        self._sweep()
+
+        def load():
+            conn = self.db.reader()
+            test = TestRepository(conn).find_by_id(test_id)
+            if test is None or test.adaptive:
+                return test, []
+            # банк теста общий для всех клиентов; правка теста меняет change_counters и сбрасывает его
+            return test, QuestionSampler(conn, cache=test_pack_cache).sample_session(test_id, test.questions, user_name)
+
+        test, questions = await self._read(load)
+        if test is None:
+            raise ExamServerError("Тест не найден")
+        if test.adaptive:
+            # вопросы адаптивного теста подбираются по ответам; фиксированный вариант его подменил бы
+            raise ExamServerError("Адаптивные тесты через сервер не проводятся. Пройдите тест на локальной базе.")
+        if not questions:
+            raise ExamServerError("У этого теста пока нет вопросов с ответами.")
+
+        for _, answers in questions:
+            random.shuffle(answers)
+        token = secrets.token_urlsafe(16)
+        self.sessions[token] = ServerSession(
+            test_id=test.id,
+            user_name=user_name,
+            group_name=group_name,
+            time_limit=test.time_limit,
+            question_ids=[q.id for q, _ in questions],
+            answer_ids=[{a.id: a.a_text for a in answers} for _, answers in questions],
+            correct_ids={a.id for _, answers in questions for a in answers if a.is_correct},
+        )
+        return {
+            "session": token,
+            "test": asdict(test),
+            "questions": [
+                {
+                    "id": q.id,
+                    "text": q.q_text,
+                    "answers": [{"id": a.id, "text": a.a_text} for a in answers],
+                }
+                for q, answers in questions
+            ],
+        }
+
+    async def op_finish(self, session: str, answers: List[Optional[int]]) -> dict:
+        if session in self._finished:
+            return self._finished[session][1]
+        if session in self._pending:
+            # повтор после таймаута клиента, пока первая сдача ещё в очереди записи - ждём её же
+            return await asyncio.shield(self._pending[session])
+        s = self.sessions.get(session)
+        if s is None:
+            raise ExamServerError("Попытка не найдена на сервере")
+        if len(answers) != len(s.question_ids):
+            raise ExamServerError("Число ответов не совпадает с числом вопросов")
+
+        responses = []
+        for q_id, allowed, answer_id in zip(s.question_ids, s.answer_ids, answers):
+            if answer_id not in allowed:
+                answer_id = None
+            responses.append(
+                {
+                    "question_id": q_id,
+                    "answer_id": answer_id,
+                    "answer_text": allowed.get(answer_id),
+                    "is_correct": int(answer_id in s.correct_ids),
+                }
+            )
+        score = sum(r["is_correct"] for r in responses)
+        time_taken = min(int(round(time.monotonic() - s.started)), s.time_limit)
+        result = {
+            "test_id": s.test_id,
+            "user_name": s.user_name,
+            "group_name": s.group_name,
+            "score": score,
+            "max_score": len(responses),
+            "time_taken": time_taken,
+        }
+
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        reply = self._pending[session] = loop.create_future()
+
+        def settle(done: asyncio.Future) -> None:
+            # итог записи разбирается здесь, а не в op_finish: отмена ожидающего клиента его не теряет
+            self._pending.pop(session, None)
+            error = ExamServerError("Запись результата прервана") if done.cancelled() else done.exception()
+            if error is not None:
+                reply.set_exception(error)
+                return
+            data = {"result_id": done.result(), "score": score, "max_score": len(responses), "time_taken": time_taken}
+            self.sessions.pop(session, None)
+            self._finished[session] = (time.monotonic(), data)
+            reply.set_result(data)
+
+        done.add_done_callback(settle)
+        try:
+            await self._writes.put((result, responses, done))
+        except BaseException:
+            self._pending.pop(session, None)
+            reply.cancel()
+            raise
+        return await asyncio.shield(reply)
+
+    async def op_cancel(self, session: str) -> dict:
+        return {"cancelled": self.sessions.pop(session, None) is not None}
+
+    def _sweep(self) -> None:
+        """Забыть брошенные попытки и старые ответы на finish (не чаще раза в минуту)."""
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for token, s in list(self.sessions.items()):
+            if now - s.started > s.time_limit + SESSION_GRACE:
+                del self.sessions[token]
+        for token, (finished, _) in list(self._finished.items()):
+            if now - finished > FINISHED_KEEP:
+                del self._finished[token]
+
+    # --- единственный писатель ---
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            while not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                ids = await loop.run_in_executor(
+                    self._write_thread, self._write_results, [(r, resp) for r, resp, _ in batch]
+                )
+            except Exception as e:
+                traceback.print_exc(file=sys.stderr)
+                for _, _, done in batch:
+                    if not done.done():
+                        done.set_exception(ExamServerError(f"Не удалось сохранить результат: {e}"))
+            else:
+                for (_, _, done), result_id in zip(batch, ids):
+                    if not done.done():
+                        done.set_result(result_id)
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _write_results(self, batch) -> List[int]:
+        conn = self.db.writer()
+        results_repo = ResultRepository(conn)
+        responses_repo = ResponseRepository(conn)
+
+        def write():
+            with results_repo.transaction():
+                ids = results_repo.create_many([result for result, _ in batch])
+                responses_repo.bulk_create(
+                    [
+                        {"result_id": result_id, **row}
+                        for result_id, (_, rows) in zip(ids, batch)
+                        for row in rows
+                    ]
+                )
+            return ids
+
+        return retry_on_busy(write)
+
+
+def serve(db_path: str = DB_NAME, host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+    server = ExamServer(db_path, host, port)
+
+    async def main():
+        await server.start()
+        print(f"Сервер тестирования: {server.host}:{server.port} (база {db_path}), Ctrl+C - остановка")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,30 @@
+import json
+from typing import Tuple
+
+# одно сообщение - одна строка JSON в UTF-8:
+#   запрос  {"op": "start", "args": {...}}
+#   ответ   {"ok": true, "data": ...} или {"ok": false, "error": "текст"}
+MAX_MESSAGE = 4 * 1024 * 1024
+
+
+class ExamServerError(Exception):
+    """Ошибка, о которой сервер сообщил клиенту (текст показывается пользователю)."""
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def decode(line: bytes) -> dict:
+    message = json.loads(line.decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ExamServerError("Некорректное сообщение")
+    return message
+
+
+def parse_address(address: str, default_port: int) -> Tuple[str, int]:
+    """'host:port' или 'host' -> (host, port)."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, default_port
+    return host, int(port)
@@ -0,0 +1,147 @@
+import os
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk, filedialog, messagebox
+
+# переходы между экранами и тяжёлые действия интерфейса, которые меряются вместе с репозиториями
+SCREEN_METHODS = (
+    "show_main_menu",
+    "start_testing_menu",
+    "start_selected_test",
+    "show_question_screen",
+    "finish_test",
+    "show_test_manager",
+    "load_manager_tests",
+    "show_results_view",
+    "load_results_table",
+)
+
+
+class DiagnosticsMixin:
+    """Скрытое окно диагностики (Ctrl+Shift+D): задержки по методам и журнал медленных SQL."""
+
+    @property
+    def instruments(self):
+        """Общий набор замеров; модуль тянет inspect, поэтому грузится при первом обращении, а не при запуске."""
+        from database.instrument import instruments
+
+        return instruments
+
+    def enable_diagnostics(self):
+        db = getattr(self, "db", None)
+        self.instruments.enable(connections=db.connections() if db else ())
+        self.instruments.instrument_class(type(self), SCREEN_METHODS, prefix="screen.")
+
+    def disable_diagnostics(self):
+        self.instruments.disable()
+
+    def show_diagnostics(self, *args):
+        clock = getattr(self, "exam_clock", None)
+        if clock is not None and clock.running:
+            return  # не во время теста
+        window = getattr(self, "diag_window", None)
+        if window is not None and window.winfo_exists():
+            window.lift()
+            return
+
+        window = self.diag_window = tk.Toplevel(self)
+        window.title("Диагностика")
+        window.configure(bg=self.BG_FRAME)
+        self.center_window(window, 900, 600)
+
+        frame = ttk.Frame(window, style="Modern.TFrame")
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        top = ttk.Frame(frame, style="Modern.TFrame")
+        top.pack(fill="x")
+        self.diag_status = ttk.Label(top, style="Modern.TLabel")
+        self.diag_status.pack(side="left")
+        self.diag_toggle_btn = ttk.Button(top, command=self.toggle_diagnostics, style="Modern.TButton", width=12)
+        self.diag_toggle_btn.pack(side="right")
+        ttk.Button(top, text="Сбросить", command=self.reset_diagnostics, style="Modern.TButton", width=10).pack(
+            side="right", padx=(0, 5)
+        )
+        ttk.Button(top, text="В файл...", command=self.dump_diagnostics, style="Modern.TButton", width=10).pack(
+            side="right", padx=(0, 5)
+        )
+
+        columns = ("name", "count", "mean", "p50", "p95", "max")
+        tree_frame = ttk.Frame(frame, style="Modern.TFrame")
+        tree_frame.pack(fill="both", expand=True, pady=(10, 5))
+        self.diag_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=14, style="Modern.Treeview")
+        for col, title, width in (
+            ("name", "Метод / экран", 330),
+            ("count", "Вызовов", 80),
+            ("mean", "Среднее, мс", 100),
+            ("p50", "p50, мс", 90),
+            ("p95", "p95, мс", 90),
+            ("max", "Макс, мс", 90),
+        ):
+            self.diag_tree.heading(col, text=title)
+            self.diag_tree.column(col, width=width, anchor="w" if col == "name" else "e")
+        self.diag_tree.pack(side="left", fill="both", expand=True)
+        scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.diag_tree.yview)
+        scroll.pack(side="right", fill="y")
+        self.diag_tree.config(yscrollcommand=scroll.set)
+
+        ttk.Label(frame, text=f"Медленные вызовы (от {self.instruments.slow_ms:.0f} мс):", style="Modern.TLabel").pack(
+            anchor="w"
+        )
+        self.diag_slow = tk.Text(frame, height=10, wrap="none", font=("Consolas", 9))
+        self.diag_slow.pack(fill="both", expand=True)
+
+        self.refresh_diagnostics()
+
+    def toggle_diagnostics(self):
+        if self.instruments.enabled:
+            self.disable_diagnostics()
+        else:
+            self.enable_diagnostics()
+        self.refresh_diagnostics(reschedule=False)
+
+    def reset_diagnostics(self):
+        self.instruments.reset()
+        self.refresh_diagnostics(reschedule=False)
+
+    def dump_diagnostics(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.diag_window,
+            title="Сохранить диагностику",
+            defaultextension=".json",
+            initialfile=f"diagnostics_{datetime.now():%Y%m%d_%H%M%S}.json",
+            filetypes=[("JSON", "*.json")],
+        )
+        if not path:
+            return
+        self.instruments.dump(path)
+        messagebox.showinfo("Диагностика", f"Сохранено: {os.path.basename(path)}", parent=self.diag_window)
+
+    def refresh_diagnostics(self, reschedule=True):
+        window = getattr(self, "diag_window", None)
+        if window is None or not window.winfo_exists():
+            return
+
+        snapshot = self.instruments.snapshot()
+        self.diag_status.config(
+            text=f"Замеры включены с {snapshot['enabled_since']}" if self.instruments.enabled else "Замеры выключены"
+        )
+        self.diag_toggle_btn.config(text="Выключить" if self.instruments.enabled else "Включить")
+
+        self.diag_tree.delete(*self.diag_tree.get_children())
+        rows = sorted(snapshot["stats"].items(), key=lambda item: item[1]["mean_ms"] * item[1]["count"], reverse=True)
+        for name, st in rows:
+            self.diag_tree.insert(
+                "",
+                "end",
+                values=(name, st["count"], f"{st['mean_ms']:.2f}", f"{st['p50_ms']:.2f}", f"{st['p95_ms']:.2f}",
+                        f"{st['max_ms']:.2f}"),
+            )
+
+        self.diag_slow.delete("1.0", tk.END)
+        for entry in reversed(snapshot["slow_log"]):
+            self.diag_slow.insert(tk.END, f"{entry['at']}  {entry['ms']:.1f} мс  {entry['name']} [{entry['thread']}]\n")
+            for sql in entry["sql"]:
+                self.diag_slow.insert(tk.END, "    " + " ".join(sql.split())[:500] + "\n")
+
+        if reschedule:
+            window.after(1000, self.refresh_diagnostics)
@@ -0,0 +1,99 @@
+import math
+import time
+from typing import Callable, Optional
+
+
+class ExamClock:
+    """Таймер теста по абсолютному монотонному дедлайну, работающий в цикле событий Tk.
+
+    Оставшееся время всегда считается как deadline - time.monotonic(), поэтому медленные
+    тики или занятый интерфейс не накапливают погрешность. Следующий тик планируется
+    на ближайшую смену целой секунды, последний - ровно на дедлайн.
+    """
+
+    def __init__(
+        self,
+        widget,
+        duration: float,
+        on_tick: Callable[[int], None],
+        on_expire: Callable[[], None],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.widget = widget
+        self.duration = float(duration)
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.clock = clock
+        self._remaining = float(duration)  # пока не запущен или на паузе
+        self._deadline: Optional[float] = None
+        self._after_id = None
+        self.expired = False
+
+    @property
+    def running(self) -> bool:
+        return self._deadline is not None
+
+    def remaining(self) -> float:
+        if self._deadline is None:
+            return max(self._remaining, 0.0)
+        return max(self._deadline - self.clock(), 0.0)
+
+    def elapsed(self) -> float:
+        return self.duration - self.remaining()
+
+    def start(self) -> None:
+        if self.running or self.expired:
+            return
+        self._deadline = self.clock() + self._remaining
+        self._tick()
+
+    resume = start
+
+    def pause(self) -> None:
+        if not self.running:
+            return
+        self._remaining = self.remaining()
+        self._deadline = None
+        self._cancel()
+
+    def stop(self) -> None:
+        self.pause()
+        self.expired = True
+
+    def _cancel(self) -> None:
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _tick(self) -> None:
+        self._after_id = None
+        if not self.running:
+            return
+        left = self.remaining()
+        self.on_tick(math.ceil(left))
+        if left <= 0:
+            self._deadline = None
+            self._remaining = 0.0
+            self.expired = True
+            self.on_expire()
+            return
+        fraction = left - math.floor(left)
+        delay = fraction if fraction > 0 else 1.0
+        self._after_id = self.widget.after(max(int(math.ceil(delay * 1000)), 1), self._tick)
+
+    def to_dict(self) -> dict:
+        return {
+            "duration": self.duration,
+            "remaining": self.remaining(),
+            "running": self.running,
+        }
+
+    @classmethod
+    def from_dict(cls, widget, data: dict, on_tick, on_expire) -> "ExamClock":
+        """Восстановить таймер; запускать его нужно явно через start()."""
+        clock = cls(widget, data["duration"], on_tick, on_expire)
+        clock._remaining = float(data["remaining"])
+        return clock
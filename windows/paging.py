@@ -0,0 +1,176 @@
+import tkinter as tk
+from typing import Callable, Generic, List, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class ListboxPager(Generic[T]):
+    """Подгрузка строк в Listbox страницами по мере прокрутки.
+
+    fetch_page(after, limit) возвращает следующую страницу после ключа after
+    (None - первая страница), key_of(item) даёт ключ для следующего запроса.
+    Загруженные объекты лежат в items в том же порядке, что и строки списка.
+    """
+
+    def __init__(
+        self,
+        listbox: tk.Listbox,
+        fetch_page: Callable[[Optional[tuple], int], List[T]],
+        format_item: Callable[[T], str],
+        key_of: Callable[[T], tuple],
+        scrollbar=None,
+        page_size: int = 100,
+        threshold: float = 0.9,
+    ):
+        self.listbox = listbox
+        self.fetch_page = fetch_page
+        self.format_item = format_item
+        self.key_of = key_of
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.threshold = threshold
+        self.items: List[T] = []
+        self.exhausted = False
+        self._loading = False
+        listbox.config(yscrollcommand=self.on_yscroll)
+
+    def reset(self) -> None:
+        self.listbox.delete(0, tk.END)
+        self.items = []
+        self.exhausted = False
+        self.load_more()
+
+    def load_more(self) -> None:
+        if self.exhausted or self._loading:
+            return
+        self._loading = True
+        try:
+            after = self.key_of(self.items[-1]) if self.items else None
+            page = self.fetch_page(after, self.page_size)
+            if len(page) < self.page_size:
+                self.exhausted = True
+            self.items.extend(page)
+            for item in page:
+                self.listbox.insert(tk.END, self.format_item(item))
+        finally:
+            self._loading = False
+
+    def load_all(self) -> None:
+        while not self.exhausted:
+            self.load_more()
+
+    def on_yscroll(self, first, last) -> None:
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if not self.exhausted and float(last) >= self.threshold:
+            # догружаем вне обработчика прокрутки, иначе insert снова вызовет on_yscroll
+            self.listbox.after_idle(self.load_more)
+
+
+class TreeviewWindow:
+    """Виртуализированный Treeview: в виджете держится не больше max_rows строк.
+
+    fetch(after, limit, backward) возвращает строки после ключа after по порядку показа,
+    а при backward=True - строки перед ключом, ближайшие первыми.
+    key_of(row) - ключ строки, to_values(row) - значения столбцов.
+    """
+
+    def __init__(
+        self,
+        tree,
+        fetch: Callable[[Optional[tuple], int, bool], list],
+        key_of: Callable[[object], tuple],
+        to_values: Callable[[object], tuple],
+        scrollbar=None,
+        page_size: int = 100,
+        max_rows: int = 300,
+        threshold: float = 0.1,
+    ):
+        self.tree = tree
+        self.fetch = fetch
+        self.key_of = key_of
+        self.to_values = to_values
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.max_rows = max(max_rows, page_size * 2)
+        self.threshold = threshold
+        self.keys: List[tuple] = []  # ключи строк в порядке показа
+        self.at_start = True
+        self.at_end = True
+        self._pending = False
+        tree.config(yscrollcommand=self.on_yscroll)
+
+    def reset(self) -> None:
+        self.tree.delete(*self.tree.get_children())
+        self.keys = []
+        self.at_start = True
+        self.at_end = False
+        self.load_next()
+        self.tree.yview_moveto(0)
+
+    def _top_index(self) -> int:
+        return int(round(self.tree.yview()[0] * len(self.keys)))
+
+    def _restore_top(self, top: int) -> None:
+        if self.keys:
+            self.tree.yview_moveto(max(top, 0) / len(self.keys))
+
+    def load_next(self) -> None:
+        if self.at_end:
+            return
+        rows = self.fetch(self.keys[-1] if self.keys else None, self.page_size, False)
+        if len(rows) < self.page_size:
+            self.at_end = True
+        top = self._top_index()
+        for row in rows:
+            self.tree.insert("", "end", values=self.to_values(row))
+            self.keys.append(self.key_of(row))
+
+        extra = len(self.keys) - self.max_rows
+        if extra > 0:
+            children = self.tree.get_children()
+            self.tree.delete(*children[:extra])
+            del self.keys[:extra]
+            self.at_start = False
+            top -= extra
+        self._restore_top(top)
+
+    def load_prev(self) -> None:
+        if self.at_start or not self.keys:
+            return
+        rows = self.fetch(self.keys[0], self.page_size, True)
+        if len(rows) < self.page_size:
+            self.at_start = True
+        top = self._top_index()
+        for row in rows:
+            self.tree.insert("", 0, values=self.to_values(row))
+            self.keys.insert(0, self.key_of(row))
+        top += len(rows)
+
+        extra = len(self.keys) - self.max_rows
+        if extra > 0:
+            children = self.tree.get_children()
+            self.tree.delete(*children[-extra:])
+            del self.keys[-extra:]
+            self.at_end = False
+        self._restore_top(top)
+
+    def on_yscroll(self, first, last) -> None:
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if self._pending:
+            return
+        if not self.at_end and float(last) >= 1 - self.threshold:
+            self._schedule(self.load_next)
+        elif not self.at_start and float(first) <= self.threshold:
+            self._schedule(self.load_prev)
+
+    def _schedule(self, func) -> None:
+        self._pending = True
+
+        def run():
+            self._pending = False
+            func()
+
+        self.tree.after_idle(run)
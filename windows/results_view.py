@@ -1,8 +1,19 @@
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk
-from datetime import datetime, timezone as tz
+from datetime import datetime, timedelta, timezone
+from tkinter import ttk, filedialog, messagebox
 
-from database.models import Result
+from windows.paging import TreeviewWindow
+
+ALL_GROUPS = "все группы"
+NO_GROUP = "без группы"
+
+
+def local_day_to_utc(day: str, days: int = 0) -> str:
+    """Начало местного дня 'ГГГГ-ММ-ДД' (+days) в UTC, как хранится taken_at."""
+    start = datetime.strptime(day, "%Y-%m-%d") + timedelta(days=days)
+    return start.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
 
 class ResultsViewMixin:
@@ -37,8 +48,8 @@ class ResultsViewMixin:
         )
         self.results_tests_combo.pack(side="left", padx=(5, 5), fill="x", expand=True)
 
-        self.results_tests = self.tests_repo.find_all(limit=1000)
-        names = [t.name for t in self.results_tests]
+        # Combobox не умеет подгружать значения при прокрутке - берём весь каталог из памяти
+        names = [t.name for t in self.catalog.sorted_by_name()]
         self.results_tests_combo["values"] = names
         if names:
             self.results_tests_combo.current(0)
@@ -55,6 +66,29 @@ class ResultsViewMixin:
             width=10,
         ).pack(side="left", padx=(5, 0))
 
+        ttk.Button(
+            top,
+            text="Экспорт...",
+            command=self.export_results,
+            style="Modern.TButton",
+            width=10,
+        ).pack(side="left", padx=(5, 0))
+
+        # фильтры выгрузки: группа и местные даты включительно, пустая дата - без границы
+        filters = ttk.Frame(frame, style="Modern.TFrame")
+        filters.pack(fill="x", pady=(5, 0))
+        ttk.Label(filters, text="Экспорт - группа:", style="Modern.TLabel").pack(side="left")
+        self.export_group_var = tk.StringVar(value=ALL_GROUPS)
+        self.export_group_combo = ttk.Combobox(
+            filters, textvariable=self.export_group_var, state="readonly", font=self.ui_font, width=20
+        )
+        self.export_group_combo.pack(side="left", padx=(5, 10))
+        self.export_from_var = tk.StringVar()
+        self.export_to_var = tk.StringVar()
+        for title, var in (("с (ГГГГ-ММ-ДД):", self.export_from_var), ("по:", self.export_to_var)):
+            ttk.Label(filters, text=title, style="Modern.TLabel").pack(side="left")
+            ttk.Entry(filters, textvariable=var, font=self.ui_font, width=12).pack(side="left", padx=(5, 10))
+
         columns = (
             "user_name",
             "group_name",
@@ -63,15 +97,22 @@ class ResultsViewMixin:
             "time_taken",
             "taken_at",
         )
+        tree_frame = ttk.Frame(frame, style="Modern.TFrame")
+        tree_frame.pack(fill="both", expand=True, pady=(10, 0))
+
         self.results_tree = ttk.Treeview(
-            frame, columns=columns, show="headings", height=18, style="Modern.Treeview"
+            tree_frame, columns=columns, show="headings", height=18, style="Modern.Treeview"
         )
-        self.results_tree.heading("user_name", text="Имя")
-        self.results_tree.heading("group_name", text="Группа")
-        self.results_tree.heading("score", text="Баллы")
-        self.results_tree.heading("percent", text="%")
-        self.results_tree.heading("time_taken", text="Время (с)")
-        self.results_tree.heading("taken_at", text="Дата завершения")
+        self.results_headings = {
+            "user_name": "Имя",
+            "group_name": "Группа",
+            "score": "Баллы",
+            "percent": "%",
+            "time_taken": "Время (с)",
+            "taken_at": "Дата завершения",
+        }
+        for col in columns:
+            self.results_tree.heading(col, command=lambda c=col: self.sort_results_by(c))
 
         self.results_tree.column("user_name", width=150)
         self.results_tree.column("group_name", width=120)
@@ -80,7 +121,28 @@ class ResultsViewMixin:
         self.results_tree.column("time_taken", width=90, anchor="center")
         self.results_tree.column("taken_at", width=180)
 
-        self.results_tree.pack(fill="both", expand=True, pady=(10, 10))
+        self.results_tree.pack(side="left", fill="both", expand=True)
+        r_scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.results_tree.yview)
+        r_scroll.pack(side="right", fill="y")
+
+        self.results_stats_label = ttk.Label(frame, text="", style="Modern.TLabel", justify="left")
+        self.results_stats_label.pack(anchor="w", pady=(5, 10))
+
+        self.results_sort = ("taken_at", True)
+        self.results_window = TreeviewWindow(
+            self.results_tree,
+            fetch=self.fetch_results_page,
+            key_of=lambda r: (r["sort_value"], r["id"]),
+            to_values=lambda r: (
+                r["user_name"],
+                r["group_name"] or "",
+                f"{r['score']}/{r['max_score']}",
+                r["percent"],
+                r["time_taken"],
+                r["taken_local"] or "",
+            ),
+            scrollbar=r_scroll,
+        )
 
         ttk.Button(
             frame,
@@ -92,37 +154,116 @@ class ResultsViewMixin:
         
         self.load_results_table()
 
-    def load_results_table(self, *args):
-        for row in self.results_tree.get_children():
-            self.results_tree.delete(row)
+    def selected_results_test(self):
+        return self.catalog.by_name(self.results_test_var.get())
 
-        name = self.results_test_var.get()
-        test_obj = next((t for t in self.results_tests if t.name == name), None)
+    def fetch_results_page(self, after, limit, backward):
+        test_obj = self.selected_results_test()
         if not test_obj:
+            return []
+        order_by, descending = self.results_sort
+        return self.results_repo.ledger_page(
+            test_obj.id,
+            limit,
+            after=after,
+            order_by=order_by,
+            descending=descending != backward,
+        )
+
+    def sort_results_by(self, column):
+        order_by, descending = self.results_sort
+        # повторный клик по тому же столбцу меняет направление
+        self.results_sort = (column, not descending if column == order_by else column == "taken_at")
+        self.load_results_table()
+
+    def load_results_table(self, *args):
+        order_by, descending = self.results_sort
+        for col, title in self.results_headings.items():
+            mark = (" ▼" if descending else " ▲") if col == order_by else ""
+            self.results_tree.heading(col, text=title + mark)
+
+        self.load_results_stats()
+        self.results_window.reset()
+
+    def load_results_stats(self):
+        """Сводка берётся из result_stats, без прохода по всем результатам."""
+        test_obj = self.selected_results_test()
+        stats_repo = self.stats_repo
+        total = stats_repo.for_test(test_obj.id) if test_obj else None
+        groups = stats_repo.groups_for_test(test_obj.id) if test_obj else []
+        self.export_group_combo["values"] = [ALL_GROUPS] + [st.group_name or NO_GROUP for st in groups]
+        if self.export_group_var.get() not in self.export_group_combo["values"]:
+            self.export_group_var.set(ALL_GROUPS)
+        if not total or not total.count:
+            self.results_stats_label.config(text="Результатов пока нет.")
             return
 
-        results: list[Result] = self.results_repo.find_by_test(test_obj.id)
-        for r in results:
-            percent = 0.0
-            if r.max_score:
-                percent = round(r.score * 100.0 / r.max_score, 1)
-            taken_at = datetime.fromisoformat(r.taken_at) if r.taken_at else None
-            if taken_at:
-                taken_at = (
-                    taken_at
-                    .replace(tzinfo=tz.utc)
-                    .astimezone()
-                    .strftime("%Y-%m-%d %H:%M:%S")
-                )
-            self.results_tree.insert(
-                "",
-                "end",
-                values=(
-                    r.user_name,
-                    r.group_name or "",
-                    f"{r.score}/{r.max_score}",
-                    percent,
-                    r.time_taken,
-                    str(taken_at or ""),
-                ),
+        def line(title, st):
+            return (
+                f"{title}: {st.count} | средний %: {st.mean:.1f} | сдали: {st.pass_rate:.1f}% | "
+                f"медиана ≈ {st.percentile(50):.0f}% | P90 ≈ {st.percentile(90):.0f}%"
             )
+
+        lines = [line("Всего", total)]
+        lines.append("Гистограмма %: " + "  ".join(
+            f"{i * 10}-{i * 10 + 10}: {n}" for i, n in enumerate(total.histogram)
+        ))
+        for st in groups:
+            lines.append(line(st.group_name or "без группы", st))
+        self.results_stats_label.config(text="\n".join(lines))
+
+    def export_filters(self):
+        """group_name, date_from и date_to для export_ledger по полям фильтра."""
+        group = self.export_group_var.get()
+        filters = {"group_name": None if group == ALL_GROUPS else "" if group == NO_GROUP else group}
+        for key, var, days in (("date_from", self.export_from_var, 0), ("date_to", self.export_to_var, 1)):
+            day = var.get().strip()
+            # конец периода - начало следующего дня, export_ledger берёт taken_at строго меньше
+            filters[key] = local_day_to_utc(day, days) if day else None
+        return filters
+
+    def export_results(self):
+        """Выгрузка ведомости выбранного теста; пишет фоновый поток со своим соединением."""
+        from database.export import export_ledger
+
+        test_obj = self.selected_results_test()
+        if not test_obj:
+            messagebox.showwarning("Экспорт", "Выберите тест.")
+            return
+        try:
+            filters = self.export_filters()
+        except ValueError:
+            messagebox.showwarning("Экспорт", "Даты вводятся в виде ГГГГ-ММ-ДД, например 2024-05-31.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Экспорт ведомости",
+            defaultextension=".csv",
+            initialfile=f"results_{test_obj.name}.csv",
+            filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx"), ("Parquet", "*.parquet")],
+        )
+        if not path:
+            return
+
+        events = queue.Queue()
+
+        def run():
+            try:
+                events.put((export_ledger(self.db.reader(), path, test_id=test_obj.id, **filters), None))
+            except Exception as e:
+                events.put((0, e))
+            finally:
+                self.db.close_thread()
+
+        def poll():
+            try:
+                count, error = events.get_nowait()
+            except queue.Empty:
+                self.after(100, poll)
+                return
+            if error is not None:
+                messagebox.showerror("Экспорт", f"Не удалось выгрузить ведомость:\n{error}")
+            else:
+                messagebox.showinfo("Экспорт", f"Выгружено строк: {count}\n{path}")
+
+        threading.Thread(target=run, daemon=True).start()
+        self.after(100, poll)
@@ -0,0 +1,70 @@
+import time
+from typing import List, Tuple
+
+REPORT_VERSION = 1
+
+
+def git_revision() -> str:
+    import os
+    import subprocess
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+class StartupProfile:
+    """Время этапов запуска, мс от начала main.py (python main.py --startup-report startup.json).
+
+    Отчёт пишется в JSON, как у benchmarks.suite, чтобы сравнивать холодный старт между версиями.
+    Модули для отчёта импортируются только при его записи - сам замер запуск не замедляет.
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self.last = started
+        self.stages: List[Tuple[str, float, float]] = []  # (этап, длительность, с начала)
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self.last) * 1000, (now - self.started) * 1000))
+        self.last = now
+
+    def to_dict(self) -> dict:
+        import platform
+        import sqlite3
+        from datetime import datetime, timezone
+
+        return {
+            "version": REPORT_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "environment": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+            },
+            "stages": [
+                {"stage": stage, "ms": round(ms, 1), "at_ms": round(at, 1)} for stage, ms, at in self.stages
+            ],
+            "total_ms": round(self.stages[-1][2], 1) if self.stages else 0.0,
+        }
+
+    def format(self) -> str:
+        lines = [f"{'этап':<20} {'мс':>8} {'с начала':>10}"]
+        lines += [f"{stage:<20} {ms:>8.1f} {at:>10.1f}" for stage, ms, at in self.stages]
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        import json
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
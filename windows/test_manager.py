@@ -1,10 +1,20 @@
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkinter.simpledialog import askinteger
 from datetime import timedelta
 
+from windows.paging import ListboxPager
+
 
 class TestManagerMixin:
+    @property
+    def importer(self):
+        """database.importer грузится при первом импорте теста, а не при запуске."""
+        from database import importer
+
+        return importer
+
     def show_test_manager(self):
         self.set_fullscreen(False)
         self.clear_root()
@@ -31,6 +41,20 @@ class TestManagerMixin:
             style="Modern.TLabel",
         ).pack(anchor="w")
 
+        search_row = ttk.Frame(left, style="Modern.TFrame")
+        search_row.pack(fill="x", pady=(5, 0))
+        self.m_search = tk.StringVar()
+        search_entry = ttk.Entry(search_row, textvariable=self.m_search, font=self.ui_font)
+        search_entry.pack(side="left", fill="x", expand=True)
+        search_entry.bind("<Return>", self.search_manager_tests)
+        ttk.Button(
+            search_row,
+            text="Найти",
+            command=self.search_manager_tests,
+            style="Modern.TButton",
+            width=8,
+        ).pack(side="left", padx=(5, 0))
+
         self.manager_tests_list = tk.Listbox(
             left,
             height=20,
@@ -46,7 +70,17 @@ class TestManagerMixin:
 
         m_scroll = ttk.Scrollbar(left, orient="vertical", command=self.manager_tests_list.yview)
         m_scroll.pack(side="right", fill="y")
-        self.manager_tests_list.config(yscrollcommand=m_scroll.set)
+        self.manager_pager = ListboxPager(
+            self.manager_tests_list,
+            fetch_page=lambda after, limit: self.catalog.page(limit, after=after),
+            format_item=lambda t: (
+                f"[{t.id}] {self.manager_highlight.get(t.id, t.name)}  |  "
+                f"вопросов: {t.questions}{' (адаптивный)' if t.adaptive else ''} | "
+                f"{timedelta(seconds=int(t.time_limit))}"
+            ),
+            key_of=lambda t: (t.id,),
+            scrollbar=m_scroll,
+        )
 
         self.manager_tests_list.bind("<Double-Button-1>", self.on_test_double_click)
 
@@ -69,6 +103,24 @@ class TestManagerMixin:
             width=10,
         ).pack(side="right")
 
+        ttk.Label(
+            left,
+            text="Совпадения в вопросах и ответах:",
+            style="Modern.TLabel",
+        ).pack(anchor="w", pady=(10, 0))
+        self.manager_hits_list = tk.Listbox(
+            left,
+            height=6,
+            bg="white",
+            fg=self.FG_TEXT,
+            selectbackground=self.ACCENT,
+            font=self.ui_font,
+            bd=0,
+            highlightthickness=1,
+            highlightbackground="#d0c0ff",
+        )
+        self.manager_hits_list.pack(fill="x", pady=(5, 0))
+
         right = ttk.Frame(main_split, style="Modern.TFrame", padding=(10, 0))
         main_split.add(right, minsize=420)
 
@@ -100,7 +152,15 @@ class TestManagerMixin:
             style="Modern.TLabel",
         ).pack(anchor="w")
         self.m_time_limit = tk.IntVar(value=300)
-        ttk.Entry(right, textvariable=self.m_time_limit, font=self.ui_font).pack(fill="x", pady=(0, 10))
+        ttk.Entry(right, textvariable=self.m_time_limit, font=self.ui_font).pack(fill="x", pady=(0, 5))
+
+        self.m_adaptive = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            right,
+            text="Адаптивный режим (вопросов - не больше указанного)",
+            variable=self.m_adaptive,
+            style="Modern.TCheckbutton",
+        ).pack(anchor="w", pady=(0, 10))
 
         btns_right_top = ttk.Frame(right, style="Modern.TFrame")
         btns_right_top.pack(fill="x", pady=(5, 0))
@@ -143,6 +203,7 @@ class TestManagerMixin:
         ).pack(anchor="e", pady=(10, 10))
 
         self.current_edit_test_id = None
+        self.manager_highlight = {}
         self.btn_save_edit.pack_forget()
 
         self.load_manager_tests()
@@ -150,19 +211,33 @@ class TestManagerMixin:
     # ---------- helpers ----------
 
     def load_manager_tests(self):
-        self.manager_tests_list.delete(0, tk.END)
-        self.manager_tests = self.tests_repo.find_all(limit=1000)
-        for t in self.manager_tests:
-            self.manager_tests_list.insert(
-                tk.END, f"[{t.id}] {t.name}  |  вопросов: {t.questions} | {timedelta(seconds=int(t.time_limit))}"
-            )
+        self.manager_pager.reset()
+
+    def search_manager_tests(self, *args):
+        """Пустой запрос возвращает полный список тестов."""
+        query = self.m_search.get().strip()
+        self.manager_hits_list.delete(0, tk.END)
+        if not query:
+            self.manager_highlight = {}
+            self.manager_pager.fetch_page = lambda after, limit: self.catalog.page(limit, after=after)
+            self.load_manager_tests()
+            return
+
+        found = self.tests_repo.search_highlighted(query, limit=200)
+        self.manager_highlight = {t.id: text for t, text in found}
+        self.manager_pager.fetch_page = lambda after, limit: [] if after else [t for t, _ in found]
+        self.load_manager_tests()
+
+        kinds = {"question": "вопрос", "answer": "ответ"}
+        for hit in self.search_repo.search(query, kinds=tuple(kinds), limit=100):
+            self.manager_hits_list.insert(tk.END, f"[{hit.test_name}] {kinds[hit.kind]}: {hit.text}")
 
     def get_selected_test(self):
         sel = self.manager_tests_list.curselection()
         if not sel:
             return None
-        idx = sel[0]
-        return self.manager_tests[idx]
+        # свежие настройки из каталога; None - тест успели удалить
+        return self.catalog.get(self.manager_pager.items[sel[0]].id)
 
     def new_test_form(self):
         """Режим создания нового теста: очищаем форму и скрываем 'Сохранить изменения'."""
@@ -171,6 +246,7 @@ class TestManagerMixin:
         self.m_test_desc.set("")
         self.m_questions.set(10)
         self.m_time_limit.set(300)
+        self.m_adaptive.set(False)
         if self.btn_save_edit.winfo_ismapped():
             self.btn_save_edit.pack_forget()
 
@@ -183,6 +259,7 @@ class TestManagerMixin:
         self.m_test_desc.set(test_obj.description or "")
         self.m_questions.set(test_obj.questions)
         self.m_time_limit.set(test_obj.time_limit)
+        self.m_adaptive.set(bool(test_obj.adaptive))
         if not self.btn_save_edit.winfo_ismapped():
             self.btn_save_edit.pack(side="left", padx=(0, 5))
 
@@ -196,6 +273,7 @@ class TestManagerMixin:
         ):
             return
         self.tests_repo.delete(test_obj.id)
+        self.test_packs.invalidate(test_obj.id)
         if self.current_edit_test_id == test_obj.id:
             self.new_test_form()
         self.load_manager_tests()
@@ -221,10 +299,11 @@ class TestManagerMixin:
         time_limit = self.m_time_limit.get() or 60
 
         self.conn.execute(
-            "UPDATE tests SET name = ?, description = ?, questions = ?, time_limit = ? WHERE id = ?",
-            (name, desc, q_count, time_limit, self.current_edit_test_id),
+            "UPDATE tests SET name = ?, description = ?, questions = ?, time_limit = ?, adaptive = ? WHERE id = ?",
+            (name, desc, q_count, time_limit, int(self.m_adaptive.get()), self.current_edit_test_id),
         )
         self.conn.commit()
+        self.test_packs.invalidate(self.current_edit_test_id)
         messagebox.showinfo("Сохранение", f"Метаданные теста '{name}' обновлены.")
         self.load_manager_tests()
 
@@ -244,14 +323,12 @@ class TestManagerMixin:
             return
 
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
+            parsed = self.importer.read_txt(path)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось прочитать файл:\n{e}")
             return
 
-        blocks = [b.strip() for b in content.split("<question>") if b.strip()]
-        if not blocks:
+        if not parsed:
             messagebox.showwarning("Файл", "Не найдено ни одного вопроса.")
             return
 
@@ -262,7 +339,7 @@ class TestManagerMixin:
                 "Количество вопросов",
                 "Сколько вопросов выбирать случайным образом при тестировании?",
                 minvalue=1,
-                initialvalue=len(blocks),
+                initialvalue=len(parsed),
             )
             if not questions_count:
                 return
@@ -271,70 +348,77 @@ class TestManagerMixin:
         desc = self.m_test_desc.get().strip() or None
         time_limit = self.m_time_limit.get() or 60
 
-        if self.current_edit_test_id is not None:
-            test_id = self.current_edit_test_id
-            self.conn.execute(
-                "DELETE FROM answers WHERE question_id IN (SELECT id FROM questions WHERE test_id = ?)",
-                (test_id,),
-            )
-            self.conn.execute("DELETE FROM questions WHERE test_id = ?", (test_id,))
-            self.conn.execute(
-                "UPDATE tests SET name = ?, description = ?, questions = ?, time_limit = ? WHERE id = ?",
-                (name_from_form, desc, questions_count, time_limit, test_id),
-            )
-            self.conn.commit()
-        else:
-            test_obj = self.tests_repo.create(
-                {
-                    "name": name_from_form,
-                    "description": desc,
-                    "questions": questions_count,
-                    "time_limit": time_limit,
-                }
-            )
-            test_id = test_obj.id
-            self.current_edit_test_id = test_id
-            if not self.btn_save_edit.winfo_ismapped():
-                self.btn_save_edit.pack(side="left", padx=(0, 5))
-
-        created_questions = 0
-        for block in blocks:
-            lines = [l.strip() for l in block.splitlines() if l.strip()]
-            if not lines:
-                continue
-
-            q_text = lines[0]
-            variants_lines = [l for l in lines[1:] if l.startswith("<variant>")]
-            if not variants_lines:
-                continue
-
-            q_obj = self.questions_repo.create(
-                {
-                    "test_id": test_id,
-                    "q_text": q_text,
-                }
-            )
+        self.start_import_job(parsed, name_from_form, desc, questions_count, time_limit)
+
+    def start_import_job(self, parsed, name, desc, questions_count, time_limit):
+        """Запись в БД идёт в фоновом потоке, окно показывает прогресс."""
+        dialog = tk.Toplevel(self)
+        dialog.title("Импорт")
+        dialog.transient(self)
+        dialog.grab_set()
+        dialog.configure(bg=self.BG_FRAME)
+        dialog.protocol("WM_DELETE_WINDOW", lambda: None)
+        self.center_window(dialog, 400, 120)
 
-            correct_done = False
-            for v in variants_lines:
-                a_text = v[len("<variant>") :].strip()
-                if not a_text:
-                    continue
-                is_correct = not correct_done
-                correct_done = True
-                self.answers_repo.create(
-                    {
-                        "question_id": q_obj.id,
-                        "a_text": a_text,
-                        "is_correct": int(is_correct),
-                    }
-                )
-
-            if correct_done:
-                created_questions += 1
+        ttk.Label(dialog, text=f"Импорт теста '{name}'...", style="Modern.TLabel").pack(
+            anchor="w", padx=15, pady=(15, 5)
+        )
+        bar = ttk.Progressbar(dialog, mode="determinate", maximum=len(parsed))
+        bar.pack(fill="x", padx=15, pady=(0, 15))
+
+        events = queue.Queue()
+        job = self.importer.ImportJob(
+            parsed,
+            name,
+            desc,
+            questions_count,
+            time_limit,
+            test_id=self.current_edit_test_id,
+            progress=lambda done, total: events.put(("progress", (done, total))),
+            on_done=lambda stats, error: events.put(("done", (stats, error))),
+            db=self.db,
+        )
+
+        def poll():
+            finished = None
+            while True:
+                try:
+                    kind, payload = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    done, total = payload
+                    bar.config(maximum=max(total, 1), value=done)
+                else:
+                    finished = payload
+            if finished is None:
+                self.after(50, poll)
+                return
+
+            dialog.destroy()
+            stats, error = finished
+            if error is not None:
+                messagebox.showerror("Ошибка", f"Не удалось загрузить тест:\n{error}")
+                return
+            self.on_import_finished(name, stats)
+
+        job.start()
+        self.after(50, poll)
+
+    def on_import_finished(self, name, stats):
+        # режим теста задаётся формой, импорт его не меняет
+        self.conn.execute("UPDATE tests SET adaptive = ? WHERE id = ?", (int(self.m_adaptive.get()), stats.test_id))
+        self.conn.commit()
+        self.test_packs.invalidate(stats.test_id)
+        self.current_edit_test_id = stats.test_id
+        if not self.btn_save_edit.winfo_ismapped():
+            self.btn_save_edit.pack(side="left", padx=(0, 5))
 
         messagebox.showinfo(
             "Готово",
-            f"Тест '{name_from_form}' загружен/обновлён.\nВопросов создано: {created_questions}",
+            f"Тест '{name}' загружен/обновлён.\n"
+            f"Вопросов в файле: {stats.questions}\n"
+            f"Изменения: {stats.summary()}\n"
+            f"Время: {stats.elapsed:.2f} с ({stats.rows_per_sec:.0f} строк/с)",
         )
         self.load_manager_tests()
@@ -1,11 +1,17 @@
+import json
+import queue
+import random
 import time
-import threading
 import tkinter as tk
 import tkinter.font as tkFont
 from tkinter import ttk, messagebox
 from tkinter.simpledialog import askstring, askinteger
 from datetime import timedelta
 
+from server.protocol import ExamServerError
+from windows.exam_clock import ExamClock
+from windows.paging import ListboxPager
+
 
 class TestRunnerMixin:
     def ask_user_info(self):
@@ -94,6 +100,20 @@ class TestRunnerMixin:
             style="Modern.TLabel",
         ).pack(anchor="w", pady=(0, 10))
 
+        search_row = ttk.Frame(frame, style="Modern.TFrame")
+        search_row.pack(fill="x", pady=(0, 5))
+        self.tests_search = tk.StringVar()
+        search_entry = ttk.Entry(search_row, textvariable=self.tests_search, font=self.ui_font)
+        search_entry.pack(side="left", fill="x", expand=True)
+        search_entry.bind("<Return>", self.search_tests)
+        ttk.Button(
+            search_row,
+            text="Найти",
+            command=self.search_tests,
+            style="Modern.TButton",
+            width=8,
+        ).pack(side="left", padx=(5, 0))
+
         list_frame = ttk.Frame(frame, style="Modern.TFrame")
         list_frame.pack(fill="both", expand=True)
 
@@ -112,7 +132,16 @@ class TestRunnerMixin:
 
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tests_list.yview)
         scrollbar.pack(side="right", fill="y")
-        self.tests_list.config(yscrollcommand=scrollbar.set)
+        self.tests_pager = ListboxPager(
+            self.tests_list,
+            fetch_page=self.fetch_tests_page,
+            format_item=lambda t: (
+                f"{self.tests_highlight.get(t.id, t.name)}  |  "
+                f"вопросов: {'до ' if t.adaptive else ''}{t.questions}, время: {t.time_limit} c"
+            ),
+            key_of=lambda t: (t.id,),
+            scrollbar=scrollbar,
+        )
 
         btn_frame = ttk.Frame(frame, style="Modern.TFrame")
         btn_frame.pack(fill="x", pady=(10, 0))
@@ -140,54 +169,123 @@ class TestRunnerMixin:
             width=12,
         ).pack(anchor="e", pady=(10, 10))
 
+        self.tests_highlight = {}
+        self.load_tests_into_list()
+
+    def fetch_tests_page(self, after, limit):
+        if self.exam_client is not None:
+            return self.exam_client.list_tests(limit, after=after)
+        return self.catalog.page(limit, after=after)
+
+    def search_tests(self, *args):
+        query = self.tests_search.get().strip()
+        if not query:
+            self.tests_highlight = {}
+            self.tests_pager.fetch_page = self.fetch_tests_page
+        else:
+            if self.exam_client is not None:
+                found = self.exam_client.search_tests(query, limit=200)
+            else:
+                found = self.tests_repo.search_highlighted(query, limit=200)
+            self.tests_highlight = {t.id: text for t, text in found}
+            self.tests_pager.fetch_page = lambda after, limit: [] if after else [t for t, _ in found]
         self.load_tests_into_list()
 
     def load_tests_into_list(self):
-        self.tests_list.delete(0, tk.END)
-        self.tests_cache = self.tests_repo.find_all(limit=1000)
-        for t in self.tests_cache:
-            line = f"{t.name}  |  вопросов: {t.questions}, время: {t.time_limit} c"
-            self.tests_list.insert(tk.END, line)
+        try:
+            self.tests_pager.reset()
+        except (OSError, ExamServerError) as e:
+            messagebox.showerror("Сервер", f"Не удалось получить список тестов:\n{e}")
 
     def start_selected_test(self):
         sel = self.tests_list.curselection()
         if not sel:
             messagebox.showwarning("Тест", "Выберите тест.")
             return
-        idx = sel[0]
-        self.current_test = self.tests_cache[idx]
+        test = self.tests_pager.items[sel[0]]
+        if self.exam_client is None:
+            # строка списка могла устареть: настройки теста берём из каталога
+            test = self.catalog.get(test.id)
+            if test is None:
+                messagebox.showwarning("Тест", "Этот тест уже удалён.")
+                self.load_tests_into_list()
+                return
+        self.current_test = test
+        self.adaptive = None
 
-        all_questions = self.questions_repo.find_by_test(self.current_test.id)
-        if not all_questions:
-            messagebox.showinfo("Тест", "У этого теста пока нет вопросов.")
+        if self.exam_client is not None:
+            if test.adaptive:
+                messagebox.showwarning("Сервер", "Адаптивные тесты через сервер не проводятся.")
+                return
+            self.start_remote_test()
             return
 
-        import random
-        random.shuffle(all_questions)
-        max_q = self.current_test.questions
-        chosen_questions = all_questions[:max_q]
-
-        self.current_questions = []
-        for q in chosen_questions:
-            answers = self.answers_repo.find_by_question(q.id)
-            if not answers:
-                continue
+        if self.current_test.adaptive:
+            # вопросы подбираются по одному под ответы; первый - средней трудности
+            self.adaptive = self.new_adaptive_session()
+            first = self.adaptive.next_item()
+            self.current_questions = [first] if first else []
+        else:
+            # k вопросов по индексу, уже виденные этим тестируемым - реже
+            self.current_questions = self.sampler.sample_session(
+                self.current_test.id, self.current_test.questions, self.user_name
+            )
+        for _, answers in self.current_questions:
             random.shuffle(answers)
-            self.current_questions.append((q, answers))
 
         if not self.current_questions:
-            messagebox.showinfo("Тест", "Нет вопросов с ответами.")
+            messagebox.showinfo("Тест", "У этого теста пока нет вопросов с ответами.")
             return
 
-        self.current_index = 0
+        self.begin_session()
+
+    def start_remote_test(self):
+        """Тонкий клиент: вопросы выбирает и оценивает сервер, локальная база не нужна."""
+        try:
+            self.remote_session, self.current_test, self.current_questions = self.exam_client.start_session(
+                self.current_test.id, self.user_name, self.group_name
+            )
+        except (OSError, ExamServerError) as e:
+            messagebox.showerror("Сервер", f"Не удалось начать тест:\n{e}")
+            return
+        self.begin_session()
+
+    def begin_session(self, session=None):
+        """Запуск экрана теста: новой попытки или восстановленной из session."""
+        self.current_index = session.current_index if session else 0
         self.current_score = 0
         self.max_score = len(self.current_questions)
+        self.answers_choice = json.loads(session.choices) if session else [-1] * self.max_score
         self.selected_answer = tk.IntVar(value=-1)
-        self.answers_choice = [-1] * self.max_score
+        self.selected_answer.trace_add("write", self.on_answer_selected)
+
+        limit = self.current_test.time_limit
+        remaining = session.remaining if session else limit
+        self.time_left = remaining
+        self.exam_clock = ExamClock.from_dict(
+            self,
+            {"duration": limit, "remaining": remaining},
+            on_tick=self.on_clock_tick,
+            on_expire=self.time_over,
+        )
 
-        self.time_left = self.current_test.time_limit
-        self.timer_running = True
-        self.test_start_time = time.time()
+        if session:
+            self.session_id = session.id
+        elif self.exam_client is not None:
+            self.session_id = None
+        else:
+            self.session_id = self.sessions_repo.create(
+                {
+                    "test_id": self.current_test.id,
+                    "user_name": self.user_name,
+                    "group_name": self.group_name,
+                    "kiosk": self.kiosk_name,
+                    **self.session_questions(),
+                    "choices": json.dumps(self.answers_choice),
+                    "current_index": 0,
+                    "remaining": remaining,
+                }
+            ).id
 
         self.question_font = tkFont.Font(family="Segoe UI", size=16)
         self.options_font = tkFont.Font(family="Segoe UI", size=14)
@@ -198,7 +296,100 @@ class TestRunnerMixin:
         self.bind_all("<Key>", self.on_key_pressed)
 
         self.show_question_screen()
-        self.start_timer_thread()
+        self.exam_clock.start()
+
+    def session_questions(self):
+        return {
+            "question_ids": json.dumps([q.id for q, _ in self.current_questions]),
+            "answer_ids": json.dumps([[a.id for a in answers] for _, answers in self.current_questions]),
+        }
+
+    def autosave_session(self):
+        """Состояние попытки - в очередь автосохранения; на диск уходит пачкой."""
+        if getattr(self, "session_id", None) is None:
+            return
+        self.autosaver.submit(
+            self.session_id,
+            # в адаптивной попытке список вопросов растёт по ходу теста
+            **(self.session_questions() if self.adaptive is not None else {}),
+            choices=json.dumps(self.answers_choice),
+            current_index=self.current_index,
+            remaining=self.exam_clock.remaining(),
+        )
+
+    def end_session(self):
+        """Убрать запись о незавершённой попытке (тест сдан или прерван)."""
+        session_id, self.session_id = getattr(self, "session_id", None), None
+        if session_id is not None:
+            self.autosaver.discard(session_id)
+            self.sessions_repo.delete(session_id)
+
+    def offer_resume(self):
+        """При запуске предложить продолжить попытки, прерванные сбоем на этом компьютере."""
+        handed_off = self.result_writer.pending_sessions()
+        for session in self.sessions_repo.find_unfinished(self.kiosk_name):
+            if session.id in handed_off:
+                continue
+            test = self.catalog.get(session.test_id)
+            questions = self.restore_questions(session) if test else None
+            if questions is None:
+                messagebox.showwarning(
+                    "Незавершённый тест",
+                    f"Попытку {session.user_name} нельзя продолжить: тест был изменён или удалён.",
+                )
+                self.sessions_repo.delete(session.id)
+                continue
+
+            left = timedelta(seconds=int(session.remaining))
+            if messagebox.askyesno(
+                "Незавершённый тест",
+                f"Найдена незавершённая попытка.\n\n"
+                f"Тестируемый: {session.user_name} ({session.group_name})\n"
+                f"Тест: {test.name}\nОсталось: {left}\n\nПродолжить?",
+            ):
+                self.user_name = session.user_name
+                self.group_name = session.group_name
+                self.current_test = test
+                self.current_questions = questions
+                self.adaptive = self.restore_adaptive(session) if test.adaptive else None
+                self.begin_session(session)
+                return
+            self.sessions_repo.delete(session.id)
+
+    def restore_questions(self, session):
+        """Вопросы и варианты в том же порядке, что видел тестируемый; None - если их уже нет."""
+        question_ids = json.loads(session.question_ids)
+        answer_ids = json.loads(session.answer_ids)
+        found = self.questions_repo.load_by_ids(question_ids)
+        questions = []
+        for q_id, a_ids in zip(question_ids, answer_ids):
+            if q_id not in found:
+                return None
+            q_row, answers = found[q_id]
+            by_id = {a.id: a for a in answers}
+            if set(by_id) != set(a_ids):
+                return None
+            questions.append((q_row, [by_id[a_id] for a_id in a_ids]))
+        return questions
+
+    def new_adaptive_session(self):
+        """Адаптивная попытка по текущему тесту; модуль грузится при первом адаптивном тесте."""
+        from database.adaptive import AdaptiveSession
+
+        return AdaptiveSession(self.conn, self.current_test)
+
+    def restore_adaptive(self, session):
+        """Оценка уровня по ответам до текущего вопроса; ответ на текущий ещё не подтверждён."""
+        adaptive = self.new_adaptive_session()
+        choices = json.loads(session.choices)
+        adaptive.restore(
+            [q.id for q, _ in self.current_questions],
+            [
+                bool(answers[choice].is_correct) if i < session.current_index and choice >= 0 else None
+                for i, ((_, answers), choice) in enumerate(zip(self.current_questions, choices))
+            ],
+        )
+        return adaptive
 
     def on_key_pressed(self, event):
         if not getattr(self, "current_questions", None):
@@ -212,14 +403,31 @@ class TestRunnerMixin:
             return
 
         if event.keysym == "Return":
-            if self.current_index < self.max_score - 1:
+            if self.adaptive is not None or self.current_index < self.max_score - 1:
                 self.next_question()
             else:
                 self.finish_test()
 
     def show_question_screen(self):
+        """Экран вопроса строится один раз за сессию, дальше меняется только содержимое."""
+        started = time.perf_counter()
+        if not self.question_view_alive():
+            self.build_question_view()
+        self.render_question()
+        instruments = self.instruments
+        if instruments.enabled:
+            # замер включает перерисовку, поэтому ждём отрисовки только при включённой диагностике
+            self.update_idletasks()
+            instruments.record("screen.navigation", (time.perf_counter() - started) * 1000)
+
+    def question_view_alive(self):
+        view = getattr(self, "question_view", None)
+        return view is not None and view.winfo_exists()
+
+    def build_question_view(self):
         self.clear_root()
         frame = self.make_frame()
+        self.question_view = frame
 
         top = ttk.Frame(frame, style="Modern.TFrame")
         top.pack(fill="x")
@@ -262,17 +470,11 @@ class TestRunnerMixin:
         self.font_scale.set(self.question_font.cget("size"))
         self.font_scale.pack(side="left", padx=(5, 0))
 
-        q_row, answers = self.current_questions[self.current_index]
-
-        ttk.Label(
-            frame,
-            text=f"Вопрос {self.current_index + 1} из {len(self.current_questions)}",
-            style="Modern.TLabel",
-        ).pack(anchor="w", pady=(5, 5))
+        self.progress_label = ttk.Label(frame, style="Modern.TLabel")
+        self.progress_label.pack(anchor="w", pady=(5, 5))
 
         self.question_label = tk.Label(
             frame,
-            text=q_row.q_text,
             font=self.question_font,
             bg="#ffffff",
             fg=self.FG_TEXT,
@@ -286,32 +488,12 @@ class TestRunnerMixin:
         self.options_frame = ttk.Frame(frame, style="Modern.TFrame")
         self.options_frame.pack(fill="both", expand=True)
 
-        self.selected_answer.set(self.answers_choice[self.current_index])
-
         self.option_buttons = []
-        for i, ans in enumerate(answers):
-            rb = tk.Radiobutton(
-                self.options_frame,
-                text=ans.a_text,
-                variable=self.selected_answer,
-                value=i,
-                anchor="w",
-                justify="left",
-                wraplength=1100,
-                bg=self.BG_FRAME,
-                fg=self.FG_TEXT,
-                selectcolor="#e9d3ff",
-                font=self.options_font,
-                bd=0,
-                highlightthickness=0,
-            )
-            rb.pack(fill="x", anchor="w", padx=10, pady=2)
-            self.option_buttons.append(rb)
 
         nav_frame = ttk.Frame(frame, style="Modern.TFrame")
         nav_frame.pack(fill="x", pady=(10, 0))
 
-        back_btn = ttk.Button(
+        self.back_btn = back_btn = ttk.Button(
             nav_frame,
             text="Назад",
             command=self.prev_question,
@@ -319,10 +501,8 @@ class TestRunnerMixin:
             width=10,
         )
         back_btn.pack(side="left")
-        if self.current_index == 0:
-            back_btn.config(state="disabled")
 
-        next_btn = ttk.Button(
+        self.next_btn = next_btn = ttk.Button(
             nav_frame,
             text="Вперёд",
             command=self.next_question,
@@ -330,8 +510,6 @@ class TestRunnerMixin:
             width=10,
         )
         next_btn.pack(side="left", padx=5)
-        if self.current_index >= self.max_score - 1:
-            next_btn.config(state="disabled")
 
         ttk.Button(
             nav_frame,
@@ -349,29 +527,73 @@ class TestRunnerMixin:
             width=12,
         ).pack(side="right")
 
+    def render_question(self):
+        q_row, answers = self.current_questions[self.current_index]
+
+        if self.adaptive is not None:
+            self.progress_label.config(
+                text=f"Вопрос {self.current_index + 1} (адаптивный тест, не больше {self.adaptive.max_items})"
+            )
+        else:
+            self.progress_label.config(text=f"Вопрос {self.current_index + 1} из {len(self.current_questions)}")
+        self.question_label.config(text=q_row.q_text)
+
+        # пул переключателей: недостающие создаются, лишние прячутся
+        while len(self.option_buttons) < len(answers):
+            rb = tk.Radiobutton(
+                self.options_frame,
+                variable=self.selected_answer,
+                value=len(self.option_buttons),
+                anchor="w",
+                justify="left",
+                wraplength=1100,
+                bg=self.BG_FRAME,
+                fg=self.FG_TEXT,
+                selectcolor="#e9d3ff",
+                font=self.options_font,
+                bd=0,
+                highlightthickness=0,
+            )
+            self.option_buttons.append(rb)
+        for i, rb in enumerate(self.option_buttons):
+            if i < len(answers):
+                rb.config(text=answers[i].a_text)
+                if not rb.winfo_manager():
+                    rb.pack(fill="x", anchor="w", padx=10, pady=2)
+            elif rb.winfo_manager():
+                rb.pack_forget()
+
+        self.selected_answer.set(self.answers_choice[self.current_index])
+        if self.adaptive is not None:
+            # к отвеченным вопросам не возвращаются: по ним уже выбран следующий
+            self.back_btn.config(state="disabled")
+            self.next_btn.config(state="normal")
+            return
+        self.back_btn.config(state="disabled" if self.current_index == 0 else "normal")
+        self.next_btn.config(state="disabled" if self.current_index >= self.max_score - 1 else "normal")
+
     def update_font_scale(self, value):
         size = int(float(value))
         self.question_font.config(size=size)
         self.timer_font.config(size=size)
         self.options_font.config(size=max(size - 2, 10))
 
-    def start_timer_thread(self):
-        def run_timer():
-            while self.timer_running and self.time_left > 0:
-                time.sleep(1)
-                self.time_left -= 1
-                self.after(0, self.update_timer_label)
-            if self.timer_running and self.time_left <= 0:
-                self.after(0, self.time_over)
-
-        self.timer_thread = threading.Thread(target=run_timer, daemon=True)
-        self.timer_thread.start()
-
-    def update_timer_label(self):
-        if hasattr(self, "timer_label"):
+    def update_timer_label(self, seconds_left=None):
+        if seconds_left is not None:
+            self.time_left = seconds_left
+        if getattr(self, "timer_label", None) is not None and self.timer_label.winfo_exists():
             time_left = timedelta(seconds=int(self.time_left))
             self.timer_label.config(text=f"Осталось: {time_left}")
 
+    def on_clock_tick(self, seconds_left):
+        self.update_timer_label(seconds_left)
+        self.autosave_session()
+
+    def on_answer_selected(self, *args):
+        if getattr(self, "current_questions", None):
+            self.answers_choice[self.current_index] = self.selected_answer.get()
+            self.autosave_session()
+
     def time_over(self):
         messagebox.showinfo("Время", "Время теста вышло.\nРезультат будет сохранён.")
         self.finish_test()
@@ -379,19 +601,53 @@ class TestRunnerMixin:
     def save_current_answer(self):
         idx = self.selected_answer.get()
         self.answers_choice[self.current_index] = idx
+        self.autosave_session()
 
     def prev_question(self):
         self.save_current_answer()
-        if self.current_index > 0:
+        if self.adaptive is None and self.current_index > 0:
             self.current_index -= 1
             self.show_question_screen()
 
     def next_question(self):
         self.save_current_answer()
-        if self.current_index < self.max_score - 1:
+        if self.adaptive is not None:
+            self.next_adaptive_question()
+        elif self.current_index < self.max_score - 1:
             self.current_index += 1
             self.show_question_screen()
 
+    def next_adaptive_question(self):
+        choice = self.answers_choice[self.current_index]
+        if choice is None or choice < 0:
+            messagebox.showwarning("Ответ", "Выберите ответ.")
+            return
+        q_row, answers = self.current_questions[self.current_index]
+        self.adaptive.record(q_row.id, bool(answers[choice].is_correct))
+        item = self.adaptive.next_item()
+        if item is None:
+            self.finish_test()
+            return
+        random.shuffle(item[1])
+        self.current_questions.append(item)
+        self.answers_choice.append(-1)
+        self.max_score = len(self.current_questions)
+        self.current_index += 1
+        self.autosave_session()
+        self.show_question_screen()
+
+    def settle_adaptive(self):
+        """Последний вопрос адаптивной попытки: учесть ответ или убрать вопрос, если ответа нет."""
+        if self.adaptive.answered == len(self.current_questions):
+            return
+        choice = self.answers_choice[-1]
+        if choice is None or choice < 0:
+            self.current_questions.pop()
+            self.answers_choice.pop()
+            return
+        q_row, answers = self.current_questions[-1]
+        self.adaptive.record(q_row.id, bool(answers[choice].is_correct))
+
     def finish_test(self):
         if not getattr(self, "current_questions", None):
             self.set_fullscreen(False)
@@ -399,22 +655,36 @@ class TestRunnerMixin:
             self.show_main_menu()
             return
 
-        self.timer_running = False
+        if self.exam_client is not None:
+            self.finish_remote_test()
+            return
+
+        self.exam_clock.stop()
         self.save_current_answer()
 
-        self.current_score = 0
-        for i, (q_row, answers) in enumerate(self.current_questions):
-            chosen_index = self.answers_choice[i]
-            if chosen_index is None or chosen_index < 0:
-                continue
-            if answers[chosen_index].is_correct:
-                self.current_score += 1
+        if self.adaptive is not None:
+            # балл - ожидаемый на обычной попытке из test.questions вопросов при оценённом уровне
+            self.settle_adaptive()
+            self.current_score, total = self.adaptive.scaled_score()
+        else:
+            self.current_score = 0
+            for i, (q_row, answers) in enumerate(self.current_questions):
+                chosen_index = self.answers_choice[i]
+                if chosen_index is None or chosen_index < 0:
+                    continue
+                if answers[chosen_index].is_correct:
+                    self.current_score += 1
+            total = self.max_score
 
-        total = self.max_score
         score = self.current_score
-        time_taken = int(time.time() - self.test_start_time)
-
-        self.results_repo.create(
+        time_taken = int(round(self.exam_clock.elapsed()))
+
+        # запись идёт в фоне, результат уже в журнале - показываем его сразу
+        session_id, self.session_id = self.session_id, None
+        if session_id is not None:
+            self.autosaver.discard(session_id)
+        user_name = self.user_name
+        self.result_writer.submit(
             {
                 "test_id": self.current_test.id,
                 "user_name": self.user_name,
@@ -422,28 +692,103 @@ class TestRunnerMixin:
                 "score": score,
                 "max_score": total,
                 "time_taken": time_taken,
-            }
+                "adaptive": int(self.adaptive is not None),
+            },
+            self.collect_responses(),
+            session_id=session_id,
+            on_done=lambda result_id, error: self.result_events.put((user_name, result_id, error)),
+        )
+        self.after(100, self.poll_result_events)
+
+        self.set_fullscreen(False)
+        self.unbind_all("<Key>")
+        asked = f" (вопросов: {len(self.current_questions)})" if self.adaptive is not None else ""
+        messagebox.showinfo(
+            "Результат",
+            f"Тест завершён.\nВаш результат: {score}/{total}{asked}\nВремя: {time_taken} с",
         )
+        self.show_main_menu()
+
+    def finish_remote_test(self):
+        self.save_current_answer()
+        chosen = [
+            answers[i].id if i is not None and i >= 0 else None
+            for i, (_, answers) in zip(self.answers_choice, self.current_questions)
+        ]
+        try:
+            outcome = self.exam_client.finish_session(self.remote_session, chosen)
+        except (OSError, ExamServerError) as e:
+            # попытка остаётся открытой: сдать можно повторно, сервер не посчитает её дважды
+            messagebox.showerror("Сервер", f"Не удалось сохранить результат:\n{e}\n\nПопробуйте ещё раз.")
+            return
 
+        self.exam_clock.stop()
+        self.remote_session = None
         self.set_fullscreen(False)
         self.unbind_all("<Key>")
         messagebox.showinfo(
             "Результат",
-            f"Тест завершён.\nВаш результат: {score}/{total}\nВремя: {time_taken} с",
+            f"Тест завершён.\nВаш результат: {outcome['score']}/{outcome['max_score']}\n"
+            f"Время: {outcome['time_taken']} с",
         )
         self.show_main_menu()
 
+    def poll_result_events(self):
+        """Подтверждения фоновой записи результатов (on_done приходит из потока записи)."""
+        while True:
+            try:
+                user_name, result_id, error = self.result_events.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                import sqlite3  # уже загружен потоком записи
+
+                if isinstance(error, sqlite3.OperationalError):
+                    kept = "Он сохранён в журнале и будет записан при следующем запуске."
+                else:
+                    kept = f"База его не принимает, он отложен в {self.result_writer.quarantine.path}."
+                messagebox.showerror(
+                    "Результат",
+                    f"Не удалось записать результат {user_name} в базу:\n{error}\n\n{kept}",
+                )
+        if self.result_writer.pending:
+            self.after(100, self.poll_result_events)
+
+    def collect_responses(self):
+        """Ответы попытки для responses; result_id проставляет ResultWriter."""
+        rows = []
+        for i, (q_row, answers) in enumerate(self.current_questions):
+            chosen_index = self.answers_choice[i]
+            answer = answers[chosen_index] if chosen_index is not None and chosen_index >= 0 else None
+            rows.append(
+                {
+                    "question_id": q_row.id,
+                    "answer_id": answer.id if answer else None,
+                    "answer_text": answer.a_text if answer else None,
+                    "is_correct": int(bool(answer and answer.is_correct)),
+                }
+            )
+        return rows
+
     def cancel_test(self):
         if not getattr(self, "current_questions", None):
             self.set_fullscreen(False)
             self.unbind_all("<Key>")
             self.show_main_menu()
             return
-        self.timer_running = False
-        if messagebox.askyesno("Отмена", "Вы действительно хотите прервать тест?"):
+        # таймер на время диалога не останавливается, иначе им можно остановить время теста
+        confirmed = messagebox.askyesno("Отмена", "Вы действительно хотите прервать тест?")
+        if self.exam_clock.expired or self.exam_clock.remaining() <= 0:
+            return  # время вышло, пока диалог был открыт: результат сохраняет time_over
+        if confirmed:
+            self.exam_clock.stop()
+            self.end_session()
+            if self.exam_client is not None:
+                try:
+                    self.exam_client.cancel_session(self.remote_session)
+                except (OSError, ExamServerError):
+                    pass  # сервер сам забудет брошенную попытку
+                self.remote_session = None
             self.set_fullscreen(False)
             self.unbind_all("<Key>")
             self.show_main_menu()
-        else:
-            self.timer_running = True
-            self.start_timer_thread()